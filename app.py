@@ -1,14 +1,72 @@
 import yaml # Importa la librería para manejar archivos YAML (leer y escribir)
 import requests # Importa la librería para hacer peticiones HTTP (API REST)
 import sys  # Para manejar argumentos de línea de comandos
+import os  # Para rutas y metadatos (mtime, tamaño) de los archivos importados
+import hashlib  # Para nombrar los snapshots por ruta
+import pickle  # Para los snapshots binarios del YAML importado
+import json  # Para la exportación en JSON Lines
+import argparse  # Subcomandos de la línea de comandos
+import asyncio  # Corutinas sobre las llamadas bloqueantes al controlador
+import sqlite3  # Almacén persistente de conexiones
+import stat  # Permisos de la carpeta de snapshots
+import threading  # Para proteger estructuras compartidas (caché de dispositivos)
+import time  # Para medir la antigüedad de la caché
+import heapq  # Cola de prioridad para Dijkstra
+import bisect  # Búsquedas por prefijo sobre listas ordenadas
+import unicodedata  # Para buscar nombres sin importar las tildes
+import re  # Para reconocer los nombres de flows propios
+import contextlib  # Medición sin costo cuando las métricas están desactivadas
+import functools  # Para instrumentar funciones conservando su nombre
+from collections import deque  # Cola para BFS
+from itertools import islice  # Páginas de resultados sin recorrer toda la búsqueda
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer  # Endpoint /metrics y API local
+from urllib.parse import parse_qsl, unquote, urlsplit  # Rutas y parámetros de la API local
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor  # Pools acotados y resultados de trabajos
+from requests.adapters import HTTPAdapter  # Pool de conexiones keep-alive por controlador
+
+# --- Representación compacta ---
+def normalizar_mac(mac):
+    """Devuelve la MAC en minúsculas y sin espacios para usarla como clave."""
+    if not mac:
+        return mac
+    return mac.strip().lower()
+
+rutas_compartidas = {}    # ruta (tupla) -> [la misma tupla, conexiones que la usan]
+rutas_lock = threading.Lock()
+
+def compartir_ruta(ruta):
+    """Devuelve la ruta como tupla inmutable de (dpid, puerto), compartida entre conexiones.
+
+    Cada llamada cuenta un uso; liberar_ruta() lo descuenta cuando la conexión la deja.
+    """
+    if not ruta:
+        return ()
+    ruta = tuple((sys.intern(str(dpid)), port) for dpid, port in ruta)
+    with rutas_lock:
+        entrada = rutas_compartidas.get(ruta)
+        if entrada is None:
+            entrada = rutas_compartidas[ruta] = [ruta, 0]
+        entrada[1] += 1
+        return entrada[0]
+
+def liberar_ruta(ruta):
+    """Descuenta un uso de la ruta; sale de la tabla cuando ninguna conexión la usa."""
+    with rutas_lock:
+        entrada = rutas_compartidas.get(ruta)
+        if entrada is not None and entrada[0] is ruta:
+            entrada[1] -= 1
+            if entrada[1] <= 0:
+                del rutas_compartidas[ruta]
 
 # --- Clases ---
 class Alumno:
+    __slots__ = ("nombre", "mac", "codigo", "ip", "autorizado")
+
     def __init__(self, nombre, mac, codigo=None, ip=None, autorizado=False): # Constructor admite código y flag de autorización opcionales
         """Representa a un alumno de un curso."""
 
         self.nombre = nombre
-        self.mac = mac
+        self.mac = normalizar_mac(mac)
         self.codigo = codigo
         self.ip = ip
         self.autorizado = autorizado
@@ -18,76 +76,1587 @@ class Alumno:
         return self.autorizado
 
 class Servicio:
+    __slots__ = ("nombre", "protocolo", "puerto")
+
     def __init__(self, nombre, protocolo, puerto):
         self.nombre = nombre
         self.protocolo = protocolo
         self.puerto = puerto
 
 class Servidor:
+    __slots__ = ("nombre", "direccion_ip", "mac", "servicios")
+
     def __init__(self, nombre, direccion_ip, mac=None):
         self.nombre = nombre
         self.direccion_ip = direccion_ip
-        self.mac = mac
+        self.mac = normalizar_mac(mac)
         self.servicios = []        # Lista de servicios que ofrece el servidor
 
     def agregar_servicio(self, servicio):    # Método para agregar un servicio al servidor
         self.servicios.append(servicio)
 
 class Curso:
+    __slots__ = ("nombre", "estado", "alumnos", "servidores", "servicios_permitidos")
+
     def __init__(self, nombre, estado):
         self.nombre = nombre
         self.estado = estado
-        self.alumnos = []    # Lista de alumnos inscritos
+        self.alumnos = {}    # Alumnos inscritos, indexados por MAC normalizada (en orden de inscripción)
         self.servidores = []    # Lista de servidores asociados al curso
+        self.servicios_permitidos = {}    # nombre servidor -> nombres de servicios permitidos (sin clave: todos)
 
     def agregar_alumno(self, alumno):    # Método para agregar un alumno al curso
-        self.alumnos.append(alumno)
+        self.alumnos[normalizar_mac(alumno.mac)] = alumno
 
     def remover_alumno(self, alumno):    # Método para remover un alumno del curso
-        if alumno in self.alumnos:
-            self.alumnos.remove(alumno)
+        self.alumnos.pop(normalizar_mac(alumno.mac), None)
+
+    def lista_alumnos(self):
+        """Devuelve los alumnos en orden de inscripción (para seleccionarlos por índice)."""
+        return list(self.alumnos.values())
 
-    def agregar_servidor(self, servidor):    # Método para agregar un servidor al curso
+    def agregar_servidor(self, servidor, permitidos=None):    # Método para agregar un servidor al curso
         self.servidores.append(servidor)
+        if permitidos is not None:
+            self.servicios_permitidos[servidor.nombre] = frozenset(permitidos)
+
+    def servicios_de(self, servidor):
+        """Servicios del servidor que este curso puede usar."""
+        permitidos = self.servicios_permitidos.get(servidor.nombre)
+        if permitidos is None:
+            return list(servidor.servicios)
+        return [svc for svc in servidor.servicios if svc.nombre in permitidos]
 
 class Conexion:
-    def __init__(self, handler, alumno, servidor, servicio, ruta=None):
+    __slots__ = ("handler", "alumno", "servidor", "servicio", "ruta", "flows", "vence")
+
+    def __init__(self, handler, alumno, servidor, servicio, ruta=None, flows=(), vence=None):
         self.handler = handler
         self.alumno = alumno
         self.servidor = servidor
         self.servicio = servicio
-        self.ruta = ruta or []
+        self.ruta = compartir_ruta(ruta)    # Tupla compartida por todas las conexiones con el mismo camino
+        self.flows = tuple(flows)    # Nombres de los flows instalados para esta conexión
+        self.vence = vence    # Fin del lease (time.time()) o None si sus flows son permanentes
+
+# --- Índices de búsqueda ---
+TAMANO_PAGINA = 20    # Resultados por página en los listados del menú
+MAX_TAMANO_PAGINA = 500    # Tope del parámetro 'tamano' de la API
+MODOS_BUSQUEDA = ("contiene", "prefijo")
+MARCAS_DIACRITICAS = re.compile("[\u0300-\u036f]")    # Tildes, diéresis y la virgulilla de la ñ tras NFKD
+
+def normalizar_texto(texto):
+    """Minúsculas y sin tildes, para comparar como escribe el usuario."""
+    texto = str(texto).strip().lower()
+    if texto.isascii():
+        return texto
+    return MARCAS_DIACRITICAS.sub("", unicodedata.normalize("NFKD", texto))
+
+class IndiceTexto:
+    """Índice de prefijos (lista ordenada + bisect) y de subcadenas (textos concatenados + str.find).
+
+    Los cambios se acumulan y se aplican en la siguiente consulta: una importación completa cuesta
+    un solo sort y unos pocos cambios se insertan con bisect. Cada consulta recorre estructuras que
+    ya no se modifican, así que puede iterarse mientras otros hilos indexan.
+    """
+
+    def __init__(self):
+        self.textos = {}    # clave -> textos normalizados, en orden de indexación
+        self.terminos = {}    # clave -> textos y sus palabras (para prefijos)
+        self.ordenados = []    # [(término, clave)] ordenada
+        self.cambios = None    # (agregar?, (término, clave)) pendientes; None: reordenar todo
+        self.corpus = None    # (textos unidos por "\n", inicio de cada clave, claves); None: rehacer
+        self.lock = threading.Lock()
+
+    def limpiar(self):
+        with self.lock:
+            self.textos.clear()
+            self.terminos.clear()
+            self.ordenados = []
+            self.cambios = None
+            self.corpus = None
+
+    def agregar(self, clave, *textos):
+        normalizados = tuple(dict.fromkeys(t for t in (normalizar_texto(x) for x in textos if x is not None) if t))
+        terminos = set(normalizados)
+        for texto in normalizados:
+            terminos.update(texto.split())
+        with self.lock:
+            self.quitar_textos(clave)
+            self.textos[clave] = normalizados
+            self.terminos[clave] = tuple(terminos)
+            self.anotar(True, clave, terminos)
+
+    def quitar(self, clave):
+        with self.lock:
+            self.quitar_textos(clave)
+
+    def quitar_textos(self, clave):
+        """Saca la clave del índice (con el lock tomado)."""
+        if self.textos.pop(clave, None) is not None:
+            self.anotar(False, clave, self.terminos.pop(clave))
+
+    def anotar(self, agregar, clave, terminos):
+        self.corpus = None
+        if self.cambios is not None:
+            self.cambios.extend((agregar, (termino, clave)) for termino in terminos)
+            if len(self.cambios) > len(self.ordenados) // 16:
+                self.cambios = None    # Muchos cambios (una importación): sale más barato reordenar todo
+
+    def lista_ordenada(self):
+        with self.lock:
+            if self.cambios is None:
+                nueva = [(t, c) for c, terminos in self.terminos.items() for t in terminos]
+                nueva.sort()
+            elif self.cambios:
+                nueva = list(self.ordenados)
+                for agregar, entrada in self.cambios:
+                    i = bisect.bisect_left(nueva, entrada)
+                    if agregar:
+                        nueva.insert(i, entrada)
+                    elif i < len(nueva) and nueva[i] == entrada:
+                        del nueva[i]
+            else:
+                return self.ordenados
+            self.ordenados = nueva
+            self.cambios = []
+            return nueva
+
+    def textos_unidos(self):
+        with self.lock:
+            if self.corpus is None:
+                claves = list(self.textos)
+                partes = ["\n".join(self.textos[c]) + "\n" for c in claves]
+                inicios, posicion = [], 0
+                for parte in partes:
+                    inicios.append(posicion)
+                    posicion += len(parte)
+                self.corpus = ("".join(partes), inicios, claves)
+            return self.corpus
+
+    def prefijo(self, consulta):
+        """Itera (sin repetir) las claves con algún término que empieza con la consulta, en orden."""
+        consulta = normalizar_texto(consulta)
+        ordenados = self.lista_ordenada()
+        vistas = set()
+        i = bisect.bisect_left(ordenados, (consulta,))
+        while i < len(ordenados) and ordenados[i][0].startswith(consulta):
+            clave = ordenados[i][1]
+            if clave not in vistas:
+                vistas.add(clave)
+                yield clave
+            i += 1
+
+    def contiene(self, consulta):
+        """Itera las claves con algún texto que contiene la consulta, en orden de indexación."""
+        consulta = normalizar_texto(consulta)
+        if "\n" in consulta:
+            return
+        texto, inicios, claves = self.textos_unidos()
+        posicion = texto.find(consulta)
+        while posicion != -1:
+            i = bisect.bisect_right(inicios, posicion) - 1
+            yield claves[i]
+            # La búsqueda sigue desde la clave siguiente para no repetir esta
+            posicion = texto.find(consulta, inicios[i + 1]) if i + 1 < len(inicios) else -1
+
+    def buscar(self, consulta, modo="contiene"):
+        if modo not in MODOS_BUSQUEDA:
+            raise ValueError(f"Modo de búsqueda desconocido: {modo}")
+        return self.prefijo(consulta) if modo == "prefijo" else self.contiene(consulta)
+
+def buscar_alumnos(consulta="", modo="contiene", curso=None, autorizado=None, con_conexiones=None):
+    """Itera perezosamente los alumnos que coinciden por nombre, código o MAC y cumplen los filtros."""
+    if consulta:
+        candidatos = filter(None, map(registro.alumnos_por_mac.get, registro.indice_alumnos.buscar(consulta, modo)))
+    elif curso is not None:
+        candidatos = curso.lista_alumnos()
+    else:
+        candidatos = list(registro.alumnos_por_mac.values())
+    for alumno in candidatos:
+        mac = normalizar_mac(alumno.mac)
+        if curso is not None and curso.nombre not in registro.cursos_por_alumno.get(mac, ()):
+            continue
+        if autorizado is not None and bool(alumno.esta_autorizado()) != autorizado:
+            continue
+        if con_conexiones is not None and bool(registro.conexiones_por_alumno.get(mac)) != con_conexiones:
+            continue
+        yield alumno
+
+def buscar_servidores(consulta="", modo="contiene", curso=None, con_conexiones=None):
+    """Itera perezosamente los servidores que coinciden por nombre o IP y cumplen los filtros."""
+    if consulta:
+        candidatos = filter(None, map(registro.servidores.get, registro.indice_servidores.buscar(consulta, modo)))
+    elif curso is not None:
+        candidatos = list(curso.servidores)
+    else:
+        candidatos = list(registro.servidores.values())
+    en_curso = {s.nombre for s in curso.servidores} if curso is not None else None
+    for servidor in candidatos:
+        if en_curso is not None and servidor.nombre not in en_curso:
+            continue
+        if con_conexiones is not None and bool(registro.conexiones_por_servidor.get(servidor.nombre)) != con_conexiones:
+            continue
+        yield servidor
+
+def pagina(resultados, numero=1, tamano=TAMANO_PAGINA):
+    """Devuelve (objetos de la página, hay_más) consumiendo sólo lo necesario del iterador."""
+    objetos = list(islice(resultados, (numero - 1) * tamano, numero * tamano + 1))
+    return objetos[:tamano], len(objetos) > tamano
+
+# --- Registro ---
+class Registro:
+    """Cursos, alumnos, servidores y conexiones con índices hash para búsquedas O(1)."""
+
+    def __init__(self):
+        self.cursos = {}    # nombre -> Curso
+        self.alumnos = {}    # código -> Alumno
+        self.alumnos_por_mac = {}    # MAC normalizada -> Alumno
+        self.alumnos_por_nombre = {}    # nombre -> Alumno
+        self.servidores = {}    # nombre -> Servidor
+        self.servicios = {}    # (nombre servidor, nombre servicio) -> Servicio
+        self.conexiones = {}    # handler -> Conexion
+        # Índices inversos
+        self.cursos_por_alumno = {}    # MAC -> {nombre de curso}
+        self.conexiones_por_alumno = {}    # MAC -> {handler}
+        self.conexiones_por_servidor = {}    # nombre servidor -> {handler}
+        self.conexiones_por_dpid = {}    # dpid -> {handler}
+        self.conexiones_por_puerto = {}    # (dpid, puerto) -> {handler}
+        self.indice_alumnos = IndiceTexto()    # MAC <- nombre, código y MAC
+        self.indice_servidores = IndiceTexto()    # nombre <- nombre e IP
+        # Seguimiento de cambios para la exportación incremental
+        self.generacion = 0    # Aumenta cuando se reemplaza todo el estado (importación)
+        self.version = 0    # Aumenta con cada modificación
+        self.cambios = {}    # (tipo, clave) -> versión del último cambio, ordenado por versión
+        self.lock = threading.RLock()    # Las conexiones se modifican desde varios hilos (lotes, vigilancia)
+
+    # Seguimiento de cambios
+    def marcar(self, tipo, clave):
+        """Registra que el objeto (tipo, clave) cambió o se eliminó."""
+        with self.lock:
+            self.version += 1
+            self.cambios.pop((tipo, clave), None)    # Se reinserta al final para mantener el orden por versión
+            self.cambios[(tipo, clave)] = self.version
+
+    def cambios_desde(self, version):
+        """Devuelve los (tipo, clave) modificados después de la versión dada, del más antiguo al más nuevo."""
+        recientes = []
+        with self.lock:
+            for clave, v in reversed(self.cambios.items()):
+                if v <= version:
+                    break
+                recientes.append(clave)
+        recientes.reverse()
+        return recientes
+
+    # Cursos, alumnos y servidores
+    def limpiar_cursos(self):
+        """Olvida cursos, alumnos y servidores (las conexiones se conservan)."""
+        self.generacion += 1
+        self.cambios.clear()
+        self.cursos.clear()
+        self.alumnos.clear()
+        self.alumnos_por_mac.clear()
+        self.alumnos_por_nombre.clear()
+        self.servidores.clear()
+        self.servicios.clear()
+        self.cursos_por_alumno.clear()
+        self.indice_alumnos.limpiar()
+        self.indice_servidores.limpiar()
+        politicas.limpiar()
+
+    def agregar_curso(self, curso):
+        self.cursos[curso.nombre] = curso
+        self.marcar("curso", curso.nombre)
+        for alumno in curso.alumnos.values():
+            self.indexar_alumno(curso, alumno)
+        for servidor in curso.servidores:
+            self.indexar_servidor(servidor)
+        politicas.compilar_curso(curso)
+
+    def indexar_alumno(self, curso, alumno):
+        mac = normalizar_mac(alumno.mac)
+        self.marcar("alumno", mac)
+        if alumno.codigo is not None:
+            self.alumnos[alumno.codigo] = alumno
+        self.alumnos_por_mac[mac] = alumno
+        self.alumnos_por_nombre.setdefault(alumno.nombre, alumno)
+        self.cursos_por_alumno.setdefault(mac, set()).add(curso.nombre)
+        self.indice_alumnos.agregar(mac, alumno.nombre, alumno.codigo, mac)
+
+    def indexar_servidor(self, servidor):
+        if self.servidores.get(servidor.nombre) is not servidor:
+            self.marcar("servidor", servidor.nombre)
+            self.indice_servidores.agregar(servidor.nombre, servidor.nombre, servidor.direccion_ip)
+        self.servidores[servidor.nombre] = servidor
+        for servicio in servidor.servicios:
+            self.servicios[(servidor.nombre, servicio.nombre)] = servicio
+
+    def agregar_alumno(self, curso, alumno):
+        """Inscribe al alumno en el curso y lo indexa; devuelve el alumno inscrito.
+
+        Los cursos indexan por MAC: se rechaza una MAC vacía o de otro alumno. Si la MAC y el
+        código son de un alumno ya registrado se inscribe ese mismo alumno.
+        """
+        mac = normalizar_mac(alumno.mac)
+        if not mac:
+            raise ValueError(f"El alumno '{alumno.nombre}' no tiene MAC.")
+        otro = curso.alumnos.get(mac) or self.alumnos_por_mac.get(mac)
+        if otro is not None and otro is not alumno:
+            if alumno.codigo is None or otro.codigo != alumno.codigo:
+                raise ValueError(f"La MAC {mac} ya es del alumno '{otro.nombre}'.")
+            alumno = otro
+        curso.agregar_alumno(alumno)
+        self.marcar("curso", curso.nombre)
+        self.indexar_alumno(curso, alumno)
+        politicas.compilar_alumno(curso, alumno)
+        return alumno
+
+    def remover_alumno(self, curso, alumno):
+        """Retira al alumno del curso; sale de los índices si ya no está en ningún curso."""
+        curso.remover_alumno(alumno)
+        politicas.retirar_alumno(curso, alumno)
+        self.marcar("curso", curso.nombre)
+        mac = normalizar_mac(alumno.mac)
+        cursos_alumno = self.cursos_por_alumno.get(mac, set())
+        cursos_alumno.discard(curso.nombre)
+        if cursos_alumno:
+            return
+        self.marcar("alumno", mac)
+        self.cursos_por_alumno.pop(mac, None)
+        self.indice_alumnos.quitar(mac)
+        if self.alumnos_por_mac.get(mac) is alumno:
+            del self.alumnos_por_mac[mac]
+        if alumno.codigo is not None and self.alumnos.get(alumno.codigo) is alumno:
+            del self.alumnos[alumno.codigo]
+        if self.alumnos_por_nombre.get(alumno.nombre) is alumno:
+            del self.alumnos_por_nombre[alumno.nombre]
+
+    def cambiar_estado(self, curso, estado):
+        """Cambia el estado del curso y recompila sus políticas."""
+        curso.estado = estado
+        self.marcar("curso", curso.nombre)
+        politicas.compilar_curso(curso)
+
+    def autorizar(self, alumno, autorizado):
+        """Cambia la autorización del alumno y recompila sus políticas en cada curso."""
+        alumno.autorizado = autorizado
+        mac = normalizar_mac(alumno.mac)
+        self.marcar("alumno", mac)
+        for nombre in self.cursos_por_alumno.get(mac, ()):
+            politicas.compilar_alumno(self.cursos[nombre], alumno)
+
+    def curso(self, nombre):
+        return self.cursos.get(nombre)
+
+    def alumno(self, codigo):
+        alumno = self.alumnos.get(codigo)
+        # Los códigos numéricos del YAML se cargan como int y se escriben como texto (o al revés)
+        if alumno is None and isinstance(codigo, str) and codigo.strip().isdigit():
+            alumno = self.alumnos.get(int(codigo))
+        elif alumno is None and isinstance(codigo, int):
+            alumno = self.alumnos.get(str(codigo))
+        return alumno
+
+    def alumno_por_mac(self, mac):
+        return self.alumnos_por_mac.get(normalizar_mac(mac))
+
+    def alumno_por_nombre(self, nombre):
+        return self.alumnos_por_nombre.get(nombre)
+
+    def servidor(self, nombre):
+        return self.servidores.get(nombre)
+
+    def servicio(self, nombre_servidor, nombre_servicio):
+        return self.servicios.get((nombre_servidor, nombre_servicio))
+
+    # Conexiones
+    def agregar_conexion(self, con):
+        with self.lock:
+            self.conexiones[con.handler] = con
+            self.marcar("conexion", con.handler)
+            self.conexiones_por_alumno.setdefault(normalizar_mac(con.alumno.mac), set()).add(con.handler)
+            self.conexiones_por_servidor.setdefault(con.servidor.nombre, set()).add(con.handler)
+            self.indexar_ruta(con)
+
+    def remover_conexion(self, handler):
+        """Quita la conexión de todos los índices y la devuelve (o None si no existe)."""
+        with self.lock:
+            con = self.conexiones.pop(handler, None)
+            if con is None:
+                return None
+            self.marcar("conexion", handler)
+            self.descartar(self.conexiones_por_alumno, normalizar_mac(con.alumno.mac), handler)
+            self.descartar(self.conexiones_por_servidor, con.servidor.nombre, handler)
+            self.desindexar_ruta(con)
+            liberar_ruta(con.ruta)
+            return con
+
+    def actualizar_ruta(self, con, ruta):
+        """Reemplaza la ruta de la conexión manteniendo el índice por switch."""
+        with self.lock:
+            self.desindexar_ruta(con)
+            anterior, con.ruta = con.ruta, compartir_ruta(ruta)
+            liberar_ruta(anterior)
+            self.indexar_ruta(con)
+            self.marcar("conexion", con.handler)
+
+    def indexar_ruta(self, con):
+        for dpid, port in con.ruta:
+            self.conexiones_por_dpid.setdefault(dpid, set()).add(con.handler)
+            self.conexiones_por_puerto.setdefault((dpid, port), set()).add(con.handler)
+
+    def desindexar_ruta(self, con):
+        for dpid, port in con.ruta:
+            self.descartar(self.conexiones_por_dpid, dpid, con.handler)
+            self.descartar(self.conexiones_por_puerto, (dpid, port), con.handler)
+
+    @staticmethod
+    def descartar(indice, clave, handler):
+        handlers = indice.get(clave)
+        if handlers is not None:
+            handlers.discard(handler)
+            if not handlers:
+                del indice[clave]
+
+    def conexion(self, handler):
+        return self.conexiones.get(handler)
+
+    def conexiones_de(self, indice, clave):
+        with self.lock:
+            return [self.conexiones[h] for h in indice.get(clave, ())]
 
-# Lista global de cursos
-cursos = []
-conexiones = []
+    def conexiones_de_alumno(self, alumno):
+        return self.conexiones_de(self.conexiones_por_alumno, normalizar_mac(alumno.mac))
+
+    def conexion_existente(self, alumno, servidor, servicio):
+        """Devuelve la conexión ya registrada para (alumno, servidor, servicio), si la hay."""
+        # Por nombre y no por identidad: una importación crea objetos nuevos para los mismos datos
+        for con in self.conexiones_de_alumno(alumno):
+            if con.servidor.nombre == servidor.nombre and con.servicio.nombre == servicio.nombre:
+                return con
+        return None
+
+    def reenlazar_conexiones(self):
+        """Apunta las conexiones a los alumnos, servidores y servicios importados con la misma clave."""
+        with self.lock:
+            for con in self.conexiones.values():
+                alumno = self.alumnos_por_mac.get(normalizar_mac(con.alumno.mac))
+                servidor = self.servidores.get(con.servidor.nombre)
+                servicio = self.servicios.get((con.servidor.nombre, con.servicio.nombre))
+                if alumno and servidor and servicio:
+                    con.alumno, con.servidor, con.servicio = alumno, servidor, servicio
+
+    def conexiones_de_servidor(self, servidor):
+        return self.conexiones_de(self.conexiones_por_servidor, servidor.nombre)
+
+    def conexiones_en_switch(self, dpid):
+        """Conexiones cuya ruta atraviesa el switch indicado."""
+        return self.conexiones_de(self.conexiones_por_dpid, dpid)
+
+    def conexiones_en_puerto(self, dpid, puerto):
+        """Conexiones cuya ruta entra o sale por el puerto indicado del switch."""
+        return self.conexiones_de(self.conexiones_por_puerto, (dpid, puerto))
+
+registro = Registro()    # Estado global de la aplicación
 controller_ip = "192.168.200.200"  # Dirección IP del controlador Floodlight
 
-# --- Funciones REST ---
-def get_attachment_points(controller_ip, mac):
-    # Obtiene el punto de attachment (switch y puerto) para un host por su MAC
+# --- Políticas ---
+ESTADOS_ACTIVOS = {"DICTANDO", "ACTIVO"}    # Estados de curso que permiten conexiones
+
+def curso_activo(curso):
+    return str(curso.estado).strip().upper() in ESTADOS_ACTIVOS
+
+class MotorPoliticas:
+    """Índice precompilado de decisiones (MAC del alumno, servidor, servicio) -> permitido.
+
+    Una tupla está permitida si algún curso activo inscribe al alumno autorizado y asocia el
+    servidor con ese servicio permitido. Cada curso aporta sus claves por alumno, así un cambio
+    en un alumno o en un curso sólo recompila esa parte.
+    """
+
+    def __init__(self):
+        self.permitidos = {}    # (mac, servidor, servicio) -> número de cursos que lo permiten
+        self.aportes = {}    # nombre curso -> {mac -> frozenset de claves aportadas}
+        self.lock = threading.Lock()
+
+    def limpiar(self):
+        with self.lock:
+            self.permitidos.clear()
+            self.aportes.clear()
+
+    @staticmethod
+    def claves(curso, alumno):
+        """Claves que el curso concede al alumno con su estado actual."""
+        if not curso_activo(curso) or not alumno.esta_autorizado():
+            return frozenset()
+        mac = normalizar_mac(alumno.mac)
+        return frozenset((mac, srv.nombre, svc.nombre)
+                         for srv in curso.servidores for svc in curso.servicios_de(srv))
+
+    def reemplazar(self, curso, mac, nuevas):
+        """Sustituye lo que el curso aporta para una MAC (con el lock tomado)."""
+        aportes = self.aportes.setdefault(curso.nombre, {})
+        anteriores = aportes.get(mac, frozenset())
+        for clave in anteriores - nuevas:
+            if self.permitidos[clave] == 1:
+                del self.permitidos[clave]
+            else:
+                self.permitidos[clave] -= 1
+        for clave in nuevas - anteriores:
+            self.permitidos[clave] = self.permitidos.get(clave, 0) + 1
+        if nuevas:
+            aportes[mac] = nuevas
+        else:
+            aportes.pop(mac, None)
+
+    def compilar_alumno(self, curso, alumno):
+        with self.lock:
+            self.reemplazar(curso, normalizar_mac(alumno.mac), self.claves(curso, alumno))
+
+    def retirar_alumno(self, curso, alumno):
+        with self.lock:
+            self.reemplazar(curso, normalizar_mac(alumno.mac), frozenset())
+
+    def compilar_curso(self, curso):
+        """Recompila todas las decisiones que aporta un curso."""
+        with self.lock:
+            actuales = {normalizar_mac(a.mac) for a in curso.alumnos.values()}
+            for mac in list(self.aportes.get(curso.nombre, {})):
+                if mac not in actuales:
+                    self.reemplazar(curso, mac, frozenset())
+            for mac, alumno in curso.alumnos.items():
+                self.reemplazar(curso, mac, self.claves(curso, alumno))
+
+    def compilar(self, cursos):
+        """Reconstruye el índice completo."""
+        self.limpiar()
+        for curso in cursos:
+            self.compilar_curso(curso)
+
+    def permite(self, alumno, servidor, servicio):
+        """Decisión O(1): True si (alumno, servidor, servicio) está permitido."""
+        return (normalizar_mac(alumno.mac), servidor.nombre, servicio.nombre) in self.permitidos
+
+    def motivo(self, alumno, servidor, servicio):
+        """Explica por qué se deniega una tupla (sólo se usa para mensajes)."""
+        if self.permite(alumno, servidor, servicio):
+            return None
+        if not alumno.esta_autorizado():
+            return "El alumno no está autorizado."
+        cursos = [c for c in registro.cursos.values() if normalizar_mac(alumno.mac) in c.alumnos]
+        comparten = [c for c in cursos if servidor in c.servidores]
+        if not comparten:
+            return "Ningún curso del alumno incluye ese servidor."
+        if not any(curso_activo(c) for c in comparten):
+            return "El curso que asocia al alumno con el servidor no está activo."
+        return "El servicio no está permitido para el alumno en ese servidor."
+
+    def resumen(self):
+        return f"{len(self.permitidos)} decisiones permitidas en {len(self.aportes)} cursos compilados"
+
+politicas = MotorPoliticas()    # Índice de políticas compartido
+
+# --- Métricas ---
+BUCKETS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)    # Segundos
+MUESTRAS_RECIENTES = 2048    # Observaciones guardadas por serie para calcular p50/p99
+METRICAS_ARCHIVO = "metricas.prom"    # Destino por defecto del formato de texto de Prometheus
+METRICAS_PUERTO = 9100    # Puerto por defecto del endpoint local /metrics
+nulo = contextlib.nullcontext()    # Contexto reutilizado cuando no se mide nada
+
+def etiquetas_texto(etiquetas, extra=()):
+    pares = list(etiquetas) + list(extra)
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{escapar_etiqueta(v)}"' for k, v in pares) + "}"
+
+def escapar_etiqueta(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histograma:
+    """Latencias de una serie: buckets acumulativos de Prometheus y muestras recientes."""
+
+    __slots__ = ("buckets", "suma", "cuenta", "recientes")
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_LATENCIA)
+        self.suma = 0.0
+        self.cuenta = 0
+        self.recientes = deque(maxlen=MUESTRAS_RECIENTES)
+
+    def observar(self, segundos):
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if segundos <= limite:
+                self.buckets[i] += 1
+        self.suma += segundos
+        self.cuenta += 1
+        self.recientes.append(segundos)
+
+    def percentil(self, p):
+        if not self.recientes:
+            return 0.0
+        ordenadas = sorted(self.recientes)
+        return ordenadas[min(len(ordenadas) - 1, round(p / 100 * (len(ordenadas) - 1)))]
+
+class Metricas:
+    """Contadores e histogramas de latencia de las llamadas REST y de las fases de cada conexión.
+
+    Con las métricas desactivadas medir() devuelve un contexto vacío y contar() retorna de inmediato.
+    """
+
+    def __init__(self, habilitada=True):
+        self.habilitada = habilitada
+        self.histogramas = {}    # (nombre, etiquetas) -> Histograma
+        self.contadores = {}    # (nombre, etiquetas) -> valor
+        self.fuentes = {}    # nombre -> (función que devuelve {clave: valor} al exportar, etiquetas)
+        self.lock = threading.Lock()
+        self.servidor = None    # ThreadingHTTPServer del endpoint /metrics, si se inició
+
+    def observar(self, nombre, segundos, **etiquetas):
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self.lock:
+            histograma = self.histogramas.get(clave)
+            if histograma is None:
+                histograma = self.histogramas[clave] = Histograma()
+            histograma.observar(segundos)
+
+    def contar(self, nombre, valor=1, **etiquetas):
+        if not self.habilitada:
+            return
+        clave = (nombre, tuple(sorted(etiquetas.items())))
+        with self.lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    @contextlib.contextmanager
+    def cronometro(self, nombre, etiquetas):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(nombre, time.perf_counter() - inicio, **etiquetas)
+
+    def medir(self, nombre, **etiquetas):
+        """Contexto que registra la duración del bloque en el histograma de la serie."""
+        if not self.habilitada:
+            return nulo
+        return self.cronometro(nombre, etiquetas)
+
+    def fase(self, nombre):
+        """Decorador que mide cada llamada de la función como una fase de la creación de conexiones."""
+        def decorador(funcion):
+            @functools.wraps(funcion)
+            def envoltura(*args, **kwargs):
+                if not self.habilitada:
+                    return funcion(*args, **kwargs)
+                with self.cronometro("fase_segundos", {"fase": nombre}):
+                    return funcion(*args, **kwargs)
+            return envoltura
+        return decorador
+
+    def agregar_fuente(self, nombre, funcion, etiquetas=None):
+        """Registra una función cuyos valores se exportan como gauges (p. ej. estadísticas de una caché).
+
+        Un valor diccionario se exporta como una serie por clave con la etiqueta que indica
+        etiquetas[clave]; un texto, como métrica _info con el texto en una etiqueta.
+        """
+        self.fuentes[nombre] = (funcion, etiquetas or {})
+
+    def reiniciar(self):
+        with self.lock:
+            self.histogramas.clear()
+            self.contadores.clear()
+
+    def resumen(self):
+        """Devuelve las series como filas (nombre, etiquetas, cuenta, media, p50, p99) y los contadores."""
+        with self.lock:
+            histogramas = sorted(self.histogramas.items())
+            contadores = sorted(self.contadores.items())
+        filas = [(nombre, etiquetas, h.cuenta, h.suma / h.cuenta if h.cuenta else 0.0,
+                  h.percentil(50), h.percentil(99)) for (nombre, etiquetas), h in histogramas]
+        return filas, contadores
+
+    def prometheus(self):
+        """Devuelve todas las métricas en el formato de texto de Prometheus."""
+        lineas = []
+        with self.lock:
+            histogramas = sorted(self.histogramas.items())
+            contadores = sorted(self.contadores.items())
+            histogramas = [(clave, list(h.buckets), h.suma, h.cuenta) for clave, h in histogramas]
+        tipos = set()
+        for (nombre, etiquetas), buckets, suma, cuenta in histogramas:
+            nombre = f"tel354_{nombre}"
+            if nombre not in tipos:
+                tipos.add(nombre)
+                lineas.append(f"# TYPE {nombre} histogram")
+            for limite, n in zip(BUCKETS_LATENCIA, buckets):
+                lineas.append(f"{nombre}_bucket{etiquetas_texto(etiquetas, [('le', limite)])} {n}")
+            lineas.append(f"{nombre}_bucket{etiquetas_texto(etiquetas, [('le', '+Inf')])} {cuenta}")
+            lineas.append(f"{nombre}_sum{etiquetas_texto(etiquetas)} {suma}")
+            lineas.append(f"{nombre}_count{etiquetas_texto(etiquetas)} {cuenta}")
+        for (nombre, etiquetas), valor in contadores:
+            nombre = f"tel354_{nombre}_total"
+            if nombre not in tipos:
+                tipos.add(nombre)
+                lineas.append(f"# TYPE {nombre} counter")
+            lineas.append(f"{nombre}{etiquetas_texto(etiquetas)} {valor}")
+        for fuente, (funcion, nombres_etiqueta) in sorted(self.fuentes.items()):
+            for clave, valor in sorted(funcion().items()):
+                nombre = f"tel354_{fuente}_{clave}"
+                if isinstance(valor, str):
+                    lineas.append(f"# TYPE {nombre}_info gauge")
+                    lineas.append(f"{nombre}_info{etiquetas_texto([(clave, valor)])} 1")
+                    continue
+                if isinstance(valor, dict):
+                    etiqueta = nombres_etiqueta.get(clave, "clave")
+                    series = [(etiquetas_texto([(etiqueta, k)]), v) for k, v in sorted(valor.items())]
+                else:
+                    series = [("", valor)]
+                series = [(texto, int(v) if isinstance(v, bool) else v) for texto, v in series
+                          if isinstance(v, (int, float))]    # Prometheus solo admite valores numéricos
+                if series:
+                    lineas.append(f"# TYPE {nombre} gauge")
+                    lineas.extend(f"{nombre}{texto} {v}" for texto, v in series)
+        return "\n".join(lineas) + "\n"
+
+    def escribir(self, ruta=METRICAS_ARCHIVO):
+        """Escribe el formato de Prometheus en un archivo (reemplazo atómico, apto para node_exporter)."""
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w") as f:
+            f.write(self.prometheus())
+        os.replace(temporal, ruta)
+
+    def servir(self, puerto=METRICAS_PUERTO, host="127.0.0.1"):
+        """Inicia en segundo plano un endpoint HTTP local que responde GET /metrics."""
+        if self.servidor is not None:
+            return self.servidor.server_address
+        metricas = self
+
+        class ManejadorMetricas(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                cuerpo = metricas.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass    # Sin ruido en la consola del menú
+
+        self.servidor = ThreadingHTTPServer((host, puerto), ManejadorMetricas)
+        self.servidor.daemon_threads = True
+        threading.Thread(target=self.servidor.serve_forever, name="metricas", daemon=True).start()
+        return self.servidor.server_address
+
+metricas = Metricas(os.environ.get("TEL354_METRICAS", "1") != "0")    # Métricas compartidas de la aplicación
+
+# --- Sesiones HTTP ---
+MAX_CONEXIONES_HTTP = 16    # Conexiones keep-alive por controlador (y trabajadores del pusher por controlador)
+TIMEOUT_HTTP = 5    # Segundos de espera por cada request al controlador
+
+sesiones = {}    # controller_ip -> requests.Session compartida
+sesiones_lock = threading.Lock()
+
+def obtener_sesion(controller_ip):
+    """Devuelve la sesión HTTP (con pool keep-alive) asociada a un controlador."""
+    with sesiones_lock:
+        sesion = sesiones.get(controller_ip)
+        if sesion is None:
+            sesion = requests.Session()
+            # pool_block: con muchos hilos (lotes, API) se espera una conexión libre en vez de abrir más
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONEXIONES_HTTP, pool_block=True)
+            sesion.mount("http://", adapter)
+            sesiones[controller_ip] = sesion
+        return sesion
+
+def peticion(controller_ip, metodo, url, endpoint, **kwargs):
+    """Hace un request con la sesión del controlador, midiendo latencia y errores por endpoint."""
+    with metricas.medir("http_segundos", endpoint=endpoint, metodo=metodo):
+        try:
+            resp = obtener_sesion(controller_ip).request(metodo, url, **kwargs)
+        except requests.RequestException:
+            metricas.contar("http_errores", endpoint=endpoint, tipo="conexion")
+            raise
+    if resp.status_code >= 400:
+        metricas.contar("http_errores", endpoint=endpoint, tipo=str(resp.status_code))
+    return resp
+
+# --- Controladores ---
+REDESCUBRIR_CADA = 5    # Segundos mínimos entre descubrimientos ante un switch sin dueño conocido
+
+class Controladores:
+    """Conjunto de controladores Floodlight y el dueño de cada switch.
+
+    Con un solo controlador todo va a controller_ip, como siempre. Con varios, cada switch
+    tiene un dueño (según un mapa DPID -> controlador o descubierto con la lista de switches
+    de cada uno): los flows se envían al dueño y los dispositivos, enlaces, contadores y
+    flows instalados se leen de todos y se combinan.
+    """
+
+    def __init__(self):
+        self.ips = []    # Controladores configurados; el primero es también controller_ip
+        self.mapa = {}    # dpid -> ip del controlador que lo maneja
+        self.fijo = False    # True: el mapa se configuró y no se redescubre
+        self.descubierto = None    # Instante (monotonic) del último descubrimiento
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="controladores")
+
+    def configurar(self, ips, mapa=None):
+        with self.lock:
+            self.ips = list(dict.fromkeys(ips))
+            self.mapa = {str(dpid): ip for dpid, ip in (mapa or {}).items()}
+            self.fijo = bool(mapa)
+            self.descubierto = None
+
+    def multiples(self):
+        return len(self.ips) > 1
+
+    def todos(self, controller_ip):
+        """Controladores a consultar; sin varios configurados, sólo el indicado."""
+        return list(self.ips) if self.multiples() else [controller_ip]
+
+    def en_paralelo(self, funcion, ips):
+        """Aplica funcion(ip) a cada controlador a la vez y devuelve los resultados en orden."""
+        if len(ips) == 1:
+            return [funcion(ips[0])]
+        return list(self.executor.map(funcion, ips))
+
+    def aprender(self, ip, switches):
+        """Registra como dueño de cada switch al controlador que lo reporta (si no hay mapa fijo)."""
+        if self.fijo:
+            return
+        with self.lock:
+            for sw in switches:
+                self.mapa.setdefault(str(sw.get('switchDPID') or sw.get('dpid')), ip)
+
+    def descubrir(self):
+        """Pide la lista de switches a cada controlador; devuelve cuántos switches tienen dueño."""
+        listas = self.en_paralelo(lambda ip: descargar_json(ip, '/wm/core/controller/switches/json'), self.ips)
+        with self.lock:
+            self.descubierto = time.monotonic()
+        for ip, switches in zip(self.ips, listas):
+            self.aprender(ip, switches or [])
+        return len(self.mapa)
+
+    def dueno(self, controller_ip, dpid):
+        """Controlador al que se envían los flows del switch."""
+        if not self.multiples():
+            return controller_ip
+        dpid = str(dpid)
+        ip = self.mapa.get(dpid)
+        if ip is None and not self.fijo:
+            with self.lock:
+                reciente = self.descubierto is not None and time.monotonic() - self.descubierto < REDESCUBRIR_CADA
+            if not reciente:
+                self.descubrir()
+                ip = self.mapa.get(dpid)
+        return ip or controller_ip
+
+    def estadisticas(self):
+        with self.lock:
+            duenos = list(self.mapa.values())
+        switches = {}
+        for ip in duenos:
+            switches[ip] = switches.get(ip, 0) + 1
+        return {"controladores": len(self.ips) or 1, "switches": switches}
+
+controladores = Controladores()    # main() lo configura con --controlador ip1,ip2,... y --mapa-switches
+metricas.agregar_fuente("controladores", controladores.estadisticas, {"switches": "controlador"})
+
+def cargar_mapa_switches(ruta):
+    """Lee un YAML o JSON {dpid: ip del controlador}."""
+    with open(ruta) as f:
+        mapa = yaml.safe_load(f) or {}
+    if not isinstance(mapa, dict):
+        raise ValueError("El mapa de switches debe ser un diccionario dpid: controlador.")
+    return {str(dpid): str(ip) for dpid, ip in mapa.items()}
+
+# --- Envío de flows ---
+LEASE_DURACION = 0    # hard_timeout en segundos de los flows instalados (0: permanentes, sin leases)
+LEASE_INACTIVIDAD = 0    # idle_timeout en segundos (0: el switch no los retira por falta de tráfico)
+
+def campos_lease():
+    """Timeouts que se agregan a cada flow enviado según los leases configurados."""
+    campos = {}
+    if LEASE_DURACION:
+        campos["hard_timeout"] = str(LEASE_DURACION)
+    if LEASE_INACTIVIDAD:
+        campos["idle_timeout"] = str(LEASE_INACTIVIDAD)
+    return campos
+
+class ResultadoFlow:
+    """Resultado del envío de un flow al staticflowpusher."""
+
+    def __init__(self, nombre, dpid, ok, status=None, error=None, latencia=0.0):
+        self.nombre = nombre
+        self.dpid = dpid
+        self.ok = ok
+        self.status = status    # Código HTTP devuelto (None si no hubo respuesta)
+        self.error = error    # Mensaje de la excepción, si la hubo
+        self.latencia = latencia    # Segundos que tardó el request
+
+class ReporteFlows:
+    """Resultados de un lote de flows enviados y su throughput."""
+
+    def __init__(self, resultados=None, duracion=0.0):
+        self.resultados = resultados or []
+        self.duracion = duracion    # Tiempo de pared del lote completo en segundos
+
+    @property
+    def exitosos(self):
+        return [r for r in self.resultados if r.ok]
+
+    @property
+    def fallidos(self):
+        return [r for r in self.resultados if not r.ok]
+
+    @property
+    def ok(self):
+        return not self.fallidos
+
+    def flows_por_segundo(self):
+        return len(self.resultados) / self.duracion if self.duracion else 0.0
+
+    def resumen(self):
+        return (f"{len(self.exitosos)}/{len(self.resultados)} flows instalados en "
+                f"{self.duracion:.3f} s ({self.flows_por_segundo():.1f} flows/s)")
+
+class FlowPusher:
+    """Envía flows al staticflowpusher en paralelo sobre conexiones keep-alive.
+
+    Cada controlador tiene su propio pool de trabajadores: con varios controladores el
+    envío escala con su número y uno lento no frena a los demás.
+    """
+
+    def __init__(self, max_workers=MAX_CONEXIONES_HTTP, timeout=TIMEOUT_HTTP):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.executors = {}    # ip del controlador -> ThreadPoolExecutor
+        self.lock = threading.Lock()
+
+    def pool(self, ip):
+        with self.lock:
+            executor = self.executors.get(ip)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"flowpusher-{ip}")
+                self.executors[ip] = executor
+            return executor
+
+    def repartir(self, controller_ip, tareas):
+        """Ejecuta cada (ip, función, *args) en el pool de su controlador; devuelve los resultados en orden."""
+        futuros = [self.pool(ip).submit(funcion, *args) for ip, funcion, *args in tareas]
+        return [futuro.result() for futuro in futuros]
+
+    def enviar(self, controller_ip, flow):
+        """Hace el POST de un flow al controlador dueño del switch y devuelve su ResultadoFlow."""
+        controller_ip = controladores.dueno(controller_ip, flow['switch'])
+        limitador.esperar(controller_ip)
+        url = f"http://{controller_ip}:8080/wm/staticflowpusher/json"
+        inicio = time.perf_counter()
+        try:
+            resp = peticion(controller_ip, "POST", url, "staticflowpusher", json=flow | campos_lease(),
+                            timeout=self.timeout)
+            return ResultadoFlow(flow['name'], flow['switch'], resp.status_code == 200,
+                                 status=resp.status_code, latencia=time.perf_counter() - inicio)
+        except requests.RequestException as exc:
+            return ResultadoFlow(flow['name'], flow['switch'], False, error=str(exc),
+                                 latencia=time.perf_counter() - inicio)
+
+    @metricas.fase("instalar_flows")
+    def instalar(self, controller_ip, flows, secuencia=None):
+        """Envía todos los flows con los pools de sus controladores y devuelve un ReporteFlows.
+
+        secuencia es la de la Compilacion que produjo los flows (ordena los envíos agrupados).
+        """
+        if getattr(contexto_trabajo, "agrupar", False):
+            return agrupador.instalar(controller_ip, flows, secuencia)
+        inicio = time.perf_counter()
+        resultados = self.repartir(controller_ip, [
+            (controladores.dueno(controller_ip, f['switch']), self.enviar, controller_ip, f) for f in flows])
+        return ReporteFlows(resultados, time.perf_counter() - inicio)
+
+    def quitar(self, controller_ip, nombre, dpid=None):
+        """Hace el DELETE de un flow por nombre y devuelve su ResultadoFlow.
+
+        Sin el switch y con varios controladores se pide a todos: basta con que uno lo borre.
+        """
+        if dpid is not None:
+            return self.borrar_en(controladores.dueno(controller_ip, dpid), nombre, dpid)
+        resultados = [self.borrar_en(ip, nombre) for ip in controladores.todos(controller_ip)]
+        return next((r for r in resultados if r.ok), resultados[0])
+
+    def borrar_en(self, controller_ip, nombre, dpid=None):
+        limitador.esperar(controller_ip)
+        url = f"http://{controller_ip}:8080/wm/staticflowpusher/json"
+        inicio = time.perf_counter()
+        try:
+            resp = peticion(controller_ip, "DELETE", url, "staticflowpusher",
+                            json={"name": nombre}, timeout=self.timeout)
+            return ResultadoFlow(nombre, dpid, resp.status_code == 200,
+                                 status=resp.status_code, latencia=time.perf_counter() - inicio)
+        except requests.RequestException as exc:
+            return ResultadoFlow(nombre, dpid, False, error=str(exc), latencia=time.perf_counter() - inicio)
+
+    @metricas.fase("desinstalar_flows")
+    def desinstalar(self, controller_ip, flows, secuencia=None):
+        """Borra los flows (dicts o nombres) con el pool de trabajadores y devuelve un ReporteFlows."""
+        if getattr(contexto_trabajo, "agrupar", False):
+            return agrupador.desinstalar(controller_ip, flows, secuencia)
+        inicio = time.perf_counter()
+        tareas = []
+        for f in flows:
+            nombre, dpid = (f, None) if isinstance(f, str) else (f['name'], f.get('switch'))
+            ip = controladores.dueno(controller_ip, dpid) if dpid is not None else controller_ip
+            tareas.append((ip, self.quitar, controller_ip, nombre, dpid))
+        resultados = self.repartir(controller_ip, tareas)
+        return ReporteFlows(resultados, time.perf_counter() - inicio)
+
+flow_pusher = FlowPusher()    # Pusher compartido por todas las instalaciones de rutas
+
+# --- Caché de dispositivos ---
+def descargar_dispositivos(controller_ip):
+    """Descarga los dispositivos de todos los controladores y los combina (o None si todos fallan)."""
+    listas = controladores.en_paralelo(descargar_dispositivos_de, controladores.todos(controller_ip))
+    if all(devices is None for devices in listas):
+        return None
+    return [device for devices in listas if devices for device in devices]
+
+def descargar_dispositivos_de(controller_ip):
+    """Descarga la lista completa de dispositivos de /wm/device/ (o None si falla)."""
     url = f'http://{controller_ip}:8080/wm/device/'    # Construye la URL de la API
     try:
-        r = requests.get(url, timeout=5)    # Hace el request GET a la API con timeout
+        r = peticion(controller_ip, "GET", url, "device", timeout=TIMEOUT_HTTP)    # GET reutilizando la conexión
         if r.status_code == 200:    # Si la respuesta es exitosa
-            devices = r.json()    # Convierte la respuesta en JSON (lista de devices)
-            for device in devices:    # Recorre los dispositivos detectados
-                # La MAC puede venir como lista, compara en minúsculas
-                if mac.lower() in [m.lower() for m in device.get('mac', [])]:
-                    # Algunos hosts pueden tener múltiples attachment points
-                    for ap in device.get('attachmentPoint', []):
-                        dpid = ap.get('switchDPID')    # ID del switch al que está conectado el host
-                        port = ap.get('port')    # Puerto del switch al que está conectado
-                        return dpid, port    # Retorna el DPID y el puerto
+            devices = r.json()
+            # Algunas versiones de Floodlight envuelven la lista en {"devices": [...]}
+            if isinstance(devices, dict):
+                devices = devices.get('devices', [])
+            return devices
+        print(f"Error consultando el controlador: HTTP {r.status_code}")
+    except requests.RequestException as exc:
+        print(f"Error consultando el controlador: {exc}")
+    return None
+
+def indexar_dispositivos(devices):
+    """Construye el índice MAC -> (attachment points, IPv4s) de una lista de dispositivos."""
+    indice = {}
+    for device in devices:
+        aps = [(ap.get('switchDPID'), ap.get('port')) for ap in device.get('attachmentPoint', [])]
+        ips = list(device.get('ipv4', []))
+        for m in device.get('mac', []):    # La MAC puede venir como lista
+            indice[normalizar_mac(m)] = (aps, ips)
+    return indice
+
+class CacheDispositivos:
+    """Tabla de dispositivos del controlador indexada por MAC, con TTL e invalidación."""
+
+    def __init__(self, ttl=30, ttl_negativo=2):
+        self.ttl = ttl    # Segundos que una tabla descargada se considera vigente
+        self.ttl_negativo = ttl_negativo    # Antigüedad mínima para reintentar ante una MAC desconocida
+        self.tablas = {}    # controller_ip -> (instante de descarga, índice por MAC)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.descargas = {}    # controller_ip -> Lock: una sola descarga a la vez por controlador
+
+    def invalidar(self, controller_ip=None):
+        """Descarta la tabla de un controlador (o todas si no se indica)."""
+        with self.lock:
+            if controller_ip is None:
+                self.tablas.clear()
+            else:
+                self.tablas.pop(controller_ip, None)
+
+    def refrescar(self, controller_ip):
+        """Descarga de nuevo /wm/device/ y reemplaza el índice del controlador."""
+        devices = descargar_dispositivos(controller_ip)
+        if devices is None:
+            return None
+        indice = indexar_dispositivos(devices)
+        with self.lock:
+            self.tablas[controller_ip] = (time.monotonic(), indice)
+        return indice
+
+    def buscar(self, controller_ip, mac):
+        """Devuelve (attachment points, IPv4s) de la MAC o None si el controlador no la conoce."""
+        clave = normalizar_mac(mac)
+        ahora = time.monotonic()
+        with self.lock:
+            entrada = self.tablas.get(controller_ip)
+            if entrada and ahora - entrada[0] < self.ttl:
+                instante, indice = entrada
+                if clave in indice:
+                    self.hits += 1
+                    return indice[clave]
+                # Un host recién conectado puede no estar aún en la tabla: reintenta sólo si no es muy nueva
+                if ahora - instante < self.ttl_negativo:
+                    self.hits += 1
+                    return None
+            self.misses += 1
+            descarga = self.descargas.setdefault(controller_ip, threading.Lock())
+        with descarga:
+            # Si otro hilo descargó la tabla mientras se esperaba, se reutiliza
+            with self.lock:
+                entrada = self.tablas.get(controller_ip)
+            if entrada and entrada[0] >= ahora:
+                indice = entrada[1]
+            else:
+                indice = self.refrescar(controller_ip)
+        if indice is None:
+            return None
+        return indice.get(clave)
+
+    def estadisticas(self):
+        """Devuelve un diccionario con aciertos, fallos y tasa de aciertos."""
+        with self.lock:
+            hits, misses = self.hits, self.misses
+            dispositivos = sum(len(indice) for _, indice in self.tablas.values())
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else 0.0,
+            "dispositivos": dispositivos,
+        }
+
+cache_dispositivos = CacheDispositivos()    # Caché compartida por todas las consultas de dispositivos
+metricas.agregar_fuente("cache_dispositivos", cache_dispositivos.estadisticas)
+
+# --- Topología local ---
+def descargar_json(controller_ip, path):
+    """Hace un GET a la API REST del controlador y devuelve el JSON (o None si falla)."""
+    url = f'http://{controller_ip}:8080{path}'
+    try:
+        r = peticion(controller_ip, "GET", url, path, timeout=TIMEOUT_HTTP)
+        if r.status_code == 200:
+            return r.json()
+        print(f"Error consultando el controlador: HTTP {r.status_code} en {path}")
     except requests.RequestException as exc:
         print(f"Error consultando el controlador: {exc}")
+    return None
+
+def combinar_topologias(switches, links):
+    """Une las listas de switches y enlaces de varios controladores sin repetir enlaces."""
+    todos_switches = [sw for lista in switches for sw in lista]
+    vistos, todos_links = set(), []
+    for lista in links:
+        for link in lista:
+            clave = (link['src-switch'], link['src-port'], link['dst-switch'], link['dst-port'])
+            if clave not in vistos:
+                vistos.add(clave)
+                todos_links.append(link)
+    return todos_switches, todos_links
+
+class Topologia:
+    """Grafo de switches y enlaces del controlador con cálculo local de rutas.
+
+    Las rutas se devuelven en el mismo formato que /wm/topology/route:
+    [(dpid_origen, puerto_host), (dpid_origen, salida), (dpid_siguiente, entrada), ...,
+     (dpid_destino, puerto_host)].
+    """
+
+    def __init__(self, ttl=60, ponderado=False):
+        self.ttl = ttl    # Segundos antes de volver a descargar enlaces y switches
+        self.ponderado = ponderado    # True: Dijkstra con la latencia de los enlaces; False: BFS
+        self.controller_ip = None
+        self.instante = None
+        self.switches = set()
+        self.adyacencia = {}    # dpid -> [(puerto_local, dpid_vecino, puerto_vecino, peso), ...]
+        self.arboles = {}    # dpid_destino -> {dpid: (puerto_salida, dpid_siguiente, puerto_entrada)}
+        self.caminos = {}    # (dpid_origen, dpid_destino, k) -> k caminos más cortos (listas de tramos)
+        self.lock = threading.Lock()
+        self.descarga = threading.Lock()    # Evita descargas simultáneas de la misma topología
+
+    def invalidar(self):
+        """Obliga a descargar de nuevo la topología en la próxima consulta."""
+        with self.lock:
+            self.instante = None
+            self.arboles.clear()
+            self.caminos.clear()
+
+    def vigente(self, controller_ip):
+        return (
+            self.instante is not None
+            and self.controller_ip == controller_ip
+            and time.monotonic() - self.instante < self.ttl
+        )
+
+    def cargar(self, switches, links):
+        """Reconstruye el grafo a partir de las respuestas de switches y enlaces."""
+        nodos = {sys.intern(str(sw.get('switchDPID') or sw.get('dpid'))) for sw in switches}
+        adyacencia = {dpid: [] for dpid in nodos}
+        for link in links:
+            src, dst = sys.intern(str(link['src-switch'])), sys.intern(str(link['dst-switch']))
+            sport, dport = link['src-port'], link['dst-port']
+            peso = 1 + (link.get('latency') or 0) if self.ponderado else 1
+            adyacencia.setdefault(src, []).append((sport, dst, dport, peso))
+            if link.get('direction', 'bidirectional') != 'unidirectional':
+                adyacencia.setdefault(dst, []).append((dport, src, sport, peso))
+        with self.lock:
+            self.switches = nodos | set(adyacencia)
+            self.adyacencia = adyacencia
+            self.arboles = {}
+            self.caminos = {}
+
+    def refrescar(self, controller_ip):
+        """Descarga la lista de switches y /wm/topology/links; devuelve False si falla."""
+        ips = controladores.todos(controller_ip)
+        switches = controladores.en_paralelo(lambda ip: descargar_json(ip, '/wm/core/controller/switches/json'), ips)
+        links = controladores.en_paralelo(lambda ip: descargar_json(ip, '/wm/topology/links/json'), ips)
+        if any(s is None for s in switches) or any(l is None for l in links):
+            return False
+        for ip, lista in zip(ips, switches):
+            controladores.aprender(ip, lista)
+        self.actualizar(controller_ip, *combinar_topologias(switches, links))
+        return True
+
+    def actualizar(self, controller_ip, switches, links):
+        """Carga switches y enlaces ya descargados y marca el grafo como vigente."""
+        self.cargar(switches, links)
+        with self.lock:
+            self.controller_ip = controller_ip
+            self.instante = time.monotonic()
+
+    def asegurar(self, controller_ip):
+        """Refresca la topología si está vencida; devuelve True si hay un grafo utilizable."""
+        if self.vigente(controller_ip):
+            return True
+        with self.descarga:
+            if self.vigente(controller_ip):
+                return True
+            return self.refrescar(controller_ip)
+
+    def precalcular(self, dpid_destino):
+        """Calcula (una sola vez) el árbol de caminos mínimos de todos los switches hacia un destino."""
+        dpid_destino = str(dpid_destino)
+        with self.lock:
+            arbol = self.arboles.get(dpid_destino)
+            adyacencia = self.adyacencia
+        if arbol is not None:
+            return arbol
+        # Los enlaces se recorren al revés: desde el destino hacia cada origen
+        if self.ponderado:
+            arbol = self.dijkstra_hacia(adyacencia, dpid_destino)
+        else:
+            arbol = self.bfs_hacia(adyacencia, dpid_destino)
+        with self.lock:
+            self.arboles[dpid_destino] = arbol
+        return arbol
+
+    @staticmethod
+    def bfs_hacia(adyacencia, destino):
+        arbol = {destino: None}
+        cola = deque([destino])
+        while cola:
+            actual = cola.popleft()
+            for puerto, vecino, puerto_vecino, _ in adyacencia.get(actual, []):
+                if vecino not in arbol:
+                    # Desde 'vecino' se sale por 'puerto_vecino' y se entra a 'actual' por 'puerto'
+                    arbol[vecino] = (puerto_vecino, actual, puerto)
+                    cola.append(vecino)
+        return arbol
+
+    @staticmethod
+    def dijkstra_hacia(adyacencia, destino):
+        arbol = {destino: None}
+        distancia = {destino: 0}
+        heap = [(0, destino)]
+        while heap:
+            d, actual = heapq.heappop(heap)
+            if d > distancia.get(actual, float('inf')):
+                continue
+            for puerto, vecino, puerto_vecino, peso in adyacencia.get(actual, []):
+                nd = d + peso
+                if nd < distancia.get(vecino, float('inf')):
+                    distancia[vecino] = nd
+                    arbol[vecino] = (puerto_vecino, actual, puerto)
+                    heapq.heappush(heap, (nd, vecino))
+        return arbol
+
+    def ruta(self, src_dpid, src_port, dst_dpid, dst_port):
+        """Devuelve la lista de (dpid, puerto) entre dos attachment points o [] si no hay camino."""
+        src_dpid, dst_dpid = str(src_dpid), str(dst_dpid)
+        if src_dpid not in self.switches or dst_dpid not in self.switches:
+            return []
+        arbol = self.precalcular(dst_dpid)
+        if src_dpid not in arbol:
+            return []
+        hops = [(src_dpid, src_port)]
+        actual = src_dpid
+        while actual != dst_dpid:
+            salida, siguiente, entrada = arbol[actual]
+            hops.append((actual, salida))
+            hops.append((siguiente, entrada))
+            actual = siguiente
+        hops.append((dst_dpid, dst_port))
+        return hops
+
+    @staticmethod
+    def camino_minimo(adyacencia, origen, destino, nodos_excluidos=(), enlaces_excluidos=()):
+        """Dijkstra desde el origen; devuelve la lista de tramos (dpid, salida, siguiente, entrada, peso) o None."""
+        distancia = {origen: 0}
+        previo = {}
+        heap = [(0, origen)]
+        while heap:
+            d, actual = heapq.heappop(heap)
+            if actual == destino:
+                break
+            if d > distancia[actual]:
+                continue
+            for puerto, vecino, puerto_vecino, peso in adyacencia.get(actual, []):
+                if vecino in nodos_excluidos or (actual, puerto) in enlaces_excluidos:
+                    continue
+                nd = d + peso
+                if nd < distancia.get(vecino, float('inf')):
+                    distancia[vecino] = nd
+                    previo[vecino] = (actual, puerto, vecino, puerto_vecino, peso)
+                    heapq.heappush(heap, (nd, vecino))
+        if destino not in distancia:
+            return None
+        tramos = []
+        actual = destino
+        while actual != origen:
+            tramos.append(previo[actual])
+            actual = previo[actual][0]
+        tramos.reverse()
+        return tramos
+
+    @classmethod
+    def k_caminos(cls, adyacencia, origen, destino, k):
+        """Algoritmo de Yen: los k caminos sin ciclos más cortos, de menor a mayor costo.
+
+        Los tramos se identifican por (dpid, puerto de salida), así dos enlaces paralelos entre
+        los mismos switches dan caminos distintos.
+        """
+        primero = cls.camino_minimo(adyacencia, origen, destino)
+        if primero is None:
+            return []
+        costo = lambda tramos: sum(t[4] for t in tramos)
+        elegidos = [primero]
+        vistos = {tuple(primero)}
+        candidatos = []    # heap de (costo, orden, tramos)
+        while len(elegidos) < k:
+            anterior = elegidos[-1]
+            for i in range(len(anterior)):
+                # Se desvía en el i-ésimo switch: la raíz se conserva y el resto se recalcula
+                raiz = anterior[:i]
+                desvio = anterior[i][0]
+                enlaces = {(c[i][0], c[i][1]) for c in elegidos if len(c) > i and c[:i] == raiz}
+                nodos = {t[0] for t in raiz}
+                resto = cls.camino_minimo(adyacencia, desvio, destino, nodos, enlaces)
+                if resto is None:
+                    continue
+                camino = raiz + resto
+                if tuple(camino) not in vistos:
+                    vistos.add(tuple(camino))
+                    heapq.heappush(candidatos, (costo(camino), len(vistos), camino))
+            if not candidatos:
+                break
+            elegidos.append(heapq.heappop(candidatos)[2])
+        return elegidos
+
+    def rutas(self, src_dpid, src_port, dst_dpid, dst_port, k):
+        """Hasta k rutas entre dos attachment points, en el formato de ruta(), la mínima primero."""
+        src_dpid, dst_dpid = str(src_dpid), str(dst_dpid)
+        if src_dpid not in self.switches or dst_dpid not in self.switches:
+            return []
+        clave = (src_dpid, dst_dpid, k)
+        with self.lock:
+            caminos = self.caminos.get(clave)
+            adyacencia = self.adyacencia
+        if caminos is None:
+            caminos = [[]] if src_dpid == dst_dpid else self.k_caminos(adyacencia, src_dpid, dst_dpid, k)
+            with self.lock:
+                self.caminos[clave] = caminos
+        rutas = []
+        for tramos in caminos:
+            hops = [(src_dpid, src_port)]
+            for dpid, salida, siguiente, entrada, _ in tramos:
+                hops.append((dpid, salida))
+                hops.append((siguiente, entrada))
+            hops.append((dst_dpid, dst_port))
+            rutas.append(hops)
+        return rutas
+
+topologia = Topologia()    # Grafo compartido por todos los cálculos de ruta
+
+# --- Selección de rutas por carga ---
+SELECCION_RUTA = "carga"    # "minima": camino más corto; "carga": candidata menos cargada; "ecmp": reparto por hash
+MODOS_SELECCION = ("minima", "carga", "ecmp")
+K_RUTAS = 4    # Rutas candidatas por par de attachment points
+ESTIRAMIENTO_MAXIMO = 1    # Switches extra que se aceptan respecto de la ruta mínima
+CARGA_POR_CONEXION = 1_000_000    # bps supuestos por conexión mientras las estadísticas no reflejan su tráfico
+TTL_ESTADISTICAS = 5    # Segundos que se reutilizan los contadores de ancho de banda
+PATH_ANCHO_BANDA = '/wm/statistics/bandwidth/all/all/json'
+PATH_ACTIVAR_ESTADISTICAS = '/wm/statistics/config/enable/json'
+
+class EstadisticasPuertos:
+    """Ancho de banda por puerto (bps) del módulo de estadísticas de Floodlight.
+
+    Floodlight sólo mide si la recolección está activada: se pide una vez por controlador.
+    Si el módulo no responde, los puertos quedan sin medición y la carga se estima sólo con
+    las conexiones que pasan por cada puerto.
+    """
+
+    def __init__(self, ttl=TTL_ESTADISTICAS):
+        self.ttl = ttl
+        self.controller_ip = None
+        self.instante = None
+        self.bps = {}    # (dpid, puerto) -> max(rx, tx) en bps
+        self.reservas = {}    # (dpid, puerto) -> rutas elegidas desde la última lectura
+        self.activadas = set()    # Controladores a los que ya se pidió activar la recolección
+        self.disponibles = False    # Última lectura exitosa
+        self.lock = threading.Lock()
+        self.descarga = threading.Lock()
+
+    def vigente(self, controller_ip):
+        return (
+            self.instante is not None
+            and self.controller_ip == controller_ip
+            and time.monotonic() - self.instante < self.ttl
+        )
+
+    def activar(self, controller_ip):
+        self.activadas.add(controller_ip)
+        url = f'http://{controller_ip}:8080{PATH_ACTIVAR_ESTADISTICAS}'
+        try:
+            peticion(controller_ip, "POST", url, "estadisticas", json={}, timeout=TIMEOUT_HTTP)
+        except requests.RequestException:
+            pass
+
+    def descargar(self, controller_ip):
+        """Filas de ancho de banda de un controlador (o None si el módulo no responde)."""
+        if controller_ip not in self.activadas:
+            self.activar(controller_ip)
+        url = f'http://{controller_ip}:8080{PATH_ANCHO_BANDA}'
+        try:
+            r = peticion(controller_ip, "GET", url, "estadisticas", timeout=TIMEOUT_HTTP)
+            if r.status_code == 200:
+                return r.json() or []
+        except (requests.RequestException, ValueError):
+            pass
+        return None
+
+    def refrescar(self, controller_ip):
+        """Descarga los contadores de todos los puertos; sin estadísticas deja el mapa vacío."""
+        listas = controladores.en_paralelo(self.descargar, controladores.todos(controller_ip))
+        bps = {}
+        disponibles = any(filas is not None for filas in listas)
+        for fila in (f for filas in listas if filas for f in filas):
+            try:
+                clave = (sys.intern(str(fila['dpid'])), int(fila['port']))
+                bps[clave] = max(int(fila.get('bits-per-second-rx') or 0),
+                                 int(fila.get('bits-per-second-tx') or 0))
+            except (KeyError, TypeError, ValueError):
+                continue    # Puerto LOCAL u otra fila sin número de puerto o contadores
+        with self.lock:
+            self.bps, self.reservas, self.disponibles = bps, {}, disponibles
+            self.controller_ip = controller_ip
+            self.instante = time.monotonic()
+
+    def asegurar(self, controller_ip):
+        if self.vigente(controller_ip):
+            return
+        with self.descarga:
+            if not self.vigente(controller_ip):
+                self.refrescar(controller_ip)
+
+    def reservar(self, ruta):
+        """Anota la ruta elegida hasta la próxima lectura, así un lote no elige todo el mismo camino."""
+        with self.lock:
+            for puerto in set(ruta):
+                self.reservas[puerto] = self.reservas.get(puerto, 0) + 1
+
+    def carga(self, puerto, descontar=0):
+        """bps medidos más una estimación por cada conexión registrada o recién elegida en el puerto."""
+        conexiones = len(registro.conexiones_por_puerto.get(puerto, ())) + self.reservas.get(puerto, 0) - descontar
+        return self.bps.get(puerto, 0) + CARGA_POR_CONEXION * max(conexiones, 0)
+
+    def estadisticas(self):
+        return {"disponibles": self.disponibles, "puertos_medidos": len(self.bps),
+                "reservas": sum(self.reservas.values())}
+
+estadisticas_puertos = EstadisticasPuertos()
+metricas.agregar_fuente("estadisticas_puertos", estadisticas_puertos.estadisticas)
+
+class SelectorRutas:
+    """Elige, entre las k rutas más cortas, la que lleva cada conexión nueva."""
+
+    def __init__(self, modo=SELECCION_RUTA, k=K_RUTAS, estiramiento=ESTIRAMIENTO_MAXIMO):
+        self.modo = modo
+        self.k = k
+        self.estiramiento = estiramiento
+        self.elecciones = {}    # índice de la candidata elegida -> veces
+
+    def candidatas(self, src_dpid, src_port, dst_dpid, dst_port):
+        rutas = topologia.rutas(src_dpid, src_port, dst_dpid, dst_port, self.k)
+        if not rutas:
+            return rutas
+        # Cada switch extra suma dos entradas a la ruta
+        limite = len(rutas[0]) + 2 * self.estiramiento
+        return [r for r in rutas if len(r) <= limite]
+
+    def cuello(self, ruta, actual=None):
+        """Carga del enlace más cargado de la ruta; la conexión no cuenta contra su propia ruta."""
+        propios = set(actual or ())
+        # Los puertos de los hosts son los mismos en todas las candidatas: sólo se comparan enlaces
+        return max((estadisticas_puertos.carga(p, p in propios) for p in ruta[1:-1]), default=0)
+
+    def elegir(self, controller_ip, rutas, clave=None, actual=None, reservar=True):
+        """Elige una de las rutas; con reservar=False sólo se consulta (no cuenta como elección)."""
+        actual = tuple(actual or ())
+        if self.modo == "minima" or len(rutas) == 1:
+            indice = 0
+        elif self.modo == "ecmp":
+            # Reparto estable entre las rutas de costo mínimo: el mismo flujo cae siempre en la misma
+            minimas = [r for r in rutas if len(r) == len(rutas[0])]
+            resumen = hashlib.sha1(repr(clave).encode()).digest()
+            indice = int.from_bytes(resumen[:4], "big") % len(minimas) if clave is not None else 0
+        else:
+            estadisticas_puertos.asegurar(controller_ip)
+            # Con cargas iguales se queda en la ruta actual y luego en la más corta
+            indice = min(range(len(rutas)),
+                         key=lambda i: (self.cuello(rutas[i], actual), tuple(rutas[i]) != actual, len(rutas[i])))
+        if reservar:
+            # Quedarse en la ruta actual no suma carga: el registro ya cuenta a la conexión ahí
+            if tuple(rutas[indice]) != actual:
+                estadisticas_puertos.reservar(rutas[indice])
+            self.elecciones[indice] = self.elecciones.get(indice, 0) + 1
+        return rutas[indice]
+
+    def ruta(self, controller_ip, src_dpid, src_port, dst_dpid, dst_port, clave=None, actual=None, reservar=True):
+        rutas = self.candidatas(src_dpid, src_port, dst_dpid, dst_port)
+        if not rutas:
+            return []
+        return self.elegir(controller_ip, rutas, clave, actual, reservar)
+
+    def estadisticas(self):
+        return {"modo": self.modo, "k": self.k,
+                "elecciones": dict(sorted(self.elecciones.items()))}
+
+selector_rutas = SelectorRutas()
+metricas.agregar_fuente("selector_rutas", selector_rutas.estadisticas, {"elecciones": "candidata"})
+
+# --- Funciones REST ---
+@metricas.fase("attachment_point")
+def get_attachment_points(controller_ip, mac):
+    # Obtiene el punto de attachment (switch y puerto) para un host por su MAC
+    entrada = cache_dispositivos.buscar(controller_ip, mac)
+    if entrada:
+        aps, _ = entrada
+        # Algunos hosts pueden tener múltiples attachment points: usa el primero
+        for dpid, port in aps:
+            return dpid, port    # Retorna el DPID y el puerto
     return None, None # Si no se encuentra, devuelve None o hay error
 
 def get_route(controller_ip, src_dpid, src_port, dst_dpid, dst_port):
     # Obtiene la ruta (lista de switches y puertos) entre dos puntos de la red
     url = f'http://{controller_ip}:8080/wm/topology/route/{src_dpid}/{src_port}/{dst_dpid}/{dst_port}/json'
     try:
-        r = requests.get(url, timeout=5)    # Hace el request GET a la API con timeout
+        r = peticion(controller_ip, "GET", url, "route", timeout=TIMEOUT_HTTP)    # Hace el request GET a la API con timeout
         if r.status_code == 200:
             # La respuesta es una lista de hops (cada hop: switch, puerto)
             route = r.json()
@@ -98,15 +1667,15 @@ def get_route(controller_ip, src_dpid, src_port, dst_dpid, dst_port):
         print(f"Error consultando el controlador: {exc}")
     return []    # Si falla o hay error, retorna lista vacía
 
-def build_route(controller_ip, ruta, port_src, port_dst, mac_src, ip_src, mac_dst,
-                ip_dst, proto_l4, l4_src, l4_dst):
-    """Instala flows en ambos sentidos para la ruta dada."""
+def expandir_hops(ruta, port_src, port_dst):
+    """Convierte una ruta de (dpid, puerto) en la lista de hops (dpid, in_port, out_port)."""
     if not ruta:
-        return
-
-    url = f"http://{controller_ip}:8080/wm/staticflowpusher/json"
+        return []
+    # Formato completo de /wm/topology/route: incluye los puertos de los hosts en los extremos
+    if str(ruta[0][1]) == str(port_src) and len(ruta) % 2 == 0:
+        return [(ruta[i][0], ruta[i][1], ruta[i + 1][1]) for i in range(0, len(ruta), 2)]
 
-    # Calcula la lista de hops con (dpid, in_port, out_port)
+    # Formato sin extremos: [(dpid_origen, salida), (dpid, entrada), (dpid, salida), ...]
     hops = []
     hops.append((ruta[0][0], port_src, ruta[0][1]))
     for i in range(1, len(ruta) - 1, 2):
@@ -117,8 +1686,45 @@ def build_route(controller_ip, ruta, port_src, port_dst, mac_src, ip_src, mac_ds
         if dpid_in == dpid_out:
             hops.append((dpid_in, in_port, out_port))
     hops.append((ruta[-1][0], ruta[-1][1], port_dst))
+    return hops
 
-    for idx, (dpid, in_p, out_p) in enumerate(hops):
+@metricas.fase("ruta")
+def obtener_ruta(controller_ip, src_dpid, src_port, dst_dpid, dst_port, clave=None, actual=None, reservar=True):
+    """Calcula la ruta con la topología local; usa /wm/topology/route sólo si no hay grafo.
+
+    clave identifica el flujo para el reparto ECMP y actual es la ruta que ya usa la conexión
+    (su propia carga no cuenta al comparar candidatas). reservar=False para consultas que no
+    mueven la conexión.
+    """
+    if topologia.asegurar(controller_ip):
+        if selector_rutas.modo == "minima":
+            return topologia.ruta(src_dpid, src_port, dst_dpid, dst_port)
+        return selector_rutas.ruta(controller_ip, src_dpid, src_port, dst_dpid, dst_port, clave, actual, reservar)
+    return get_route(controller_ip, src_dpid, src_port, dst_dpid, dst_port)
+
+def clave_flujo(alumno, servidor, servicio=None):
+    return (alumno.mac, servidor.mac, servicio.puerto if servicio else None)
+
+def dpid_corto(dpid):
+    """DPID sin separadores ni ceros a la izquierda, para usarlo en nombres de flows."""
+    return str(dpid).replace(":", "").lstrip("0") or "0"
+
+def nombre_flow(tipo, dpid, handler=None, mac_a=None, mac_b=None):
+    """Nombre del flow: {tipo}_{handler}_{dpid} para una conexión, o con las MACs si no hay handler."""
+    if handler:
+        return f"{tipo}_{handler}_{dpid_corto(dpid)}"
+    return f"{tipo}_{dpid_corto(dpid)}_{mac_a}_{mac_b}"
+
+def generar_flows(ruta, port_src, port_dst, mac_src, ip_src, mac_dst,
+                  ip_dst, proto_l4, l4_src, l4_dst, handler=None):
+    """Devuelve los flows (fwd, rev, arp_fwd, arp_rev) de cada hop de la ruta.
+
+    Con el handler de la conexión los nombres no chocan entre servicios del mismo par de
+    hosts; además dependen del switch y no de la posición del hop, así un cambio de ruta
+    conserva los nombres de los hops que no cambian.
+    """
+    flows = []
+    for dpid, in_p, out_p in expandir_hops(ruta, port_src, port_dst):
         base = {
             "switch": dpid,
             "priority": "40000",
@@ -126,7 +1732,7 @@ def build_route(controller_ip, ruta, port_src, port_dst, mac_src, ip_src, mac_ds
         }
 
         fwd = base | {
-            "name": f"fwd_{idx}_{mac_src}_{mac_dst}",
+            "name": nombre_flow("fwd", dpid, handler, mac_src, mac_dst),
             "eth_type": "0x0800",
             "eth_src": mac_src,
             "eth_dst": mac_dst,
@@ -139,7 +1745,7 @@ def build_route(controller_ip, ruta, port_src, port_dst, mac_src, ip_src, mac_ds
             "actions": f"output={out_p}",
         }
         rev = base | {
-            "name": f"rev_{idx}_{mac_dst}_{mac_src}",
+            "name": nombre_flow("rev", dpid, handler, mac_dst, mac_src),
             "eth_type": "0x0800",
             "eth_src": mac_dst,
             "eth_dst": mac_src,
@@ -152,122 +1758,1879 @@ def build_route(controller_ip, ruta, port_src, port_dst, mac_src, ip_src, mac_ds
             "actions": f"output={in_p}",
         }
 
-        arp_fwd = base | {
-            "name": f"arp_fwd_{idx}_{mac_src}_{mac_dst}",
-            "eth_type": "0x0806",
-            "in_port": in_p,
-            "actions": f"output={out_p}",
-        }
-        arp_rev = base | {
-            "name": f"arp_rev_{idx}_{mac_dst}_{mac_src}",
-            "eth_type": "0x0806",
-            "in_port": out_p,
-            "actions": f"output={in_p}",
-        }
+        arp_fwd = base | {
+            "name": nombre_flow("arp_fwd", dpid, handler, mac_src, mac_dst),
+            "eth_type": "0x0806",
+            "in_port": in_p,
+            "actions": f"output={out_p}",
+        }
+        arp_rev = base | {
+            "name": nombre_flow("arp_rev", dpid, handler, mac_dst, mac_src),
+            "eth_type": "0x0806",
+            "in_port": out_p,
+            "actions": f"output={in_p}",
+        }
+
+        flows.extend((fwd, rev, arp_fwd, arp_rev))
+    return flows
+
+@metricas.fase("build_route")
+def build_route(controller_ip, ruta, port_src, port_dst, mac_src, ip_src, mac_dst,
+                ip_dst, proto_l4, l4_src, l4_dst):
+    """Instala flows en ambos sentidos para la ruta dada y devuelve el reporte del envío."""
+    flows = generar_flows(ruta, port_src, port_dst, mac_src, ip_src, mac_dst,
+                          ip_dst, proto_l4, l4_src, l4_dst)
+    return flow_pusher.instalar(controller_ip, flows)
+
+@metricas.fase("ipv4")
+def get_ipv4(controller_ip, mac):
+    """Devuelve la primera IP registrada para la MAC dada."""
+    entrada = cache_dispositivos.buscar(controller_ip, mac)
+    if entrada:
+        _, ips = entrada
+        if ips:
+            return ips[0]
+    return None
+            
+def calcular_ruta(alumno, servidor, servicio=None, actual=None, reservar=True):
+    """Obtiene la ruta actual entre un alumno y un servidor (reservar=False: sólo para mostrarla)."""
+    dpid_src, port_src = get_attachment_points(controller_ip, alumno.mac)
+    dpid_dst, port_dst = get_attachment_points(controller_ip, servidor.mac)
+
+    if not dpid_src or not dpid_dst:
+        return []
+
+    return obtener_ruta(controller_ip, dpid_src, port_src, dpid_dst, port_dst,
+                        clave_flujo(alumno, servidor, servicio), actual, reservar)
+
+# --- Compilador de flows ---
+PRIORIDAD_AGREGADA = "39000"    # Reglas por destino: por debajo de las reglas de cada conexión (40000)
+AGREGAR_POR_DESTINO = False    # True: los hops de tránsito comparten una regla por MAC destino
+CAMPOS_SIN_MATCH = ("name", "actions", "active")
+
+def clave_match(flow):
+    """Match canónico de un flow: switch, prioridad y campos de match como strings ordenados."""
+    return tuple(sorted((k, str(v)) for k, v in flow.items() if k not in CAMPOS_SIN_MATCH))
+
+def tipo_flow(nombre):
+    for tipo in ("arp_fwd", "arp_rev", "fwd", "rev", "dst"):
+        if nombre.startswith(tipo + "_"):
+            return tipo
+    return nombre.split("_", 1)[0]
+
+def nombre_regla(tipo, clave):
+    """Nombre estable derivado del match: dos conexiones con el mismo match comparten la regla."""
+    return f"{tipo}_{hashlib.sha1(repr(clave).encode()).hexdigest()[:12]}"
+
+def unir_acciones(acciones):
+    """Une las salidas de varias reglas con el mismo match (ARP) en una sola lista de outputs."""
+    salidas = {a for grupo in acciones for a in grupo.split(",") if a}
+    return ",".join(sorted(salidas, key=lambda a: (len(a), a)))
+
+class Regla:
+    """Regla instalada en un switch y las acciones que aporta cada conexión que la usa."""
+
+    __slots__ = ("base", "aportes", "union")
+
+    def __init__(self, base, union):
+        self.base = base    # Flow canónico sin acciones
+        self.aportes = {}    # handler -> acciones de esa conexión
+        self.union = union    # True: se instalan las salidas de todas las conexiones (ARP)
+
+    def flow(self):
+        """Flow efectivo de la regla, o None si ya no la usa ninguna conexión."""
+        if not self.aportes:
+            return None
+        if self.union:
+            acciones = unir_acciones(self.aportes.values())
+        else:
+            acciones = next(reversed(self.aportes.values()))    # Gana el último aporte
+        return self.base | {"actions": acciones}
+
+class Compilacion:
+    """Cambios en la red que resultan de compilar (o retirar) los flows de una conexión."""
+
+    def __init__(self, enviar=None, borrar=None, aportes=None, secuencia=None):
+        self.enviar = enviar or []    # Reglas nuevas o con acciones distintas
+        self.borrar = borrar or []    # Reglas que quedaron sin conexiones
+        self.aportes = aportes or []    # Flows de la conexión con el nombre de su regla (para el almacén)
+        self.secuencia = secuencia    # Orden de la compilación: el agrupador descarta envíos más viejos
+
+    @property
+    def nombres(self):
+        return tuple(f['name'] for f in self.aportes)
+
+class CompiladorFlows:
+    """Traduce los flows de cada conexión en reglas compartidas con conteo de referencias.
+
+    Los flows con el mismo match (típicamente los ARP, que sólo matchean eth_type e in_port)
+    se instalan una sola vez; una regla se borra cuando la deja de usar su última conexión.
+    """
+
+    def __init__(self, agregar_por_destino=AGREGAR_POR_DESTINO):
+        self.agregar_por_destino = agregar_por_destino
+        self.reglas = {}    # clave de match -> Regla
+        self.por_handler = {}    # handler -> claves de las reglas que usa
+        self.secuencia = 0    # Compilaciones hechas; numera cada Compilacion
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def canonizar(flow, tipo):
+        clave = clave_match(flow)
+        base = {k: v for k, v in flow.items() if k != "actions"}
+        base["name"] = nombre_regla(tipo, clave)
+        return clave, base
+
+    def candidatos(self, flows):
+        """Para cada flow devuelve ([(clave, base), ...] en orden de preferencia, acciones, unión).
+
+        generar_flows emite los hops en el orden de la ruta: el primer fwd y el último rev
+        son los de ingreso y mantienen el match completo del servicio.
+        """
+        fwd = [f for f in flows if tipo_flow(f['name']) == "fwd"]
+        rev = [f for f in flows if tipo_flow(f['name']) == "rev"]
+        ingreso = {id(fwd[0])} if fwd else set()
+        if rev:
+            ingreso.add(id(rev[-1]))
+        for f in flows:
+            tipo = tipo_flow(f['name'])
+            opciones = []
+            if self.agregar_por_destino and tipo in ("fwd", "rev") and id(f) not in ingreso:
+                agregado = {"switch": f["switch"], "priority": PRIORIDAD_AGREGADA, "active": "true",
+                            "eth_type": f["eth_type"], "eth_dst": f["eth_dst"]}
+                opciones.append(self.canonizar(agregado, "dst"))
+            opciones.append(self.canonizar(f, tipo))
+            yield opciones, f["actions"], f.get("eth_type") == "0x0806"
+
+    def reemplazar(self, handler, flows):
+        """Cambia los flows que aporta la conexión (lista vacía para retirarla); devuelve una Compilacion."""
+        with self.lock:
+            previas = {}    # clave -> flow efectivo antes del cambio
+            for clave in self.por_handler.pop(handler, ()):
+                regla = self.reglas[clave]
+                previas[clave] = regla.flow()
+                del regla.aportes[handler]
+            usadas = {}
+            for opciones, acciones, union in self.candidatos(flows):
+                for i, (clave, base) in enumerate(opciones):
+                    regla = self.reglas.get(clave)
+                    # Una regla agregada con otra salida no sirve: se usa la regla propia del flow
+                    conflicto = (regla is not None and not union
+                                 and any(a != acciones for a in regla.aportes.values()))
+                    if not conflicto or i == len(opciones) - 1:
+                        break
+                if clave not in previas:
+                    previas[clave] = regla.flow() if regla else None
+                if regla is None:
+                    regla = self.reglas[clave] = Regla(base, union)
+                regla.aportes.pop(handler, None)
+                regla.aportes[handler] = acciones
+                usadas[clave] = regla.base | {"actions": acciones}
+            if usadas:
+                self.por_handler[handler] = list(usadas)
+            return self.compilar(previas, list(usadas.values()))
+
+    def compilar(self, previas, aportes=None):
+        """Compilacion con las reglas que cambiaron respecto de previas (con el lock tomado)."""
+        self.secuencia += 1
+        compilacion = Compilacion(aportes=aportes, secuencia=self.secuencia)
+        for clave, previa in previas.items():
+            actual = self.reglas[clave].flow()
+            if actual is None:
+                del self.reglas[clave]
+                if previa is not None:
+                    compilacion.borrar.append(previa)
+            elif previa is None or cuerpo_flow(previa) != cuerpo_flow(actual):
+                compilacion.enviar.append(actual)
+        return compilacion
+
+    def retirar(self, handler):
+        return self.reemplazar(handler, [])
+
+    def retirar_varias(self, handlers):
+        """Retira juntas varias conexiones; la Compilacion refleja sólo el estado final de cada regla."""
+        with self.lock:
+            previas = {}
+            for handler in handlers:
+                for clave in self.por_handler.pop(handler, ()):
+                    regla = self.reglas[clave]
+                    previas.setdefault(clave, regla.flow())
+                    del regla.aportes[handler]
+            return self.compilar(previas)
+
+    def simular_retiro(self, handlers):
+        """Compilacion que resultaría de retirar esas conexiones juntas, sin modificar el compilador.
+
+        Devuelve también, por handler, los nombres de las reglas cuyo borrado o reenvío lo involucra.
+        """
+        handlers = set(handlers)
+        involucradas = {}
+        with self.lock:
+            self.secuencia += 1
+            compilacion = Compilacion(secuencia=self.secuencia)
+            claves = {clave for h in handlers for clave in self.por_handler.get(h, ())}
+            for clave in claves:
+                regla = self.reglas[clave]
+                previa = regla.flow()
+                restante = Regla(regla.base, regla.union)
+                restante.aportes = {h: a for h, a in regla.aportes.items() if h not in handlers}
+                actual = restante.flow()
+                if actual is None:
+                    compilacion.borrar.append(previa)
+                elif cuerpo_flow(previa) != cuerpo_flow(actual):
+                    compilacion.enviar.append(actual)
+                else:
+                    continue
+                for h in handlers.intersection(regla.aportes):
+                    involucradas.setdefault(h, set()).add(regla.base['name'])
+        return compilacion, involucradas
+
+    def restaurar(self, handler, aportes):
+        """Registra como ya instalados los aportes guardados de una conexión."""
+        with self.lock:
+            claves = []
+            for flow in aportes:
+                clave = clave_match(flow)
+                regla = self.reglas.get(clave)
+                if regla is None:
+                    base = {k: v for k, v in flow.items() if k != "actions"}
+                    regla = self.reglas[clave] = Regla(base, flow.get("eth_type") == "0x0806")
+                regla.aportes[handler] = flow["actions"]
+                claves.append(clave)
+            if claves:
+                self.por_handler[handler] = claves
+
+    def limpiar(self):
+        with self.lock:
+            self.reglas.clear()
+            self.por_handler.clear()
+
+    def flows(self):
+        """Flows efectivos de todas las reglas que deberían estar instaladas."""
+        with self.lock:
+            return [regla.flow() for regla in self.reglas.values()]
+
+    def estadisticas(self):
+        """Reglas instaladas frente a flows pedidos por las conexiones."""
+        with self.lock:
+            referencias = sum(len(r.aportes) for r in self.reglas.values())
+            compartidas = sum(1 for r in self.reglas.values() if len(r.aportes) > 1)
+            reglas = len(self.reglas)
+        return {"reglas": reglas, "referencias": referencias, "compartidas": compartidas,
+                "ahorradas": referencias - reglas}
+
+compilador = CompiladorFlows()    # Reglas compartidas por todas las conexiones
+metricas.agregar_fuente("compilador", compilador.estadisticas)
+
+def unicos(flows):
+    """Quita los flows repetidos por nombre conservando la última versión."""
+    return list({f['name']: f for f in flows}.values())
+
+# --- Cliente asíncrono ---
+class ClienteFloodlightAsync:
+    """Operaciones REST del controlador como corutinas, con concurrencia acotada.
+
+    Es una envoltura delgada: no hace I/O asíncrona. Cada llamada de requests sigue siendo
+    bloqueante y corre en un hilo del pool propio; las corutinas sólo permiten combinar con
+    gather las consultas independientes de una conexión. No rinde más que repartir las mismas
+    llamadas en un ThreadPoolExecutor.
+    """
+
+    def __init__(self, controller_ip=None, max_concurrencia=MAX_CONEXIONES_HTTP):
+        self.controller_ip = controller_ip    # None: usa el controller_ip global en cada llamada
+        self.max_concurrencia = max_concurrencia
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrencia, thread_name_prefix="floodlight")
+        self.semaforo = None    # Se crea dentro del event loop en el primer uso
+
+    def ip(self):
+        return self.controller_ip or controller_ip
+
+    async def llamar(self, funcion, *args):
+        if self.semaforo is None:
+            self.semaforo = asyncio.Semaphore(self.max_concurrencia)
+        async with self.semaforo:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, funcion, *args)
+
+    async def attachment_point(self, mac):
+        return await self.llamar(get_attachment_points, self.ip(), mac)
+
+    async def ipv4(self, mac):
+        return await self.llamar(get_ipv4, self.ip(), mac)
+
+    async def ruta(self, src_dpid, src_port, dst_dpid, dst_port, clave=None):
+        return await self.llamar(obtener_ruta, self.ip(), src_dpid, src_port, dst_dpid, dst_port, clave)
+
+    async def instalar_flows(self, flows):
+        """Equivalente asíncrono de build_route: envía los flows y devuelve un ReporteFlows."""
+        inicio = time.perf_counter()
+        resultados = await asyncio.gather(*(self.llamar(flow_pusher.enviar, self.ip(), f) for f in flows))
+        return ReporteFlows(list(resultados), time.perf_counter() - inicio)
+
+    async def preparar_conexion(self, alumno, servidor, servicio, handler=None):
+        """Resuelve attachment points, ruta e IP y genera los flows; devuelve (ruta, flows, error)."""
+        # Los attachment points de ambos extremos y la IP del alumno se piden a la vez
+        consultas = [self.attachment_point(alumno.mac), self.attachment_point(servidor.mac)]
+        if not alumno.ip:
+            consultas.append(self.ipv4(alumno.mac))
+        respuestas = await asyncio.gather(*consultas)
+        (dpid_src, port_src), (dpid_dst, port_dst) = respuestas[0], respuestas[1]    # Ojo: servidor.mac debe existir
+        ip_src = alumno.ip or respuestas[2]
+
+        if not dpid_src or not dpid_dst:
+            return None, None, "No se pudo encontrar el punto de attachment para el host o servidor."
+
+        ruta = await self.ruta(dpid_src, port_src, dpid_dst, port_dst, clave_flujo(alumno, servidor, servicio))
+        if not ruta:
+            return None, None, "No se encontró una ruta válida entre el alumno y el servidor."
+
+        if not ip_src:
+            return None, None, "No se pudo determinar la IP del alumno."
+
+        proto_l4 = 6 if servicio.protocolo.upper() == "TCP" else 17
+        # L4 source port is set to 0 to match any source port
+        flows = generar_flows(
+            ruta,
+            port_src,
+            port_dst,
+            alumno.mac,
+            ip_src,
+            servidor.mac,
+            servidor.direccion_ip,
+            proto_l4,
+            0,
+            servicio.puerto,
+            handler
+        )
+        return ruta, flows, None
+
+    async def preparar_conexiones(self, tuplas):
+        """Prepara muchas (alumno, servidor, servicio[, handler]) a la vez; devuelve los resultados en orden."""
+        return await asyncio.gather(*(self.preparar_conexion(*t) for t in tuplas))
+
+class ClienteFloodlight:
+    """Fachada síncrona del cliente asíncrono para el menú y las operaciones bloqueantes."""
+
+    def __init__(self, asincrono):
+        self.asincrono = asincrono
+        self.loop = None    # Event loop propio, en un hilo en segundo plano
+        self.lock = threading.Lock()
+
+    def ejecutar(self, corutina):
+        """Ejecuta la corutina en el event loop del cliente y espera su resultado."""
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="floodlight-loop", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(corutina, self.loop).result()
+
+    def attachment_point(self, mac):
+        return self.ejecutar(self.asincrono.attachment_point(mac))
+
+    def ipv4(self, mac):
+        return self.ejecutar(self.asincrono.ipv4(mac))
+
+    def ruta(self, src_dpid, src_port, dst_dpid, dst_port, clave=None):
+        return self.ejecutar(self.asincrono.ruta(src_dpid, src_port, dst_dpid, dst_port, clave))
+
+    def instalar_flows(self, flows):
+        return self.ejecutar(self.asincrono.instalar_flows(flows))
+
+    def preparar_conexion(self, alumno, servidor, servicio, handler=None):
+        return self.ejecutar(self.asincrono.preparar_conexion(alumno, servidor, servicio, handler))
+
+    def preparar_conexiones(self, tuplas):
+        return self.ejecutar(self.asincrono.preparar_conexiones(tuplas))
+
+cliente = ClienteFloodlight(ClienteFloodlightAsync())    # Cliente compartido del controlador
+
+def importar_yaml(ruta, streaming=False, usar_snapshot=True):
+    """Carga cursos, alumnos y servidores desde un YAML.
+
+    Si el archivo no cambió desde la última importación se usa el snapshot binario
+    sin volver a parsear. Con streaming=True cada elemento se construye por separado.
+
+    Formato esperado:
+    alumnos:
+      - nombre: str
+        codigo: str
+        mac: str
+        ip: str (opcional)
+        autorizado: bool (opcional)
+    servidores:
+      - nombre: str
+        direccion_ip o ip: str
+        mac: str (opcional)
+        servicios:
+          - nombre: str
+            protocolo: str
+            puerto: int
+    cursos:
+      - nombre: str
+        estado: str
+        alumnos: [codigo_alumno, ...]
+        servidores:
+          - nombre: str
+            servicios_permitidos: [nombre_servicio, ...]
+    """
+    if usar_snapshot:
+        cursos = cargar_snapshot(ruta)
+    else:
+        cursos = None
+    if cursos is None:
+        if streaming:
+            cursos = construir_en_streaming(ruta)
+        else:
+            with open(ruta, "r") as f:
+                data = yaml.load(f, Loader=LoaderYAML) or {}
+            cursos = construir_modelos(data)
+        if usar_snapshot:
+            guardar_snapshot(ruta, cursos)
+
+    registro.limpiar_cursos()
+    for curso in cursos:
+        registro.agregar_curso(curso)
+    registro.reenlazar_conexiones()
+    print("Datos importados correctamente.")
+    if almacen:
+        restauradas, omitidas = restaurar_conexiones()
+        if restauradas or omitidas:
+            print(f"{restauradas} conexiones restauradas del almacén ({omitidas} sin alumno/servidor/servicio).")
+
+def alumno_desde_dict(a):
+    return Alumno(
+        a['nombre'],
+        a['mac'],
+        codigo=a['codigo'],
+        ip=a.get('ip'),
+        autorizado=a.get('autorizado', False)
+    )
+
+def servidor_desde_dict(s):
+    direccion = s.get('direccion_ip') or s.get('ip')
+    if direccion is None:
+        raise KeyError("Falta 'direccion_ip' o 'ip' en servidor")
+    srv = Servidor(s['nombre'], direccion, s.get('mac'))
+    for svc in s.get('servicios', []):
+        srv.agregar_servicio(Servicio(svc['nombre'], svc['protocolo'], svc['puerto']))
+    return srv
+
+def curso_desde_dict(c, alumnos_dict, servidores_dict):
+    curso = Curso(c['nombre'], c['estado'])
+    # Asocia alumnos
+    for cod in c.get('alumnos', []):
+        if cod in alumnos_dict:
+            curso.agregar_alumno(alumnos_dict[cod])
+    # Asocia servidores y sus servicios permitidos (por curso: el servidor no se modifica)
+    for srv_obj in c.get('servidores', []):
+        srv = servidores_dict.get(srv_obj['nombre'])
+        if srv:
+            curso.agregar_servidor(srv, srv_obj.get('servicios_permitidos'))
+    return curso
+
+def validar_macs(alumnos_dict):
+    """Rechaza alumnos sin MAC o con la MAC de otro: los cursos los indexan por MAC y se fundirían."""
+    sin_mac, duplicadas, vistas = [], [], {}
+    for codigo, alumno in alumnos_dict.items():
+        mac = normalizar_mac(alumno.mac)
+        if not mac:
+            sin_mac.append(str(codigo))
+        elif mac in vistas:
+            duplicadas.append(f"{codigo} (igual que {vistas[mac]}: {mac})")
+        else:
+            vistas[mac] = codigo
+    problemas = []
+    if sin_mac:
+        problemas.append("alumnos sin MAC: " + ", ".join(sin_mac))
+    if duplicadas:
+        problemas.append("MAC repetida en: " + ", ".join(duplicadas))
+    if problemas:
+        raise ValueError("; ".join(problemas))
+
+def construir_modelos(data):
+    """Construye la lista de cursos a partir del documento YAML ya cargado."""
+    alumnos_dict = {}
+    for a in data.get('alumnos') or []:
+        alumnos_dict[a['codigo']] = alumno_desde_dict(a)
+    validar_macs(alumnos_dict)
+
+    servidores_dict = {}
+    for s in data.get('servidores') or []:
+        servidores_dict[s['nombre']] = servidor_desde_dict(s)
+
+    return [curso_desde_dict(c, alumnos_dict, servidores_dict) for c in data.get('cursos') or []]
+
+# --- Importación rápida ---
+LoaderYAML = getattr(yaml, "CSafeLoader", yaml.SafeLoader)    # Loader en C (libyaml) si está disponible
+# Carpeta de snapshots binarios: propia del usuario, porque cargar un pickle ajeno ejecuta su código
+SNAPSHOT_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+                            "tel354_snapshots")
+SNAPSHOT_VERSION = 2    # Cambiar si cambian los modelos para descartar snapshots viejos
+
+def clave_snapshot(ruta):
+    """Identifica el contenido del YAML por ruta absoluta, mtime y tamaño."""
+    st = os.stat(ruta)
+    return (SNAPSHOT_VERSION, os.path.abspath(ruta), st.st_mtime_ns, st.st_size)
+
+def archivo_snapshot(ruta):
+    nombre = hashlib.sha1(os.path.abspath(ruta).encode()).hexdigest()
+    return os.path.join(SNAPSHOT_DIR, nombre + ".pickle")
+
+def es_privado(camino, carpeta=False):
+    """True si el archivo (o carpeta) es del usuario actual y nadie más puede modificarlo."""
+    try:
+        st = os.lstat(camino)
+    except OSError:
+        return False
+    tipo_ok = stat.S_ISDIR(st.st_mode) if carpeta else stat.S_ISREG(st.st_mode)
+    # La carpeta no debe ser accesible por otros; el archivo, al menos no escribible
+    permisos_ok = not st.st_mode & (0o077 if carpeta else 0o022)
+    return tipo_ok and permisos_ok and (not hasattr(os, "getuid") or st.st_uid == os.getuid())
+
+def cargar_snapshot(ruta):
+    """Devuelve los cursos guardados si el YAML no cambió desde el último snapshot (o None)."""
+    archivo = archivo_snapshot(ruta)
+    if not (es_privado(SNAPSHOT_DIR, carpeta=True) and es_privado(archivo)):
+        return None
+    try:
+        with open(archivo, "rb") as f:
+            clave, cursos = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        return None
+    if clave != clave_snapshot(ruta):
+        return None
+    return cursos
+
+def guardar_snapshot(ruta, cursos):
+    """Guarda los cursos construidos junto con la clave del YAML de origen."""
+    destino = archivo_snapshot(ruta)
+    try:
+        os.makedirs(SNAPSHOT_DIR, mode=0o700, exist_ok=True)
+        if not es_privado(SNAPSHOT_DIR, carpeta=True):
+            print(f"No se guarda el snapshot de '{ruta}': {SNAPSHOT_DIR} no es una carpeta privada del usuario.")
+            return
+        temporal = f"{destino}.{os.getpid()}.tmp"
+        with os.fdopen(os.open(temporal, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o600), "wb") as f:
+            pickle.dump((clave_snapshot(ruta), cursos), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporal, destino)    # Reemplazo atómico: nunca queda un snapshot a medias
+    except OSError as exc:
+        print(f"No se pudo guardar el snapshot de '{ruta}': {exc}")
+
+def componer_nodo(loader, anclas):
+    """Arma el nodo YAML del siguiente valor leyendo eventos del parser (C o Python)."""
+    evento = loader.get_event()
+    if isinstance(evento, yaml.AliasEvent):
+        return anclas[evento.anchor]
+    if isinstance(evento, yaml.ScalarEvent):
+        tag = evento.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.ScalarNode, evento.value, evento.implicit)
+        nodo = yaml.ScalarNode(tag, evento.value, evento.start_mark, evento.end_mark, style=evento.style)
+    elif isinstance(evento, yaml.SequenceStartEvent):
+        tag = evento.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.SequenceNode, None, evento.implicit)
+        nodo = yaml.SequenceNode(tag, [], evento.start_mark, None, flow_style=evento.flow_style)
+        while not loader.check_event(yaml.SequenceEndEvent):
+            nodo.value.append(componer_nodo(loader, anclas))
+        nodo.end_mark = loader.get_event().end_mark
+    elif isinstance(evento, yaml.MappingStartEvent):
+        tag = evento.tag
+        if tag is None or tag == '!':
+            tag = loader.resolve(yaml.MappingNode, None, evento.implicit)
+        nodo = yaml.MappingNode(tag, [], evento.start_mark, None, flow_style=evento.flow_style)
+        while not loader.check_event(yaml.MappingEndEvent):
+            clave = componer_nodo(loader, anclas)
+            nodo.value.append((clave, componer_nodo(loader, anclas)))
+        nodo.end_mark = loader.get_event().end_mark
+    else:
+        raise yaml.YAMLError(f"Evento YAML inesperado: {evento}")
+    if evento.anchor is not None:
+        anclas[evento.anchor] = nodo
+    return nodo
+
+def recorrer_secciones(f):
+    """Genera (sección, elemento) construyendo cada elemento de las listas de primer nivel por separado."""
+    loader = LoaderYAML(f)
+    anclas = {}
+    try:
+        loader.get_event()    # StreamStart
+        if loader.check_event(yaml.StreamEndEvent):
+            return
+        loader.get_event()    # DocumentStart
+        if not loader.check_event(yaml.MappingStartEvent):
+            raise yaml.YAMLError("El documento debe ser un mapeo con alumnos/servidores/cursos")
+        loader.get_event()
+        while not loader.check_event(yaml.MappingEndEvent):
+            seccion = loader.construct_document(componer_nodo(loader, anclas))
+            if loader.check_event(yaml.SequenceStartEvent):
+                loader.get_event()
+                while not loader.check_event(yaml.SequenceEndEvent):
+                    yield seccion, loader.construct_document(componer_nodo(loader, anclas))
+                loader.get_event()
+            else:
+                componer_nodo(loader, anclas)    # Sección vacía o desconocida: se descarta
+    finally:
+        loader.dispose()
+
+def construir_en_streaming(ruta):
+    """Construye los cursos sección por sección sin cargar el documento completo."""
+    alumnos_dict = {}
+    servidores_dict = {}
+    cursos = []
+    pendientes = []    # Cursos que aparecen antes que sus alumnos o servidores
+    vistas = set()
+    with open(ruta, "r") as f:
+        for seccion, elemento in recorrer_secciones(f):
+            vistas.add(seccion)
+            if seccion == 'alumnos':
+                alumnos_dict[elemento['codigo']] = alumno_desde_dict(elemento)
+            elif seccion == 'servidores':
+                servidores_dict[elemento['nombre']] = servidor_desde_dict(elemento)
+            elif seccion == 'cursos':
+                if {'alumnos', 'servidores'} <= vistas:
+                    cursos.append(curso_desde_dict(elemento, alumnos_dict, servidores_dict))
+                else:
+                    pendientes.append(elemento)
+    validar_macs(alumnos_dict)
+    for c in pendientes:
+        cursos.append(curso_desde_dict(c, alumnos_dict, servidores_dict))
+    return cursos
+
+# --- Exportación ---
+DumperYAML = getattr(yaml, "CSafeDumper", yaml.SafeDumper)    # Dumper en C (libyaml) si está disponible
+TAMANO_LOTE_EXPORTACION = 500    # Elementos por llamada al dumper YAML
+ID_PROCESO = os.urandom(8).hex()    # Distingue los cursores escritos por este proceso de los de otros
+
+def codigo_alumno(alumno):
+    # El formato de importación exige un código: si el alumno no tiene, se usa su MAC
+    return alumno.codigo if alumno.codigo is not None else alumno.mac
+
+def alumno_a_dict(alumno):
+    d = {"nombre": alumno.nombre, "codigo": codigo_alumno(alumno), "mac": alumno.mac}
+    if alumno.ip:
+        d["ip"] = alumno.ip
+    d["autorizado"] = alumno.autorizado
+    return d
+
+def servidor_a_dict(servidor):
+    d = {"nombre": servidor.nombre, "direccion_ip": servidor.direccion_ip}
+    if servidor.mac:
+        d["mac"] = servidor.mac
+    d["servicios"] = [{"nombre": svc.nombre, "protocolo": svc.protocolo, "puerto": svc.puerto}
+                      for svc in servidor.servicios]
+    return d
+
+def curso_a_dict(curso):
+    return {
+        "nombre": curso.nombre,
+        "estado": curso.estado,
+        "alumnos": [codigo_alumno(a) for a in curso.alumnos.values()],
+        "servidores": [{"nombre": s.nombre, "servicios_permitidos": [svc.nombre for svc in curso.servicios_de(s)]}
+                       for s in curso.servidores],
+    }
+
+def conexion_a_dict(con):
+    return {
+        "handler": con.handler,
+        "alumno": codigo_alumno(con.alumno),
+        "servidor": con.servidor.nombre,
+        "servicio": con.servicio.nombre,
+        "ruta": [[dpid, port] for dpid, port in con.ruta],
+    }
+
+# (sección del YAML, tipo de registro, índice del registro, conversión a dict)
+SECCIONES_EXPORTACION = (
+    ("alumnos", "alumno", lambda: registro.alumnos_por_mac, alumno_a_dict),
+    ("servidores", "servidor", lambda: registro.servidores, servidor_a_dict),
+    ("cursos", "curso", lambda: registro.cursos, curso_a_dict),
+    ("conexiones", "conexion", lambda: registro.conexiones, conexion_a_dict),
+)
+
+def objeto_exportable(tipo, clave):
+    """Devuelve el dict actual del objeto (tipo, clave) o None si ya no existe."""
+    for _, tipo_seccion, indice, a_dict in SECCIONES_EXPORTACION:
+        if tipo_seccion == tipo:
+            obj = indice().get(clave)
+            return a_dict(obj) if obj is not None else None
+    return None
+
+def lotes(iterable, tamano):
+    """Agrupa un iterable en listas de hasta 'tamano' elementos sin materializarlo entero."""
+    lote = []
+    for elemento in iterable:
+        lote.append(elemento)
+        if len(lote) == tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def bloques_yaml():
+    """Genera (texto, objetos) del YAML del estado completo, sección por sección y por lotes."""
+    for seccion, _, indice, a_dict in SECCIONES_EXPORTACION:
+        yield f"{seccion}:\n", 0
+        for lote in lotes(map(a_dict, list(indice().values())), TAMANO_LOTE_EXPORTACION):
+            yield yaml.dump(lote, Dumper=DumperYAML, default_flow_style=False,
+                            sort_keys=False, allow_unicode=True), len(lote)
+
+def linea_jsonl(tipo, d):
+    return json.dumps({"tipo": tipo} | d, ensure_ascii=False) + "\n"
+
+def huella(linea):
+    return hashlib.blake2b(linea.encode(), digest_size=8).hexdigest()
+
+def bloques_jsonl(huellas):
+    """Genera una línea JSON por objeto del estado completo y anota la huella de cada una."""
+    for _, tipo, indice, a_dict in SECCIONES_EXPORTACION:
+        for clave, obj in list(indice().items()):
+            linea = linea_jsonl(tipo, a_dict(obj))
+            huellas[f"{tipo}\t{clave}"] = huella(linea)
+            yield linea, 1
+
+def bloques_jsonl_incrementales(huellas, claves):
+    """Genera sólo los objetos cuyo contenido difiere de su huella, y los borrados."""
+    for tipo, clave in claves:
+        identificador = f"{tipo}\t{clave}"
+        d = objeto_exportable(tipo, clave)
+        if d is None:
+            if huellas.pop(identificador, None) is not None:
+                yield linea_jsonl(tipo, {"clave": clave, "borrado": True}), 1
+            continue
+        linea = linea_jsonl(tipo, d)
+        nueva = huella(linea)
+        if huellas.get(identificador) != nueva:
+            huellas[identificador] = nueva
+            yield linea, 1
+
+def archivo_cursor(destino):
+    return destino + ".cursor"
+
+def origen_registro():
+    """Identifica este registro en este proceso: sólo con el mismo origen sirven sus versiones."""
+    return f"{ID_PROCESO}:{id(registro)}:{registro.generacion}"
+
+def leer_cursor(destino):
+    """Cursor de la última exportación si el archivo sigue como quedó entonces (o None)."""
+    try:
+        with open(archivo_cursor(destino), encoding="utf-8") as f:
+            cursor = json.load(f)
+        st = os.stat(destino)
+    except (OSError, ValueError):
+        return None
+    if (not isinstance(cursor, dict) or not isinstance(cursor.get("huellas"), dict)
+            or cursor.get("tamano") != st.st_size or cursor.get("mtime_ns") != st.st_mtime_ns):
+        return None
+    return cursor
+
+def guardar_cursor(destino, version, huellas):
+    st = os.stat(destino)
+    cursor = {"tamano": st.st_size, "mtime_ns": st.st_mtime_ns, "origen": origen_registro(),
+              "version": version, "huellas": huellas}
+    temporal = f"{archivo_cursor(destino)}.{os.getpid()}.tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump(cursor, f)
+    os.replace(temporal, archivo_cursor(destino))
+
+def exportar(ruta, formato=None, incremental=False):
+    """Escribe el estado en formato de importación YAML o en JSON Lines; devuelve los objetos escritos.
+
+    En JSON Lines, incremental=True agrega al archivo sólo lo que cambió desde la última
+    exportación al mismo archivo (los borrados se escriben con "borrado": true). Lo exportado
+    queda en un cursor junto al archivo (<archivo>.cursor), así que también sirve entre procesos;
+    si el archivo ya no coincide con el cursor se escribe todo de nuevo.
+    """
+    if formato is None:
+        formato = "jsonl" if ruta.endswith((".jsonl", ".ndjson")) else "yaml"
+    if incremental and formato != "jsonl":
+        raise ValueError("La exportación incremental sólo está disponible en JSON Lines.")
+    destino = os.path.abspath(ruta)
+    cursor = leer_cursor(destino) if incremental else None
+    version = registro.version
+    if cursor is None:
+        huellas = {}
+        modo, bloques = "w", (bloques_jsonl(huellas) if formato == "jsonl" else bloques_yaml())
+    else:
+        huellas = cursor["huellas"]
+        if cursor.get("origen") == origen_registro():
+            # Mismo proceso y mismo estado: basta revisar lo que el registro marcó como cambiado
+            claves = registro.cambios_desde(cursor["version"])
+        else:
+            claves = [(tipo, clave) for _, tipo, indice, _ in SECCIONES_EXPORTACION for clave in list(indice())]
+            presentes = {f"{tipo}\t{clave}" for tipo, clave in claves}
+            claves += [tuple(i.split("\t", 1)) for i in huellas if i not in presentes]
+        modo, bloques = "a", bloques_jsonl_incrementales(huellas, claves)
+
+    escritos = 0
+    with open(destino, modo, encoding="utf-8") as f:
+        for texto, objetos in bloques:
+            f.write(texto)
+            escritos += objetos
+    if formato == "jsonl":
+        guardar_cursor(destino, version, huellas)
+    return escritos
+
+# --- Persistencia ---
+DB_CONEXIONES = "conexiones.db"    # Archivo SQLite con las conexiones y sus flows
+almacen = None    # AlmacenConexiones abierto por main()
+
+ESQUEMA_ALMACEN = """
+CREATE TABLE IF NOT EXISTS conexiones (
+    handler TEXT PRIMARY KEY,
+    alumno_mac TEXT NOT NULL,
+    servidor TEXT NOT NULL,
+    servicio TEXT NOT NULL,
+    ruta TEXT NOT NULL,
+    vence REAL
+);
+CREATE TABLE IF NOT EXISTS flows (
+    handler TEXT NOT NULL REFERENCES conexiones(handler) ON DELETE CASCADE,
+    nombre TEXT NOT NULL,
+    dpid TEXT NOT NULL,
+    cuerpo TEXT NOT NULL,
+    PRIMARY KEY (handler, nombre)
+);
+"""
+
+def cuerpo_flow(flow):
+    """Serialización canónica de un flow para comparar si ya está instalado igual."""
+    return json.dumps(flow, sort_keys=True)
+
+class AlmacenConexiones:
+    """Conexiones, rutas y flows instalados guardados en SQLite para reinicios en caliente."""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.db = sqlite3.connect(ruta, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute("PRAGMA foreign_keys=ON")
+            self.db.executescript(ESQUEMA_ALMACEN)
+            columnas = {fila[1] for fila in self.db.execute("PRAGMA table_info(conexiones)")}
+            if "vence" not in columnas:    # Almacenes creados antes de los leases
+                self.db.execute("ALTER TABLE conexiones ADD COLUMN vence REAL")
+
+    def cerrar(self):
+        with self.lock:
+            self.db.close()
+
+    def guardar(self, pares):
+        """Guarda en una sola transacción cada (conexión, flows que aporta a las reglas compiladas)."""
+        filas_flows = []
+        with self.lock, self.db:
+            for con, flows in pares:
+                ruta = json.dumps([[dpid, port] for dpid, port in con.ruta])
+                self.db.execute(
+                    "INSERT OR REPLACE INTO conexiones VALUES (?, ?, ?, ?, ?, ?)",
+                    (con.handler, normalizar_mac(con.alumno.mac), con.servidor.nombre, con.servicio.nombre, ruta,
+                     con.vence),
+                )
+                self.db.execute("DELETE FROM flows WHERE handler = ?", (con.handler,))
+                filas_flows.extend((con.handler, f['name'], f['switch'], cuerpo_flow(f)) for f in flows)
+            self.db.executemany("INSERT OR REPLACE INTO flows VALUES (?, ?, ?, ?)", filas_flows)
+
+    def actualizar_ruta(self, con):
+        ruta = json.dumps([[dpid, port] for dpid, port in con.ruta])
+        with self.lock, self.db:
+            self.db.execute("UPDATE conexiones SET ruta = ? WHERE handler = ?", (ruta, con.handler))
+
+    def renovar(self, conexiones):
+        """Guarda el nuevo fin de lease de varias conexiones en una sola transacción."""
+        with self.lock, self.db:
+            self.db.executemany("UPDATE conexiones SET vence = ? WHERE handler = ?",
+                                [(con.vence, con.handler) for con in conexiones])
+
+    def eliminar(self, handler):
+        """Borra la conexión y sus flows registrados."""
+        self.eliminar_varias([handler])
+
+    def eliminar_varias(self, handlers):
+        """Borra en una sola transacción varias conexiones y sus flows registrados."""
+        with self.lock, self.db:
+            self.db.executemany("DELETE FROM conexiones WHERE handler = ?", [(h,) for h in handlers])
+
+    def aportes_por_handler(self):
+        """Devuelve handler -> flows guardados de la conexión."""
+        aportes = {}
+        with self.lock:
+            for handler, cuerpo in self.db.execute("SELECT handler, cuerpo FROM flows ORDER BY rowid"):
+                aportes.setdefault(handler, []).append(json.loads(cuerpo))
+        return aportes
+
+    def filas(self):
+        """Devuelve (handler, alumno_mac, servidor, servicio, ruta JSON, vence) de todas las conexiones."""
+        with self.lock:
+            return self.db.execute(
+                "SELECT handler, alumno_mac, servidor, servicio, ruta, vence FROM conexiones"
+            ).fetchall()
+
+def abrir_almacen(ruta=DB_CONEXIONES):
+    """Abre (o crea) el almacén persistente de conexiones."""
+    global almacen
+    try:
+        almacen = AlmacenConexiones(ruta)
+    except sqlite3.Error as exc:
+        print(f"No se pudo abrir el almacén '{ruta}': {exc}")
+        almacen = None
+    return almacen
+
+def numero_handler(handler):
+    numero = handler[3:] if handler.startswith("con") else ""
+    return int(numero) if numero.isdigit() else 0
+
+def restaurar_conexiones():
+    """Registra las conexiones guardadas sin volver a instalar sus flows; devuelve (restauradas, omitidas)."""
+    global ultimo_handler
+    restauradas = omitidas = 0
+    aportes = almacen.aportes_por_handler()
+    for handler, mac, nombre_srv, nombre_svc, ruta, vence in almacen.filas():
+        # Aunque no se pueda restaurar, su número no debe reutilizarse
+        ultimo_handler = max(ultimo_handler, numero_handler(handler))
+        if registro.conexion(handler):
+            continue
+        alumno = registro.alumno_por_mac(mac)
+        servidor = registro.servidor(nombre_srv)
+        servicio = registro.servicio(nombre_srv, nombre_svc)
+        if not (alumno and servidor and servicio):
+            omitidas += 1
+            continue
+        flows = aportes.get(handler, [])
+        compilador.restaurar(handler, flows)
+        registro.agregar_conexion(Conexion(handler, alumno, servidor, servicio, json.loads(ruta),
+                                           [f['name'] for f in flows], vence))
+        restauradas += 1
+    return restauradas, omitidas
+
+# --- Operaciones de conexiones ---
+ultimo_handler = 0    # Último número usado en los handlers conN
+
+handler_lock = threading.Lock()
+
+def nuevo_handler():
+    """Devuelve un handler de conexión que no se ha usado antes."""
+    global ultimo_handler
+    with handler_lock:
+        ultimo_handler += 1
+        return f"con{ultimo_handler}"
+
+def registrar_conexiones(pares):
+    """Agrega al registro y guarda en el almacén cada (conexión, flows compilados que aporta)."""
+    vence = time.time() + LEASE_DURACION if LEASE_DURACION else None
+    for con, flows in pares:
+        con.flows = tuple(f['name'] for f in flows)
+        con.vence = vence
+        registro.agregar_conexion(con)
+    if almacen:
+        almacen.guardar(pares)
+
+def flows_de_ruta(con, ruta, ip_src):
+    """Genera los flows de la conexión para una ruta en el formato completo de /wm/topology/route."""
+    proto_l4 = 6 if con.servicio.protocolo.upper() == "TCP" else 17
+    return generar_flows(ruta, ruta[0][1], ruta[-1][1], con.alumno.mac, ip_src,
+                         con.servidor.mac, con.servidor.direccion_ip, proto_l4, 0, con.servicio.puerto,
+                         con.handler)
+
+class ResultadoActualizacion:
+    """Flows instalados y borrados al mover una conexión a una ruta nueva."""
+
+    def __init__(self, conexion, altas=None, bajas=None, sin_cambios=0, error=None):
+        self.conexion = conexion
+        self.altas = altas or ReporteFlows()    # Flows nuevos o modificados
+        self.bajas = bajas or ReporteFlows()    # Flows de hops que dejaron la ruta
+        self.sin_cambios = sin_cambios    # Reglas de la conexión que no se tocaron
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def resumen(self):
+        return (f"{len(self.altas.exitosos)}/{len(self.altas.resultados)} flows instalados, "
+                f"{len(self.bajas.exitosos)}/{len(self.bajas.resultados)} borrados, "
+                f"{self.sin_cambios} sin cambios")
+
+@metricas.fase("actualizar_conexion")
+def actualizar_conexion(con, nueva=None):
+    """Mueve la conexión a la ruta actual tocando sólo los flows de los hops que cambian."""
+    nueva = nueva or calcular_ruta(con.alumno, con.servidor, con.servicio, con.ruta)
+    if not nueva:
+        return ResultadoActualizacion(con, error="No se pudo calcular la ruta.")
+    ip_src = con.alumno.ip or get_ipv4(controller_ip, con.alumno.mac)
+    if not ip_src:
+        return ResultadoActualizacion(con, error="No se pudo determinar la IP del alumno.")
+
+    # El compilador compara con las reglas que la conexión ya usaba: sólo cambian los hops distintos
+    compilacion = compilador.reemplazar(con.handler, flows_de_ruta(con, nueva, ip_src))
+    sin_cambios = len(compilacion.aportes) - len(compilacion.enviar)
+
+    # Primero se instala la ruta nueva y luego se retiran los hops sobrantes
+    altas = flow_pusher.instalar(controller_ip, compilacion.enviar, compilacion.secuencia)
+    if not altas.ok:
+        # La ruta nueva quedó a medias: se vuelve a las reglas de la anterior y se deshace lo enviado
+        previa = compilador.reemplazar(con.handler, flows_de_ruta(con, con.ruta, ip_src) if con.ruta else [])
+        deshecho = flow_pusher.desinstalar(controller_ip, previa.borrar, previa.secuencia)
+        repuesto = flow_pusher.instalar(controller_ip, previa.enviar, previa.secuencia)
+        bajas = ReporteFlows(deshecho.resultados + repuesto.resultados, deshecho.duracion + repuesto.duracion)
+        metricas.contar("flows", len(altas.fallidos) + len(bajas.fallidos), resultado="error")
+        error = f"{len(altas.fallidos)} flows no se pudieron instalar; la conexión sigue en su ruta anterior."
+        if not bajas.ok:
+            error += " No se pudo deshacer todo lo enviado: conviene reconciliar."
+        return ResultadoActualizacion(con, altas, bajas, sin_cambios, error)
+    bajas = flow_pusher.desinstalar(controller_ip, compilacion.borrar, compilacion.secuencia)
+
+    registro.actualizar_ruta(con, nueva)
+    con.flows = compilacion.nombres
+    if almacen:
+        almacen.guardar([(con, compilacion.aportes)])
+    metricas.contar("flows", len(altas.exitosos), resultado="ok")
+    metricas.contar("flows", len(altas.fallidos) + len(bajas.fallidos), resultado="error")
+    metricas.contar("flows_borrados", len(bajas.exitosos))
+    error = None if bajas.ok else f"{len(bajas.fallidos)} flows no se pudieron borrar."
+    return ResultadoActualizacion(con, altas, bajas, sin_cambios, error)
+
+# --- Vigilancia de topología ---
+INTERVALO_VIGILANCIA = 2    # Segundos entre consultas de switches y enlaces
+PATH_SWITCHES = '/wm/core/controller/switches/json'
+PATH_LINKS = '/wm/topology/links/json'
+
+def descargar_crudo(controller_ip, path):
+    """GET sin mensajes por pantalla que devuelve el cuerpo en bytes (o None si falla)."""
+    try:
+        r = peticion(controller_ip, "GET", f'http://{controller_ip}:8080{path}', path, timeout=TIMEOUT_HTTP)
+    except requests.RequestException:
+        return None
+    return r.content if r.status_code == 200 else None
+
+def descargar_crudos(controller_ip, path):
+    """Cuerpos del mismo path en cada controlador (o None si alguno falla)."""
+    crudos = controladores.en_paralelo(lambda ip: descargar_crudo(ip, path), controladores.todos(controller_ip))
+    return None if any(c is None for c in crudos) else crudos
+
+def enlaces_de(links):
+    return {(str(l['src-switch']), l['src-port'], str(l['dst-switch']), l['dst-port']) for l in links}
+
+def switches_de(switches):
+    return {str(sw.get('switchDPID') or sw.get('dpid')) for sw in switches}
+
+class TareaPeriodica:
+    """Ejecuta revisar() cada 'intervalo' segundos en un hilo en segundo plano."""
+
+    nombre = "tarea-periodica"
+
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.hilo = None
+        self.detenido = threading.Event()
+
+    def activo(self):
+        return self.hilo is not None and self.hilo.is_alive()
+
+    def iniciar(self):
+        if self.activo():
+            return
+        self.detenido.clear()
+        self.hilo = threading.Thread(target=self.ciclo, name=self.nombre, daemon=True)
+        self.hilo.start()
+
+    def detener(self):
+        self.detenido.set()
+        if self.hilo is not None:
+            self.hilo.join()
+            self.hilo = None
+
+    def ciclo(self):
+        while not self.detenido.wait(self.intervalo):
+            self.revisar()
+
+    def revisar(self):
+        raise NotImplementedError
+
+class VigilanteTopologia(TareaPeriodica):
+    """Hilo que detecta cambios de enlaces y switches y recalcula sólo las conexiones afectadas.
+
+    Cada consulta compara un hash de las respuestas; sólo si cambió se arma el conjunto de
+    enlaces y se buscan, con el índice (dpid, puerto) del registro, las conexiones que pasaban
+    por un enlace o switch que desapareció.
+    """
+
+    nombre = "vigilante-topologia"
+
+    def __init__(self, intervalo=INTERVALO_VIGILANCIA):
+        super().__init__(intervalo)
+        self.huella = None    # Hash de la última respuesta de switches + enlaces
+        self.enlaces = None    # {(dpid, puerto, dpid, puerto)} vistos en la última consulta
+        self.switches = None
+        self.eventos = deque(maxlen=100)    # (instante, handler, resultado) de los últimos recálculos
+
+    def afectadas(self, enlaces, switches):
+        """Conexiones que usan un enlace o switch presente antes y ausente ahora."""
+        conexiones = {}
+        if self.enlaces is None:
+            return conexiones
+        for a, pa, b, pb in self.enlaces - enlaces:
+            for con in registro.conexiones_en_puerto(a, pa) + registro.conexiones_en_puerto(b, pb):
+                conexiones[con.handler] = con
+        for dpid in self.switches - switches:
+            for con in registro.conexiones_en_switch(dpid):
+                conexiones[con.handler] = con
+        return conexiones
+
+    def revisar(self):
+        """Hace una consulta; si la topología cambió recalcula las conexiones afectadas y devuelve cuántas."""
+        ip = controller_ip
+        crudo_switches = descargar_crudos(ip, PATH_SWITCHES)
+        crudo_links = descargar_crudos(ip, PATH_LINKS)
+        if crudo_switches is None or crudo_links is None:
+            return 0
+        huella = hashlib.sha1(b"\0".join(crudo_switches + crudo_links)).digest()
+        if huella == self.huella:
+            return 0
+        listas = [json.loads(c) for c in crudo_switches]
+        for ip_controlador, lista in zip(controladores.todos(ip), listas):
+            controladores.aprender(ip_controlador, lista)
+        switches, links = combinar_topologias(listas, [json.loads(c) for c in crudo_links])
+        enlaces, nodos = enlaces_de(links), switches_de(switches)
+        # El grafo local se actualiza con la misma descarga antes de recalcular; un cambio de
+        # topología puede mover hosts, así que sus attachment points se vuelven a pedir
+        topologia.actualizar(ip, switches, links)
+        cache_dispositivos.invalidar(ip)
+        conexiones = self.afectadas(enlaces, nodos)
+        self.huella, self.enlaces, self.switches = huella, enlaces, nodos
+        metricas.contar("topologia_cambios")
+        # Se encolan sin esperar: si la topología vuelve a cambiar antes de que se ejecuten, los
+        # recálculos repetidos de una misma conexión se fusionan en uno
+        for con in conexiones.values():
+            planificador.actualizar(con).add_done_callback(
+                lambda futuro, handler=con.handler: self.registrar(handler, futuro))
+        metricas.contar("conexiones_recalculadas", len(conexiones))
+        return len(conexiones)
+
+    def registrar(self, handler, futuro):
+        if futuro.cancelled():
+            detalle = "recálculo descartado: la conexión se eliminó"
+        elif futuro.exception() is not None:
+            detalle = f"error: {futuro.exception()}"
+        else:
+            resultado = futuro.result()
+            detalle = resultado.error or resultado.resumen()
+        self.eventos.append((time.time(), handler, detalle))
+
+vigilante = VigilanteTopologia()    # Vigilancia en segundo plano, se activa desde el menú de conexiones
+
+# --- Reconciliación de flows ---
+INTERVALO_RECONCILIACION = 60    # Segundos entre reconciliaciones en el modo periódico
+PATH_LISTA_FLOWS = '/wm/staticflowpusher/list/all/json'
+PATRON_FLOWS_PROPIOS = re.compile(r"^(fwd|rev|arp_fwd|arp_rev|dst)_[0-9a-f]{12}$")    # Nombres de nombre_regla(); otros flows no se tocan
+
+def flows_en_controlador(controller_ip):
+    """Descarga los flows estáticos de todos los switches (de cada controlador): {nombre: dpid} o None."""
+    listas = controladores.en_paralelo(lambda ip: descargar_json(ip, PATH_LISTA_FLOWS),
+                                       controladores.todos(controller_ip))
+    if any(datos is None for datos in listas):
+        return None
+    instalados = {}
+    for dpid, entradas in (par for datos in listas for par in datos.items()):
+        # Floodlight devuelve por switch una lista de {nombre: flow} (o un único diccionario)
+        if isinstance(entradas, dict):
+            entradas = [entradas]
+        for entrada in entradas:
+            for nombre in entrada:
+                instalados[nombre] = str(dpid)
+    return instalados
+
+class ReporteReconciliacion:
+    """Diferencias entre los flows esperados y los instalados, y lo que se corrigió."""
+
+    def __init__(self):
+        self.esperados = 0    # Reglas que deberían estar instaladas según las conexiones
+        self.revisados = 0    # Flows propios encontrados en el controlador
+        self.faltantes = []    # Flows esperados ausentes (o en otro switch)
+        self.huerfanos = []    # Flows propios que ninguna conexión usa
+        self.reparados = ReporteFlows()
+        self.borrados = ReporteFlows()
+        self.descarga = 0.0    # Segundos de la consulta de la lista de flows
+        self.duracion = 0.0
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.reparados.ok and self.borrados.ok
+
+    def resumen(self):
+        if self.error:
+            return self.error
+        return (f"{self.revisados} flows revisados ({self.esperados} esperados): "
+                f"{len(self.faltantes)} faltantes, {len(self.huerfanos)} huérfanos; "
+                f"{len(self.reparados.exitosos)} reinstalados, {len(self.borrados.exitosos)} borrados; "
+                f"descarga {self.descarga:.3f} s, total {self.duracion:.3f} s")
+
+@metricas.fase("reconciliar")
+def reconciliar(reparar=True):
+    """Compara los flows del controlador con los de las conexiones y, si se pide, corrige la diferencia."""
+    inicio = time.perf_counter()
+    reporte = ReporteReconciliacion()
+    instalados = flows_en_controlador(controller_ip)
+    reporte.descarga = time.perf_counter() - inicio
+    if instalados is None:
+        reporte.error = "No se pudo descargar la lista de flows del controlador."
+        return reporte
+
+    esperados = {f['name']: f for f in compilador.flows()}
+    propios = {nombre: dpid for nombre, dpid in instalados.items() if PATRON_FLOWS_PROPIOS.match(nombre)}
+    reporte.esperados, reporte.revisados = len(esperados), len(propios)
+    ausentes = esperados.keys() - propios.keys()
+    movidos = {n for n in esperados.keys() & propios.keys() if propios[n] != str(esperados[n]['switch'])}
+    reporte.faltantes = [esperados[n] for n in ausentes | movidos]
+    reporte.huerfanos = [{'name': n, 'switch': propios[n]} for n in propios.keys() - esperados.keys()]
+
+    if reparar:
+        reporte.reparados = flow_pusher.instalar(controller_ip, reporte.faltantes)
+        reporte.borrados = flow_pusher.desinstalar(controller_ip, reporte.huerfanos)
+    metricas.contar("flows_faltantes", len(reporte.faltantes))
+    metricas.contar("flows_huerfanos", len(reporte.huerfanos))
+    reporte.duracion = time.perf_counter() - inicio
+    return reporte
+
+class ReconciliadorPeriodico(TareaPeriodica):
+    """Reconciliación automática cada cierto intervalo; guarda el último reporte."""
+
+    nombre = "reconciliador"
+
+    def __init__(self, intervalo=INTERVALO_RECONCILIACION):
+        super().__init__(intervalo)
+        self.ultimo = None    # ReporteReconciliacion de la última pasada
+
+    def revisar(self):
+        self.ultimo = reconciliar()
+        return self.ultimo
+
+reconciliador = ReconciliadorPeriodico()    # Modo periódico, se activa desde el menú de conexiones
+
+# --- Leases de flows ---
+MARGEN_RENOVACION = 0.5    # Fracción del lease entre renovaciones (debe quedar margen antes del hard_timeout)
+RENOVACIONES_PARALELAS = MAX_CONEXIONES_HTTP    # Lotes renovados a la vez
+LOTE_RENOVACION = 32    # Flows por lote; cada lote es de un solo switch y sus flows van en serie
+INTERVALO_LIMPIEZA = 60    # Segundos entre limpiezas cuando los flows son permanentes
+
+def lease_vigente(con):
+    """El lease se renueva mientras las entidades sigan registradas y la política permita la conexión."""
+    return (registro.alumno_por_mac(con.alumno.mac) is not None
+            and registro.servicio(con.servidor.nombre, con.servicio.nombre) is not None
+            and politicas.permite(con.alumno, con.servidor, con.servicio))
+
+class ReporteLeases:
+    """Resultado de una pasada del renovador."""
+
+    def __init__(self):
+        self.renovadas = []    # Conexiones cuyo lease se extendió
+        self.pendientes = []    # Conexiones vigentes con flows que no se pudieron renovar (se reintenta)
+        self.expiradas = []    # Handlers de conexiones vencidas o huérfanas que se limpiaron
+        self.flows = ReporteFlows()
+        self.switches = 0
+        self.duracion = 0.0
+
+    def resumen(self):
+        return (f"{len(self.renovadas)} leases renovados ({len(self.flows.exitosos)}/{len(self.flows.resultados)} "
+                f"flows en {self.switches} switches), {len(self.pendientes)} pendientes, "
+                f"{len(self.expiradas)} conexiones expiradas limpiadas; total {self.duracion:.3f} s")
+
+class RenovadorLeases(TareaPeriodica):
+    """Renueva los flows de las conexiones vigentes y limpia las vencidas o huérfanas.
+
+    Cada pasada reinstala, agrupadas por switch, sólo las reglas que usa alguna conexión
+    vigente: así ninguna llega a su hard_timeout mientras la conexión exista. Reinstalar es
+    borrar y volver a agregar, porque reenviar la misma regla es un MODIFY_STRICT y OpenFlow
+    no reinicia el hard_timeout de una regla modificada. Las reglas de
+    conexiones que ya no corresponden (alumno retirado, curso inactivo) dejan de renovarse,
+    el switch las retira solo y, al vencer el lease, la conexión se elimina del registro.
+    """
+
+    nombre = "renovador-leases"
+
+    def __init__(self):
+        super().__init__(INTERVALO_LIMPIEZA)
+        self.ultimo = None    # ReporteLeases de la última pasada
+        self.executor = ThreadPoolExecutor(max_workers=RENOVACIONES_PARALELAS, thread_name_prefix="renovacion")
+
+    def iniciar(self):
+        self.intervalo = max(1, LEASE_DURACION * MARGEN_RENOVACION) if LEASE_DURACION else INTERVALO_LIMPIEZA
+        super().iniciar()
+
+    def ciclo(self):
+        # La primera pasada es inmediata: tras un reinicio los leases guardados pueden estar por vencer
+        self.revisar()
+        super().ciclo()
+
+    def reinstalar(self, flow):
+        """Borra el flow y lo vuelve a agregar para que su hard_timeout empiece de nuevo."""
+        baja = flow_pusher.quitar(controller_ip, flow['name'], flow['switch'])
+        return flow_pusher.enviar(controller_ip, flow) if baja.ok else baja
+
+    def instalar_por_switch(self, flows):
+        """Reinstala los flows en lotes de un solo switch; devuelve (ReporteFlows, switches)."""
+        por_switch = {}
+        for flow in flows:
+            por_switch.setdefault(flow['switch'], []).append(flow)
+        # Un switch con muchas reglas se reparte en varios lotes para no quedar como cola única
+        partes = [parte for lote in por_switch.values() for parte in lotes(lote, LOTE_RENOVACION)]
+        inicio = time.perf_counter()
+        enviados = self.executor.map(lambda parte: [self.reinstalar(f) for f in parte], partes)
+        resultados = [r for parte in enviados for r in parte]
+        return ReporteFlows(resultados, time.perf_counter() - inicio), len(por_switch)
+
+    def hacer_permanentes(self):
+        """Reinstala sin timeouts los flows de las conexiones vigentes; devuelve su ReporteFlows.
+
+        Se usa al detener la renovación, con LEASE_DURACION ya en 0: las conexiones que ya no
+        corresponden conservan su lease y sus flows vencen en el switch.
+        """
+        with registro.lock:
+            vigentes = [con for con in registro.conexiones.values() if lease_vigente(con)]
+        nombres = {nombre for con in vigentes for nombre in con.flows}
+        reporte, _ = self.instalar_por_switch([f for f in compilador.flows() if f['name'] in nombres])
+        fallidos = {r.nombre for r in reporte.fallidos}
+        permanentes = [con for con in vigentes if fallidos.isdisjoint(con.flows)]
+        for con in permanentes:
+            con.vence = None
+        if almacen and permanentes:
+            almacen.renovar(permanentes)
+        return reporte
+
+    @metricas.fase("renovar_leases")
+    def revisar(self):
+        inicio = time.perf_counter()
+        reporte = ReporteLeases()
+        ahora = time.time()
+        with registro.lock:
+            conexiones = list(registro.conexiones.values())
+        vigentes, vencidas = [], []
+        for con in conexiones:
+            if lease_vigente(con):
+                vigentes.append(con)
+            elif con.vence is None or con.vence <= ahora:
+                # Huérfana (sin lease que esperar) o con el lease ya vencido
+                vencidas.append(con)
+        if vencidas:
+            reporte.expiradas, _ = eliminar_conexiones(vencidas)
+
+        if LEASE_DURACION and vigentes:
+            nombres = {nombre for con in vigentes for nombre in con.flows}
+            reporte.flows, reporte.switches = self.instalar_por_switch(
+                [f for f in compilador.flows() if f['name'] in nombres])
+            fallidos = {r.nombre for r in reporte.flows.fallidos}
+            vence = ahora + LEASE_DURACION
+            for con in vigentes:
+                if fallidos.isdisjoint(con.flows):
+                    con.vence = vence
+                    reporte.renovadas.append(con)
+                else:
+                    reporte.pendientes.append(con)
+            if almacen and reporte.renovadas:
+                almacen.renovar(reporte.renovadas)
+
+        metricas.contar("leases_renovados", len(reporte.renovadas))
+        metricas.contar("conexiones_expiradas", len(reporte.expiradas))
+        reporte.duracion = time.perf_counter() - inicio
+        self.ultimo = reporte
+        return reporte
+
+renovador = RenovadorLeases()    # Se inicia solo con --lease, o desde el menú de conexiones
+
+class ResultadoConexion:
+    """Resultado de crear una conexión (alumno, servidor, servicio)."""
+
+    def __init__(self, alumno, servidor, servicio, conexion=None, error=None, reporte=None):
+        self.alumno = alumno
+        self.servidor = servidor
+        self.servicio = servicio
+        self.conexion = conexion    # Conexion registrada o None si no se pudo crear
+        self.error = error    # Motivo del fallo, si lo hubo
+        self.reporte = reporte    # ReporteFlows de la instalación de sus flows
+
+    @property
+    def ok(self):
+        return self.error is None
+
+class ReporteProvision:
+    """Resultados por tupla de un aprovisionamiento masivo y su tiempo total."""
+
+    def __init__(self, resultados, duracion, reporte_flows=None):
+        self.resultados = resultados
+        self.duracion = duracion    # Tiempo de pared en segundos
+        self.reporte_flows = reporte_flows or ReporteFlows()
+
+    def resumen(self):
+        exitosas = sum(1 for r in self.resultados if r.ok)
+        return (f"{exitosas}/{len(self.resultados)} conexiones creadas en {self.duracion:.3f} s; "
+                f"{self.reporte_flows.resumen()}")
+
+def preparar_conexion(alumno, servidor, servicio, handler=None):
+    """Resuelve attachment points, ruta e IP y genera los flows; devuelve (ruta, flows, error)."""
+    return cliente.preparar_conexion(alumno, servidor, servicio, handler)
+
+@metricas.fase("crear_conexion")
+def crear_conexion(alumno, servidor, servicio):
+    """Instala los flows (ambos sentidos) y registra la conexión; devuelve un ResultadoConexion."""
+    if not politicas.permite(alumno, servidor, servicio):
+        metricas.contar("conexiones", resultado="denegada")
+        return ResultadoConexion(alumno, servidor, servicio, error=politicas.motivo(alumno, servidor, servicio))
+    # El handler se reserva antes para que los nombres de los flows lo incluyan
+    handler = nuevo_handler()
+    with metricas.medir("fase_segundos", fase="preparar"):
+        ruta, flows, error = preparar_conexion(alumno, servidor, servicio, handler)
+    if error:
+        metricas.contar("conexiones", resultado="error")
+        return ResultadoConexion(alumno, servidor, servicio, error=error)
+
+    # INSTALA LOS FLOWS EN LA RED (AMBOS SENTIDOS): sólo las reglas nuevas o modificadas
+    compilacion = compilador.reemplazar(handler, flows)
+    reporte = flow_pusher.instalar(controller_ip, compilacion.enviar, compilacion.secuencia)
+
+    # CREA LA CONEXIÓN EN EL SISTEMA
+    con = Conexion(handler, alumno, servidor, servicio, ruta)
+    with metricas.medir("fase_segundos", fase="registrar"):
+        registrar_conexiones([(con, compilacion.aportes)])
+    error = None if reporte.ok else f"{len(reporte.fallidos)} flows no se pudieron instalar."
+    metricas.contar("conexiones", resultado="ok" if reporte.ok else "incompleta")
+    metricas.contar("flows", len(reporte.exitosos), resultado="ok")
+    metricas.contar("flows", len(reporte.fallidos), resultado="error")
+    return ResultadoConexion(alumno, servidor, servicio, con, error, reporte)
+
+def expandir_curso(curso):
+    """Genera las tuplas (alumno, servidor, servicio) de los alumnos autorizados del curso."""
+    for alumno in curso.alumnos.values():
+        if not alumno.esta_autorizado():
+            continue
+        for servidor in curso.servidores:
+            for servicio in curso.servicios_de(servidor):
+                yield alumno, servidor, servicio
+
+def precargar_curso(curso):
+    """Una sola descarga de dispositivos y de topología para todas las conexiones del curso."""
+    cache_dispositivos.refrescar(controller_ip)
+    if topologia.asegurar(controller_ip):
+        for servidor in curso.servidores:
+            dpid_dst, _ = get_attachment_points(controller_ip, servidor.mac)
+            if dpid_dst:
+                topologia.precalcular(dpid_dst)
+
+@metricas.fase("provisionar_curso")
+def provisionar_curso(curso):
+    """Crea todas las conexiones del curso con un único envío concurrente de flows."""
+    inicio = time.perf_counter()
+    tuplas = list(expandir_curso(curso))
+    precargar_curso(curso)
+
+    resultados = []
+    por_preparar = []
+    for alumno, servidor, servicio in tuplas:
+        resultado = ResultadoConexion(alumno, servidor, servicio)
+        resultados.append(resultado)
+        existente = registro.conexion_existente(alumno, servidor, servicio)
+        if existente:
+            # Ya aprovisionada (por ejemplo, restaurada del almacén): no se repite
+            resultado.conexion = existente
+        elif not politicas.permite(alumno, servidor, servicio):
+            resultado.error = politicas.motivo(alumno, servidor, servicio)
+        else:
+            por_preparar.append(resultado)
+
+    # Attachment points, IPs y rutas de todas las tuplas se resuelven en paralelo
+    with metricas.medir("fase_segundos", fase="preparar"):
+        handlers = [nuevo_handler() for _ in por_preparar]
+        preparaciones = cliente.preparar_conexiones(
+            [(r.alumno, r.servidor, r.servicio, h) for r, h in zip(por_preparar, handlers)])
+
+    preparadas = []    # (resultado, handler, ruta, Compilacion)
+    flows = []
+    for resultado, handler, (ruta, flows_tupla, error) in zip(por_preparar, handlers, preparaciones):
+        if error:
+            resultado.error = error
+        else:
+            compilacion = compilador.reemplazar(handler, flows_tupla)
+            preparadas.append((resultado, handler, ruta, compilacion))
+            flows.extend(compilacion.enviar)
+
+    # Todos los flows del curso viajan en el mismo lote concurrente; una regla compartida que
+    # creció con varias conexiones se envía una sola vez, en su versión final
+    reporte = flow_pusher.instalar(controller_ip, unicos(flows))
+    por_nombre = {r.nombre: r for r in reporte.resultados}
+
+    pares = []
+    for resultado, handler, ruta, compilacion in preparadas:
+        resultado.reporte = ReporteFlows(list({f['name']: por_nombre[f['name']] for f in compilacion.enviar}.values()))
+        con = Conexion(handler, resultado.alumno, resultado.servidor, resultado.servicio, ruta)
+        pares.append((con, compilacion.aportes))
+        resultado.conexion = con
+        if not resultado.reporte.ok:
+            resultado.error = f"{len(resultado.reporte.fallidos)} flows no se pudieron instalar."
+    with metricas.medir("fase_segundos", fase="registrar"):
+        registrar_conexiones(pares)
+    for resultado in resultados:
+        if resultado.conexion is None or resultado.error:
+            metricas.contar("conexiones", resultado="error")
+        elif resultado.reporte is not None:
+            metricas.contar("conexiones", resultado="ok")
+    metricas.contar("flows", len(reporte.exitosos), resultado="ok")
+    metricas.contar("flows", len(reporte.fallidos), resultado="error")
+
+    return ReporteProvision(resultados, time.perf_counter() - inicio, reporte)
+
+@metricas.fase("eliminar_conexiones")
+def eliminar_conexiones(conexiones):
+    """Retira las conexiones y ajusta la red en un solo lote concurrente.
+
+    Sólo se borran las reglas que ninguna otra conexión usa; las reglas compartidas cuyas
+    salidas cambian se reenvían. Una conexión sale del compilador, del registro y del almacén
+    sólo si funcionaron todos los DELETE y reenvíos que la involucran; si no, se conserva con
+    sus reglas para poder reintentar. Devuelve (handlers eliminados, ReporteFlows de los requests).
+    """
+    conexiones = list(conexiones)
+    plan, involucradas = compilador.simular_retiro([con.handler for con in conexiones])
+    inicio = time.perf_counter()
+    borrado = flow_pusher.desinstalar(controller_ip, plan.borrar, plan.secuencia)
+    reenvio = flow_pusher.instalar(controller_ip, plan.enviar, plan.secuencia) if plan.enviar else ReporteFlows()
+    reporte = ReporteFlows(borrado.resultados + reenvio.resultados, time.perf_counter() - inicio)
+    fallidos = {r.nombre for r in reporte.fallidos}
+    eliminadas = [con.handler for con in conexiones if not involucradas.get(con.handler, set()) & fallidos]
+    retiro = compilador.retirar_varias(eliminadas)
+
+    # Otro trabajo pudo cambiar esas reglas desde la simulación (por ejemplo, retirar en paralelo
+    # otra conexión que las comparte): se envía lo que el estado final pide y el plan no hizo
+    enviados = {f['name']: cuerpo_flow(f) for f in plan.enviar}
+    borrados = {f['name'] for f in plan.borrar}
+    sobrantes = [f for f in retiro.borrar if f['name'] not in borrados]
+    pendientes = [f for f in retiro.enviar if enviados.get(f['name']) != cuerpo_flow(f)]
+    if sobrantes:
+        extra = flow_pusher.desinstalar(controller_ip, sobrantes, retiro.secuencia)
+        borrado.resultados.extend(extra.resultados)
+        reporte.resultados.extend(extra.resultados)
+    if pendientes:
+        reporte.resultados.extend(flow_pusher.instalar(controller_ip, pendientes, retiro.secuencia).resultados)
+    for handler in eliminadas:
+        registro.remover_conexion(handler)
+    if almacen:
+        almacen.eliminar_varias(eliminadas)
+    metricas.contar("flows_borrados", len(borrado.exitosos))
+    metricas.contar("flows", len(reporte.fallidos), resultado="error")
+    return eliminadas, reporte
+
+def conexiones_de_curso(curso):
+    """Conexiones de los alumnos del curso hacia los servidores del curso."""
+    servidores = {s.nombre for s in curso.servidores}
+    return [con for alumno in curso.alumnos.values()
+            for con in registro.conexiones_de_alumno(alumno) if con.servidor.nombre in servidores]
+
+# --- Planificador de trabajos ---
+PRIORIDADES = {"borrar": 0, "crear": 1, "actualizar": 2, "recalcular": 3}    # Menor número: antes
+TRABAJADORES_PLANIFICADOR = 8    # Trabajos ejecutándose a la vez
+MAX_PENDIENTES = 1024    # Trabajos en cola antes de que enviar() espere (contrapresión)
+ESPERA_LOTE_FLOWS = 0.02    # Segundos que se juntan flows de varios trabajos antes de enviarlos
+LOTE_SWITCH = 32    # Flows de un mismo switch por lote dentro de un envío agrupado
+LIMITE_POR_CONTROLADOR = 0    # Requests de escritura por segundo a cada controlador (0: sin límite)
+
+contexto_trabajo = threading.local()    # agrupar=True en los hilos del planificador
+
+class LimitadorTasa:
+    """Cubeta de tokens por controlador para los POST y DELETE del staticflowpusher."""
+
+    def __init__(self, tasa=LIMITE_POR_CONTROLADOR):
+        self.tasa = tasa    # Requests por segundo (0: sin límite)
+        self.cubetas = {}    # ip -> (tokens, instante de la última recarga)
+        self.esperas = 0    # Veces que un request tuvo que esperar su turno
+        self.lock = threading.Lock()
+
+    def esperar(self, ip):
+        if not self.tasa:
+            return
+        rafaga = max(1.0, self.tasa)
+        while True:
+            with self.lock:
+                ahora = time.monotonic()
+                tokens, instante = self.cubetas.get(ip, (rafaga, ahora))
+                tokens = min(rafaga, tokens + (ahora - instante) * self.tasa)
+                if tokens >= 1:
+                    self.cubetas[ip] = (tokens - 1, ahora)
+                    return
+                self.cubetas[ip] = (tokens, ahora)
+                self.esperas += 1
+                falta = (1 - tokens) / self.tasa
+            time.sleep(falta)
+
+limitador = LimitadorTasa()
+
+class AgrupadorFlows:
+    """Junta los envíos y borrados de flows de varios trabajos y los despacha por switch.
 
-        for flow in (fwd, rev, arp_fwd, arp_rev):
-            resp = requests.post(url, json=flow)
-            if resp.status_code == 200:
-                print(f"Flow {flow['name']} instalado en {dpid}")
+    Si dos trabajos tocan el mismo flow antes del despacho sólo viaja la última operación
+    (la versión final del flow o su borrado) y todos los que esperaban reciben ese resultado.
+    "Última" es la de la compilación más reciente, no la que llegó después: una operación
+    compilada antes que otra ya encolada o despachada no viaja y recibe el resultado de esa.
+    Mientras un lote se despacha, el siguiente se sigue juntando.
+    """
+
+    def __init__(self, espera=ESPERA_LOTE_FLOWS):
+        self.espera = espera
+        self.pendientes = {}    # nombre -> [acción, flow o None, dpid, ip, [Future]]
+        self.ultimas = {}    # nombre -> (secuencia, Future) de la operación más reciente (una por regla)
+        self.cond = threading.Condition()
+        self.hilo = None
+        self.fusionados = 0    # Operaciones que no viajaron porque otra posterior las reemplazó
+        self.despachados = 0
+        self.lotes = 0
+
+    def agregar(self, controller_ip, accion, flow, secuencia=None):
+        if isinstance(flow, str):
+            nombre, dpid, cuerpo = flow, None, None
+        else:
+            nombre, dpid, cuerpo = flow['name'], flow.get('switch'), flow
+        futuro = Future()
+        with self.cond:
+            if secuencia is not None:
+                ultima = self.ultimas.get(nombre)
+                if ultima is not None and ultima[0] > secuencia:
+                    self.fusionados += 1
+                    return ultima[1]    # Una compilación posterior ya decidió el estado del flow
+                self.ultimas[nombre] = (secuencia, futuro)
+            entrada = self.pendientes.get(nombre)
+            if entrada is None:
+                self.pendientes[nombre] = [accion, cuerpo, dpid, controller_ip, [futuro]]
             else:
-                print(f"Error instalando {flow['name']} en {dpid}")
+                entrada[0], entrada[1] = accion, cuerpo
+                entrada[2] = dpid or entrada[2]
+                entrada[4].append(futuro)
+                self.fusionados += 1
+            if self.hilo is None:
+                self.hilo = threading.Thread(target=self.ciclo, name="agrupador-flows", daemon=True)
+                self.hilo.start()
+            self.cond.notify()
+        return futuro
 
-def get_ipv4(controller_ip, mac):
-    """Devuelve la primera IP registrada para la MAC dada."""
-    url = f'http://{controller_ip}:8080/wm/device/'
-    r = requests.get(url)
-    if r.status_code == 200:
-        devices = r.json()
-        for device in devices:
-            if mac.lower() in [m.lower() for m in device.get('mac', [])]:
-                ips = device.get('ipv4', [])
-                if ips:
-                    return ips[0]
-    return None
-            
-def calcular_ruta(alumno, servidor):
-    """Obtiene la ruta actual entre un alumno y un servidor."""
-    dpid_src, port_src = get_attachment_points(controller_ip, alumno.mac)
-    dpid_dst, port_dst = get_attachment_points(controller_ip, servidor.mac)
+    def esperar(self, futuros):
+        inicio = time.perf_counter()
+        return ReporteFlows([f.result() for f in futuros], time.perf_counter() - inicio)
 
-    if not dpid_src or not dpid_dst:
-        return []
+    def instalar(self, controller_ip, flows, secuencia=None):
+        return self.esperar([self.agregar(controller_ip, "enviar", f, secuencia) for f in flows])
 
-    return get_route(controller_ip, dpid_src, port_src, dpid_dst, port_dst)
+    def desinstalar(self, controller_ip, flows, secuencia=None):
+        return self.esperar([self.agregar(controller_ip, "borrar", f, secuencia) for f in flows])
 
-def importar_yaml(ruta):
-    """Carga cursos, alumnos y servidores desde un YAML.
+    def ciclo(self):
+        while True:
+            with self.cond:
+                while not self.pendientes:
+                    self.cond.wait()
+            time.sleep(self.espera)    # Da tiempo a que otros trabajos sumen sus flows al lote
+            with self.cond:
+                lote, self.pendientes = self.pendientes, {}
+            self.despachar(lote)
 
-    Formato esperado:
-    alumnos:
-      - nombre: str
-        codigo: str
-        mac: str
-        ip: str (opcional)
-        autorizado: bool (opcional)
-    servidores:
-      - nombre: str
-        direccion_ip o ip: str
-        mac: str (opcional)
-        servicios:
-          - nombre: str
-            protocolo: str
-            puerto: int
-    cursos:
-      - nombre: str
-        estado: str
-        alumnos: [codigo_alumno, ...]
-        servidores:
-          - nombre: str
-            servicios_permitidos: [nombre_servicio, ...]
+    def despachar(self, lote):
+        por_switch = {}
+        for nombre, (accion, cuerpo, dpid, ip, futuros) in lote.items():
+            por_switch.setdefault(dpid, []).append((nombre, accion, cuerpo, ip, futuros))
+
+        def enviar(parte, dpid):
+            for nombre, accion, cuerpo, ip, futuros in parte:
+                try:
+                    if accion == "enviar":
+                        resultado = flow_pusher.enviar(ip, cuerpo)
+                    else:
+                        resultado = flow_pusher.quitar(ip, nombre, dpid)
+                except Exception as exc:
+                    resultado = ResultadoFlow(nombre, dpid, False, error=str(exc))
+                for futuro in futuros:
+                    futuro.set_result(resultado)
+
+        # Cada parte es de un solo switch; las de switches distintos van en paralelo
+        tareas = []
+        for dpid, operaciones in por_switch.items():
+            ip = controladores.dueno(operaciones[0][3], dpid) if dpid is not None else operaciones[0][3]
+            tareas.extend((ip, enviar, parte, dpid) for parte in lotes(operaciones, LOTE_SWITCH))
+        flow_pusher.repartir(None, tareas)
+        self.despachados += len(lote)
+        self.lotes += 1
+
+    def estadisticas(self):
+        return {"despachados": self.despachados, "fusionados": self.fusionados, "lotes": self.lotes,
+                "esperas_limite": limitador.esperas}
+
+agrupador = AgrupadorFlows()
+metricas.agregar_fuente("agrupador_flows", agrupador.estadisticas)
+
+class Trabajo:
+    __slots__ = ("tipo", "clave", "prioridad", "funcion", "args", "futuro")
+
+    def __init__(self, tipo, clave, prioridad, funcion, args):
+        self.tipo = tipo
+        self.clave = clave    # Conexión (handler) o tupla a crear: dos trabajos de la misma clave no corren a la vez
+        self.prioridad = prioridad
+        self.funcion = funcion
+        self.args = args
+        self.futuro = Future()
+
+class Planificador:
+    """Cola de prioridad de operaciones de conexiones con trabajos duplicados fusionados.
+
+    Un trabajo igual (mismo tipo y misma conexión) a uno que todavía espera no se encola:
+    recibe el mismo Future. Borrar una conexión descarta sus recálculos pendientes. Nunca
+    corren a la vez dos trabajos de la misma conexión, y con MAX_PENDIENTES en cola enviar()
+    espera a que se libere lugar.
     """
-    global cursos
-    with open(ruta, "r") as f:
-        data = yaml.safe_load(f)
 
-    alumnos_dict = {}
-    if 'alumnos' in data:
-        for a in data['alumnos']:
-            alumnos_dict[a['codigo']] = Alumno(
-                a['nombre'],
-                a['mac'],
-                codigo=a['codigo'],
-                ip=a.get('ip'),
-                autorizado=a.get('autorizado', False)
-            )
+    def __init__(self, trabajadores=TRABAJADORES_PLANIFICADOR, max_pendientes=MAX_PENDIENTES):
+        self.trabajadores = trabajadores
+        self.max_pendientes = max_pendientes
+        self.heap = []    # (prioridad, orden, Trabajo); los reemplazados se descartan al salir
+        self.pendientes = {}    # (tipo, clave) -> Trabajo en espera
+        self.en_curso = set()    # Claves con un trabajo ejecutándose
+        self.orden = 0
+        self.cond = threading.Condition()
+        self.hilos = []
+        self.fusionados = 0
+        self.descartados = 0
+        self.ejecutados = 0
 
+    def enviar(self, tipo, clave, funcion, *args):
+        """Encola (o fusiona) un trabajo y devuelve el Future de su resultado."""
+        with self.cond:
+            while (tipo, clave) not in self.pendientes and len(self.pendientes) >= self.max_pendientes:
+                self.cond.wait()
+            # Se busca después de esperar: otro enviar() pudo encolar el mismo trabajo mientras tanto
+            existente = self.pendientes.get((tipo, clave))
+            if existente is not None:
+                self.fusionados += 1
+                return existente.futuro
+            if tipo == "borrar":
+                for otro in ("actualizar", "recalcular"):
+                    descartado = self.pendientes.pop((otro, clave), None)
+                    if descartado is not None:
+                        descartado.futuro.cancel()
+                        self.descartados += 1
+            trabajo = Trabajo(tipo, clave, PRIORIDADES[tipo], funcion, args)
+            self.pendientes[(tipo, clave)] = trabajo
+            self.orden += 1
+            heapq.heappush(self.heap, (trabajo.prioridad, self.orden, trabajo))
+            if not self.hilos:
+                self.hilos = [threading.Thread(target=self.trabajar, name=f"planificador-{i}", daemon=True)
+                              for i in range(self.trabajadores)]
+                for hilo in self.hilos:
+                    hilo.start()
+            self.cond.notify_all()
+            return trabajo.futuro
+
+    def siguiente(self):
+        """Saca el trabajo más prioritario cuya conexión esté libre (con el lock tomado)."""
+        while True:
+            omitidos = []
+            trabajo = None
+            while self.heap:
+                entrada = heapq.heappop(self.heap)
+                candidato = entrada[2]
+                if self.pendientes.get((candidato.tipo, candidato.clave)) is not candidato:
+                    continue    # Descartado por un borrado
+                if candidato.clave in self.en_curso:
+                    omitidos.append(entrada)
+                    continue
+                trabajo = candidato
+                break
+            for entrada in omitidos:
+                heapq.heappush(self.heap, entrada)
+            if trabajo is not None:
+                del self.pendientes[(trabajo.tipo, trabajo.clave)]
+                self.en_curso.add(trabajo.clave)
+                self.cond.notify_all()    # Hay lugar en la cola
+                return trabajo
+            self.cond.wait()
+
+    def trabajar(self):
+        # Los flows de los trabajos pasan por el agrupador: se juntan por switch entre trabajos
+        contexto_trabajo.agrupar = True
+        while True:
+            with self.cond:
+                trabajo = self.siguiente()
+            try:
+                if trabajo.futuro.set_running_or_notify_cancel():
+                    try:
+                        trabajo.futuro.set_result(trabajo.funcion(*trabajo.args))
+                    except Exception as exc:
+                        trabajo.futuro.set_exception(exc)
+            finally:
+                with self.cond:
+                    self.en_curso.discard(trabajo.clave)
+                    self.ejecutados += 1
+                    self.cond.notify_all()
+
+    def crear(self, alumno, servidor, servicio):
+        clave = (normalizar_mac(alumno.mac), servidor.nombre, servicio.nombre)
+        return self.enviar("crear", clave, crear_conexion, alumno, servidor, servicio)
+
+    def recalcular(self, con):
+        return self.enviar("recalcular", con.handler, calcular_ruta, con.alumno, con.servidor, con.servicio, con.ruta,
+                           False)
+
+    def actualizar(self, con):
+        return self.enviar("actualizar", con.handler, actualizar_vigente, con)
+
+    def borrar(self, con):
+        return self.enviar("borrar", con.handler, borrar_vigente, con)
+
+    def provisionar(self, curso):
+        """provisionar_curso con un trabajo 'crear' por conexión faltante; espera a todos."""
+        inicio = time.perf_counter()
+        precargar_curso(curso)
+        trabajos = []
+        for alumno, servidor, servicio in expandir_curso(curso):
+            existente = registro.conexion_existente(alumno, servidor, servicio)
+            if existente:
+                trabajos.append(ResultadoConexion(alumno, servidor, servicio, existente))
+            else:
+                trabajos.append((alumno, servidor, servicio, self.crear(alumno, servidor, servicio)))
+        resultados = []
+        for trabajo in trabajos:
+            if isinstance(trabajo, ResultadoConexion):
+                resultados.append(trabajo)
+                continue
+            alumno, servidor, servicio, futuro = trabajo
+            try:
+                resultados.append(futuro.result())
+            except Exception as exc:
+                # Un trabajo que falla no debe hacer perder los resultados de los demás
+                resultados.append(ResultadoConexion(alumno, servidor, servicio, error=str(exc) or type(exc).__name__))
+        flows = [f for r in resultados if r.reporte for f in r.reporte.resultados]
+        duracion = time.perf_counter() - inicio
+        return ReporteProvision(resultados, duracion, ReporteFlows(flows, duracion))
+
+    def borrar_varias(self, conexiones):
+        """eliminar_conexiones con un trabajo 'borrar' por conexión; devuelve (eliminadas, ReporteFlows)."""
+        inicio = time.perf_counter()
+        futuros = [self.borrar(con) for con in conexiones]
+        eliminadas, resultados = [], []
+        for futuro in futuros:
+            handlers, reporte = futuro.result()
+            eliminadas.extend(handlers)
+            resultados.extend(reporte.resultados)
+        return eliminadas, ReporteFlows(resultados, time.perf_counter() - inicio)
+
+    def estadisticas(self):
+        return {"pendientes": len(self.pendientes), "en_curso": len(self.en_curso), "ejecutados": self.ejecutados,
+                "fusionados": self.fusionados, "descartados": self.descartados}
+
+def actualizar_vigente(con):
+    """actualizar_conexion para un trabajo encolado: la conexión pudo borrarse mientras esperaba."""
+    if registro.conexion(con.handler) is not con:
+        return ResultadoActualizacion(con, error="La conexión ya no existe.")
+    return actualizar_conexion(con)
+
+def borrar_vigente(con):
+    if registro.conexion(con.handler) is not con:
+        return [], ReporteFlows()
+    return eliminar_conexiones([con])
+
+planificador = Planificador()    # Cola compartida por el menú y la vigilancia de topología
+metricas.agregar_fuente("planificador", planificador.estadisticas)
 
-    servidores_dict = {}
-    if 'servidores' in data:
-        for s in data['servidores']:
-            direccion = s.get('direccion_ip') or s.get('ip')
-            if direccion is None:
-                raise KeyError("Falta 'direccion_ip' o 'ip' en servidor")
-            srv = Servidor(s['nombre'], direccion, s.get('mac'))
-            for svc in s.get('servicios', []):
-                srv.agregar_servicio(Servicio(svc['nombre'], svc['protocolo'], svc['puerto']))
-            servidores_dict[s['nombre']] = srv
-
-    cursos.clear()
-    if 'cursos' in data:
-        for c in data['cursos']:
-            curso = Curso(c['nombre'], c['estado'])
-            # Asocia alumnos
-            for cod in c.get('alumnos', []):
-                if cod in alumnos_dict:
-                    curso.agregar_alumno(alumnos_dict[cod])
-            # Asocia servidores y filtra servicios permitidos
-            for srv_obj in c.get('servidores', []):
-                srv = servidores_dict.get(srv_obj['nombre'])
-                if srv:
-                    # Si tienes "servicios_permitidos", crea una nueva lista solo con esos servicios
-                    if 'servicios_permitidos' in srv_obj:
-                        nuevos_servicios = [s for s in srv.servicios if s.nombre in srv_obj['servicios_permitidos']]
-                        srv.servicios = nuevos_servicios
-                    curso.agregar_servidor(srv)
-            cursos.append(curso)
-    print("Datos importados correctamente.")
-    
 def submenu_cursos():
     """Submenú para gestionar los cursos registrados."""
     
@@ -279,22 +3642,22 @@ def submenu_cursos():
         op = input("> ")
         
         if op == "1":
-            if not cursos:    
+            if not registro.cursos:    
                 print("No hay cursos registrados.")
             else:
-                for idx, c in enumerate(cursos, 1): 
+                for idx, c in enumerate(registro.cursos.values(), 1): 
                     print(f"{idx}. {c.nombre} - {c.estado}")
                     
         elif op == "2":
             nombre = input("Nombre del curso: ")    
-            curso = next((c for c in cursos if c.nombre == nombre), None)    
+            curso = registro.curso(nombre)    
             if curso:
                 print(f"Nombre: {curso.nombre}")
                 print(f"Estado: {curso.estado}")
                 
                 if curso.alumnos:
                     print("Alumnos:")
-                    for a in curso.alumnos:
+                    for a in curso.alumnos.values():
                         print(f"- {a.nombre} ({a.mac})")
                 else:
                     print("Sin alumnos")
@@ -310,7 +3673,7 @@ def submenu_cursos():
                 
         elif op == "3":
             nombre = input("Nombre del curso: ")    
-            curso = next((c for c in cursos if c.nombre == nombre), None)
+            curso = registro.curso(nombre)
             if not curso:
                 print("Curso no encontrado.")
                 continue
@@ -323,16 +3686,20 @@ def submenu_cursos():
                 codigo = input("Código del alumno (opcional): ")
                 if codigo == "":
                     codigo = None
-                curso.agregar_alumno(Alumno(nom, mac, codigo))
+                try:
+                    registro.agregar_alumno(curso, Alumno(nom, mac, codigo))
+                except ValueError as exc:
+                    print(f"No se pudo agregar el alumno: {exc}")
             elif subop == "2":
                 if not curso.alumnos:
                     print("No hay alumnos para eliminar.")
                 else:
-                    for i, a in enumerate(curso.alumnos, 1):    
+                    alumnos = curso.lista_alumnos()
+                    for i, a in enumerate(alumnos, 1):    
                         print(f"{i}. {a.nombre}")
                     idx = input("Seleccione alumno: ")    
-                    if idx.isdigit() and 1 <= int(idx) <= len(curso.alumnos):
-                        curso.remover_alumno(curso.alumnos[int(idx) - 1])    
+                    if idx.isdigit() and 1 <= int(idx) <= len(alumnos):
+                        registro.remover_alumno(curso, alumnos[int(idx) - 1])    
                     else:
                         print("Índice inválido.")
             else:
@@ -343,36 +3710,70 @@ def submenu_cursos():
         else:
             print("Opción inválida.")
 
+def leer_si_no(mensaje):
+    """True/False según la respuesta s/n; None si se deja en blanco."""
+    respuesta = input(mensaje).strip().lower()
+    return {"s": True, "si": True, "sí": True, "n": False, "no": False}.get(respuesta)
+
+def leer_curso_filtro():
+    """Curso elegido como filtro, None para todos, o False si no existe."""
+    nombre = input("Filtrar por curso (dejar en blanco para todos): ").strip()
+    if not nombre:
+        return None
+    curso = registro.curso(nombre)
+    if curso is None:
+        print("Curso no encontrado.")
+        return False
+    return curso
+
+def mostrar_paginado(resultados, formatear, vacio):
+    """Imprime los resultados de a TAMANO_PAGINA; Enter muestra la página siguiente y 'q' termina."""
+    mostrados = 0
+    for bloque in lotes(resultados, TAMANO_PAGINA):
+        if mostrados and input(f"-- {mostrados} mostrados, Enter para ver más (q para salir) -- ").strip().lower() == "q":
+            return
+        for objeto in bloque:
+            print(formatear(objeto))
+        mostrados += len(bloque)
+    if not mostrados:
+        print(vacio)
+
+def formato_alumno(a):
+    codigo = getattr(a, "codigo", None)
+    cod_str = codigo if codigo is not None else "N/A"
+    return f"{cod_str} - {a.nombre} ({a.mac})"
+
 def submenu_alumnos():
-    # Permite listar alumnos existentes y ver sus detalles
+    # Permite buscar alumnos existentes y ver sus detalles
     while True:
         print("1. Listar")
         print("2. Mostrar detalle")
         print("3. Volver")
         op = input("> ")
         if op == "1":
-            filtro = input("Filtrar por curso (dejar en blanco para todos): ")
-            encontrados = False
-            for curso in cursos:
-                if filtro and curso.nombre != filtro:
-                    continue
-                for a in curso.alumnos:
-                    codigo = getattr(a, "codigo", None)
-                    cod_str = codigo if codigo is not None else "N/A"
-                    print(f"{cod_str} - {a.nombre} ({a.mac})")
-                    encontrados = True
-            if not encontrados:
-                print("No hay alumnos registrados.")
+            consulta = input("Buscar por nombre, código o MAC (dejar en blanco para todos): ").strip()
+            curso = leer_curso_filtro()
+            if curso is False:
+                continue
+            autorizado = leer_si_no("¿Sólo autorizados? (s/n, en blanco para todos): ")
+            con_conexiones = leer_si_no("¿Con conexiones activas? (s/n, en blanco para todos): ")
+            mostrar_paginado(buscar_alumnos(consulta, curso=curso, autorizado=autorizado, con_conexiones=con_conexiones),
+                             formato_alumno, "No hay alumnos registrados.")
         elif op == "2":
-            nombre = input("Nombre del alumno: ")
-            alumno = None
-            for curso in cursos:
-                for a in curso.alumnos:
-                    if a.nombre == nombre:
-                        alumno = a
-                        break
-                if alumno:
-                    break
+            clave = input("Nombre, código o MAC del alumno: ").strip()
+            alumno = registro.alumno_por_nombre(clave) or registro.alumno(clave) or registro.alumno_por_mac(clave)
+            if alumno is None:
+                # Sin coincidencia exacta: sirve si el comienzo de un nombre, código o MAC es único
+                candidatos, hay_mas = pagina(buscar_alumnos(clave, "prefijo"), 1, 5) if clave else ([], False)
+                if len(candidatos) == 1:
+                    alumno = candidatos[0]
+                elif candidatos:
+                    print("Varios alumnos coinciden:")
+                    for a in candidatos:
+                        print(f"- {formato_alumno(a)}")
+                    if hay_mas:
+                        print("... (use Listar para ver todos)")
+                    continue
             if alumno:
                 codigo = getattr(alumno, "codigo", None)
                 cod_str = codigo if codigo is not None else "N/A"
@@ -387,33 +3788,26 @@ def submenu_alumnos():
             print("Opción inválida.")
 
 def submenu_servidores():
-    # Permite listar los servidores y ver detalles de cada uno
+    # Permite buscar los servidores y ver detalles de cada uno
     while True:
         print("1. Listar")
         print("2. Mostrar detalle")
         print("3. Volver")
         op = input("> ")
         if op == "1":
-            filtro = input("Filtrar por curso (dejar en blanco para todos): ")
-            encontrados = False
-            for curso in cursos:
-                if filtro and curso.nombre != filtro:
-                    continue
-                for s in curso.servidores:
-                    print(f"{s.nombre} - {s.direccion_ip}")
-                    encontrados = True
-            if not encontrados:
-                print("No hay servidores registrados.")
+            consulta = input("Buscar por nombre o IP (dejar en blanco para todos): ").strip()
+            curso = leer_curso_filtro()
+            if curso is False:
+                continue
+            con_conexiones = leer_si_no("¿Con conexiones activas? (s/n, en blanco para todos): ")
+            mostrar_paginado(buscar_servidores(consulta, curso=curso, con_conexiones=con_conexiones),
+                             lambda s: f"{s.nombre} - {s.direccion_ip}", "No hay servidores registrados.")
         elif op == "2":
-            nombre = input("Nombre del servidor: ")
-            servidor = None
-            for curso in cursos:
-                for s in curso.servidores:
-                    if s.nombre == nombre:
-                        servidor = s
-                        break
-                if servidor:
-                    break
+            nombre = input("Nombre del servidor: ").strip()
+            servidor = registro.servidor(nombre)
+            if servidor is None and nombre:
+                candidatos, _ = pagina(buscar_servidores(nombre, "prefijo"), 1, 2)
+                servidor = candidatos[0] if len(candidatos) == 1 else None
             if servidor:
                 if servidor.servicios:
                     print("Servicios:")
@@ -428,7 +3822,62 @@ def submenu_servidores():
         else:
             print("Opción inválida.")
 
+def submenu_politicas():
+    """Consulta y modifica las políticas de acceso compiladas."""
+    while True:
+        print("1. Resumen")
+        print("2. Consultar acceso")
+        print("3. Cambiar estado de curso")
+        print("4. Autorizar/desautorizar alumno")
+        print("5. Recompilar todo")
+        print("6. Volver")
+        op = input("> ")
+        if op == "1":
+            print(politicas.resumen())
+            for curso in registro.cursos.values():
+                estado = "activo" if curso_activo(curso) else "inactivo"
+                print(f"- {curso.nombre} ({curso.estado}, {estado}): "
+                      f"{len(politicas.aportes.get(curso.nombre, {}))} alumnos con acceso")
+        elif op == "2":
+            alumno = registro.alumno(input("Código del alumno: "))
+            servidor = registro.servidor(input("Servidor: "))
+            if not alumno or not servidor:
+                print("Alumno o servidor no encontrado.")
+                continue
+            servicio = registro.servicio(servidor.nombre, input("Servicio: "))
+            if not servicio:
+                print("Servicio no encontrado.")
+                continue
+            if politicas.permite(alumno, servidor, servicio):
+                print("PERMITIDO")
+            else:
+                print(f"DENEGADO: {politicas.motivo(alumno, servidor, servicio)}")
+        elif op == "3":
+            curso = registro.curso(input("Nombre del curso: "))
+            if not curso:
+                print("Curso no encontrado.")
+                continue
+            estado = input(f"Nuevo estado (actual: {curso.estado}): ").strip()
+            if estado:
+                registro.cambiar_estado(curso, estado)
+                print("Estado actualizado.")
+        elif op == "4":
+            alumno = registro.alumno(input("Código del alumno: "))
+            if not alumno:
+                print("Alumno no encontrado.")
+                continue
+            registro.autorizar(alumno, not alumno.esta_autorizado())
+            print("Alumno autorizado." if alumno.esta_autorizado() else "Alumno desautorizado.")
+        elif op == "5":
+            politicas.compilar(registro.cursos.values())
+            print(politicas.resumen())
+        elif op == "6":
+            break
+        else:
+            print("Opción inválida.")
+
 def submenu_conexiones():
+    global LEASE_DURACION, LEASE_INACTIVIDAD
     while True:
         print("1. Crear")
         print("2. Listar")
@@ -436,24 +3885,31 @@ def submenu_conexiones():
         print("4. Recalcular")
         print("5. Actualizar")
         print("6. Borrar")
-        print("7. Volver")
+        print("7. Provisionar curso")
+        print("8. Borrar conexiones de un curso o alumno")
+        print(f"9. {'Detener' if vigilante.activo() else 'Iniciar'} vigilancia de topología")
+        print("10. Reconciliar flows con el controlador")
+        print(f"11. {'Detener' if reconciliador.activo() else 'Iniciar'} reconciliación periódica")
+        print(f"12. {'Detener' if renovador.activo() else 'Iniciar'} leases de flows")
+        print("13. Volver")
         op = input("> ")
         if op == "1":
             curso_nom = input("Curso: ")
-            curso = next((c for c in cursos if c.nombre == curso_nom), None)
+            curso = registro.curso(curso_nom)
             if not curso:
                 print("Curso no encontrado.")
                 continue
             if not curso.alumnos:
                 print("El curso no tiene alumnos.")
                 continue
-            for i, a in enumerate(curso.alumnos, 1):
+            alumnos = curso.lista_alumnos()
+            for i, a in enumerate(alumnos, 1):
                 print(f"{i}. {a.nombre}")
             idx = input("Seleccione alumno: ")
-            if not idx.isdigit() or not (1 <= int(idx) <= len(curso.alumnos)):
+            if not idx.isdigit() or not (1 <= int(idx) <= len(alumnos)):
                 print("Índice inválido.")
                 continue
-            alumno = curso.alumnos[int(idx) - 1]
+            alumno = alumnos[int(idx) - 1]
             if not alumno.esta_autorizado():
                 print("El alumno no está autorizado para crear conexiones.")
                 continue
@@ -467,68 +3923,37 @@ def submenu_conexiones():
                 print("Índice inválido.")
                 continue
             servidor = curso.servidores[int(idx) - 1]
-            if not servidor.servicios:
+            servicios = curso.servicios_de(servidor)
+            if not servicios:
                 print("El servidor no tiene servicios.")
                 continue
-            for i, svc in enumerate(servidor.servicios, 1):
+            for i, svc in enumerate(servicios, 1):
                 print(f"{i}. {svc.nombre}")
             idx = input("Seleccione servicio: ")
-            if not idx.isdigit() or not (1 <= int(idx) <= len(servidor.servicios)):
+            if not idx.isdigit() or not (1 <= int(idx) <= len(servicios)):
                 print("Índice inválido.")
                 continue
                 
-            servicio = servidor.servicios[int(idx) - 1]
+            servicio = servicios[int(idx) - 1]
             
-            # OBTÉN EL PUNTO DE ATTACHMENT DEL ALUMNO Y DEL SERVIDOR
-            dpid_src, port_src = get_attachment_points(controller_ip, alumno.mac)
-            dpid_dst, port_dst = get_attachment_points(controller_ip, servidor.mac) # Ojo: servidor.mac debe existir
-
-            if not dpid_src or not dpid_dst:
-                print("No se pudo encontrar el punto de attachment para el host o servidor.")
-                continue
-
-            # CALCULA LA RUTA ENTRE AMBOS
-            ruta = get_route(controller_ip, dpid_src, port_src, dpid_dst, port_dst)
-
-            if not ruta:
-                print("No se encontró una ruta válida entre el alumno y el servidor.")
-                continue
-
-            # INSTALA LOS FLOWS EN LA RED (AMBOS SENTIDOS)
-            proto_l4 = 6 if servicio.protocolo.upper() == "TCP" else 17
-            ip_src = alumno.ip or get_ipv4(controller_ip, alumno.mac)
-            if not ip_src:
-                print("No se pudo determinar la IP del alumno.")
-                continue
-
-            # L4 source port is set to 0 to match any source port
-            build_route(
-                controller_ip,
-                ruta,
-                port_src,
-                port_dst,
-                alumno.mac,
-                ip_src,
-                servidor.mac,
-                servidor.direccion_ip,
-                proto_l4,
-                0,
-                servicio.puerto
-            )
-
-            # CREA LA CONEXIÓN EN EL SISTEMA
-            handler = f"con{len(conexiones)+1}"
-            conexiones.append(Conexion(handler, alumno, servidor, servicio, ruta))
-            print(f"Conexión creada con handler {handler}")
+            resultado = planificador.crear(alumno, servidor, servicio).result()
+            if resultado.reporte:
+                for r in resultado.reporte.fallidos:
+                    print(f"Error instalando {r.nombre} en {r.dpid}")
+                print(resultado.reporte.resumen())
+            if resultado.conexion:
+                print(f"Conexión creada con handler {resultado.conexion.handler}")
+            else:
+                print(resultado.error)
         elif op == "2":
-            if not conexiones:
+            if not registro.conexiones:
                 print("No hay conexiones registradas.")
             else:
-                for c in conexiones:
+                for c in registro.conexiones.values():
                     print(f"{c.handler}: {c.alumno.nombre} -> {c.servicio.nombre} ({c.servidor.nombre})")
         elif op == "3":
             h = input("Handler: ")
-            con = next((c for c in conexiones if c.handler == h), None)
+            con = registro.conexion(h)
             if con:
                 if con.ruta:
                     print("Ruta:")
@@ -540,9 +3965,13 @@ def submenu_conexiones():
                 print("Conexión no encontrada.")
         elif op == "4":
             h = input("Handler: ")
-            con = next((c for c in conexiones if c.handler == h), None)
+            con = registro.conexion(h)
             if con:
-                nueva = calcular_ruta(con.alumno, con.servidor)
+                try:
+                    nueva = planificador.recalcular(con).result()
+                except CancelledError:
+                    print("La conexión se eliminó antes de recalcular su ruta.")
+                    continue
                 if nueva:
                     for dpid, port in nueva:
                         print(f"- {dpid}:{port}")
@@ -552,29 +3981,183 @@ def submenu_conexiones():
                 print("Conexión no encontrada.")
         elif op == "5":
             h = input("Handler: ")
-            con = next((c for c in conexiones if c.handler == h), None)
+            con = registro.conexion(h)
             if con:
-                nueva = calcular_ruta(con.alumno, con.servidor)
-                if nueva:
-                    con.ruta = nueva
-                    print("Ruta actualizada.")
-                else:
-                    print("No se pudo calcular la ruta.")
+                try:
+                    resultado = planificador.actualizar(con).result()
+                except CancelledError:
+                    print("La conexión se eliminó antes de actualizarse.")
+                    continue
+                for r in resultado.altas.fallidos + resultado.bajas.fallidos:
+                    print(f"Error actualizando {r.nombre} en {r.dpid}")
+                if resultado.altas.resultados or resultado.bajas.resultados or resultado.sin_cambios:
+                    print(resultado.resumen())
+                print(resultado.error or "Ruta actualizada.")
             else:
                 print("Conexión no encontrada.")
         elif op == "6":
             h = input("Handler: ")
-            for i, c in enumerate(conexiones):
-                if c.handler == h:
-                    if not c.alumno.esta_autorizado():
-                        print("El alumno no está autorizado para eliminar esta conexion.")
-                        break
-                    del conexiones[i]
-                    print("Conexión eliminada.")
-                    break
-            else:
+            con = registro.conexion(h)
+            if not con:
                 print("Conexión no encontrada.")
+            elif not con.alumno.esta_autorizado():
+                print("El alumno no está autorizado para eliminar esta conexion.")
+            else:
+                eliminadas, reporte = planificador.borrar(con).result()
+                for r in reporte.fallidos:
+                    print(f"Error borrando {r.nombre}")
+                if eliminadas:
+                    print(f"Conexión eliminada ({len(reporte.exitosos)} flows borrados).")
+                elif reporte.fallidos:
+                    print("No se pudo eliminar la conexión: se conserva para reintentar el borrado.")
+                else:
+                    print("La conexión ya había sido eliminada.")
         elif op == "7":
+            curso_nom = input("Curso: ")
+            curso = registro.curso(curso_nom)
+            if not curso:
+                print("Curso no encontrado.")
+                continue
+            reporte = planificador.provisionar(curso)
+            for r in reporte.resultados:
+                estado = r.conexion.handler if r.conexion else "ERROR"
+                detalle = f" - {r.error}" if r.error else ""
+                print(f"[{estado}] {r.alumno.nombre} -> {r.servicio.nombre} ({r.servidor.nombre}){detalle}")
+            print(reporte.resumen())
+        elif op == "8":
+            clave = input("Curso o código de alumno: ").strip()
+            curso = registro.curso(clave)
+            alumno = None if curso else registro.alumno(clave)
+            if curso:
+                conexiones = conexiones_de_curso(curso)
+            elif alumno:
+                conexiones = registro.conexiones_de_alumno(alumno)
+            else:
+                print("No existe un curso ni un alumno con ese nombre o código.")
+                continue
+            if not conexiones:
+                print("No hay conexiones que borrar.")
+                continue
+            if input(f"¿Borrar {len(conexiones)} conexiones? (s/n): ").strip().lower() != "s":
+                continue
+            eliminadas, reporte = planificador.borrar_varias(conexiones)
+            for r in reporte.fallidos:
+                print(f"Error borrando {r.nombre}")
+            print(f"{len(eliminadas)}/{len(conexiones)} conexiones eliminadas; "
+                  f"{len(reporte.exitosos)}/{len(reporte.resultados)} flows borrados en {reporte.duracion:.3f} s")
+        elif op == "9":
+            if vigilante.activo():
+                vigilante.detener()
+                print("Vigilancia detenida.")
+                for instante, handler, detalle in vigilante.eventos:
+                    print(f"{time.strftime('%H:%M:%S', time.localtime(instante))} {handler}: {detalle}")
+            else:
+                vigilante.iniciar()
+                print(f"Vigilando la topología cada {vigilante.intervalo} s; "
+                      "las conexiones afectadas por un cambio se recalculan solas.")
+        elif op == "10":
+            reparar = input("¿Corregir las diferencias? (s/n): ").strip().lower() == "s"
+            reporte = reconciliar(reparar)
+            for r in reporte.reparados.fallidos + reporte.borrados.fallidos:
+                print(f"Error corrigiendo {r.nombre} en {r.dpid}")
+            if not reparar:
+                for f in reporte.faltantes:
+                    print(f"Falta {f['name']} en {f['switch']}")
+                for f in reporte.huerfanos:
+                    print(f"Huérfano {f['name']} en {f['switch']}")
+            print(reporte.resumen())
+        elif op == "11":
+            if reconciliador.activo():
+                reconciliador.detener()
+                print("Reconciliación periódica detenida.")
+                if reconciliador.ultimo:
+                    print(f"Última pasada: {reconciliador.ultimo.resumen()}")
+            else:
+                valor = input(f"Intervalo en segundos [{reconciliador.intervalo}]: ").strip()
+                if valor:
+                    try:
+                        reconciliador.intervalo = float(valor)
+                    except ValueError:
+                        print("Intervalo inválido.")
+                        continue
+                reconciliador.iniciar()
+                print(f"Reconciliando cada {reconciliador.intervalo} s.")
+        elif op == "12":
+            if renovador.activo():
+                renovador.detener()
+                LEASE_DURACION = LEASE_INACTIVIDAD = 0
+                reporte = renovador.hacer_permanentes()
+                print(f"Renovación detenida: {len(reporte.exitosos)}/{len(reporte.resultados)} flows de "
+                      "conexiones vigentes reinstalados como permanentes; los de las que ya no "
+                      "corresponden vencerán en el switch.")
+                if reporte.fallidos:
+                    print("Algunos flows conservan su lease: Reconciliar los reinstala cuando venzan.")
+                if renovador.ultimo:
+                    print(f"Última pasada: {renovador.ultimo.resumen()}")
+                continue
+            try:
+                duracion = int(input(f"Duración del lease en segundos [{LEASE_DURACION or 900}]: ").strip()
+                               or LEASE_DURACION or 900)
+                inactividad = int(input(f"Inactividad máxima en segundos, 0 sin límite [{LEASE_INACTIVIDAD}]: ").strip()
+                                  or LEASE_INACTIVIDAD)
+            except ValueError:
+                print("Valor inválido.")
+                continue
+            LEASE_DURACION, LEASE_INACTIVIDAD = duracion, inactividad
+            renovador.iniciar()
+            print(f"Leases de {LEASE_DURACION} s renovados cada {renovador.intervalo} s; "
+                  "las conexiones que ya no corresponden se limpian al vencer.")
+        elif op == "13":
+            break
+        else:
+            print("Opción inválida.")
+
+def submenu_estadisticas():
+    """Submenú con las latencias por endpoint y fase, contadores y exportación de métricas."""
+
+    while True:
+        print("1. Ver resumen")
+        print("2. Exportar a archivo (formato Prometheus)")
+        print("3. Iniciar endpoint /metrics")
+        print(f"4. {'Desactivar' if metricas.habilitada else 'Activar'} métricas")
+        print("5. Reiniciar")
+        print("6. Volver")
+        op = input("> ")
+        if op == "1":
+            filas, contadores = metricas.resumen()
+            if not filas and not contadores:
+                print("Sin métricas registradas.")
+            if filas:
+                print(f"{'serie':48}{'n':>8}{'media ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+                for nombre, etiquetas, cuenta, media, p50, p99 in filas:
+                    serie = nombre + etiquetas_texto(etiquetas)
+                    print(f"{serie:48}{cuenta:>8}{media * 1000:>10.2f}{p50 * 1000:>10.2f}{p99 * 1000:>10.2f}")
+            for (nombre, etiquetas), valor in contadores:
+                print(f"{nombre}{etiquetas_texto(etiquetas)}: {valor}")
+            cache = cache_dispositivos.estadisticas()
+            print(f"Caché de dispositivos: {cache['hits']} aciertos, {cache['misses']} fallos "
+                  f"({cache['hit_rate']:.1%})")
+        elif op == "2":
+            ruta = input(f"Archivo destino [{METRICAS_ARCHIVO}]: ").strip() or METRICAS_ARCHIVO
+            try:
+                metricas.escribir(ruta)
+                print(f"Métricas escritas en '{ruta}'.")
+            except OSError as exc:
+                print(f"Error al escribir las métricas: {exc}")
+        elif op == "3":
+            puerto = input(f"Puerto [{METRICAS_PUERTO}]: ").strip()
+            try:
+                host, puerto = metricas.servir(int(puerto) if puerto else METRICAS_PUERTO)
+                print(f"Métricas disponibles en http://{host}:{puerto}/metrics")
+            except (OSError, ValueError) as exc:
+                print(f"No se pudo iniciar el endpoint: {exc}")
+        elif op == "4":
+            metricas.habilitada = not metricas.habilitada
+            print(f"Métricas {'activadas' if metricas.habilitada else 'desactivadas'}.")
+        elif op == "5":
+            metricas.reiniciar()
+            print("Métricas reiniciadas.")
+        elif op == "6":
             break
         else:
             print("Opción inválida.")
@@ -583,19 +4166,34 @@ def submenu_conexiones():
 def menu():
     while True:
         print("1. Importar")
-        print("2. Exportar")    # <- SOLO OPCIÓN, no implementada
+        print("2. Exportar")
         print("3. Cursos")
         print("4. Alumnos")
         print("5. Servidores")
-        print("6. Políticas")    # <- SOLO OPCIÓN, no implementada
+        print("6. Políticas")
         print("7. Conexiones")
-        print("8. Salir")
+        print("8. Estadísticas")
+        print("9. Salir")
         op = input("> ")
         if op == "1":
             ruta = input("Archivo YAML a importar: ")
-            importar_yaml(ruta)
+            try:
+                importar_yaml(ruta)
+            except (OSError, ValueError, KeyError, yaml.YAMLError) as exc:
+                print(f"Error al importar: {exc}")
         elif op == "2":
-            print("Función de exportar no implementada todavía.")
+            ruta = input("Archivo destino (.yaml o .jsonl): ").strip()
+            if not ruta:
+                print("Ruta inválida.")
+                continue
+            incremental = False
+            if ruta.endswith((".jsonl", ".ndjson")):
+                incremental = input("¿Sólo cambios desde la última exportación? (s/n): ").strip().lower() == "s"
+            try:
+                escritos = exportar(ruta, incremental=incremental)
+                print(f"Estado exportado a '{ruta}' ({escritos} objetos).")
+            except (OSError, ValueError) as exc:
+                print(f"Error al exportar: {exc}")
         elif op == "3":
             submenu_cursos()
         elif op == "4":
@@ -603,22 +4201,620 @@ def menu():
         elif op == "5":
             submenu_servidores()
         elif op == "6":
-            print("Módulo de políticas aún no implementado.")  
+            submenu_politicas()
         elif op == "7":
             submenu_conexiones()
         elif op == "8":
+            submenu_estadisticas()
+        elif op == "9":
             break
         else:
             print("Opción inválida.")
 
-def main():
+# --- Modo por lotes ---
+LOTE_PARALELO = 8    # Operaciones independientes ejecutadas a la vez
+OPERACIONES_BARRERA = {"importar", "exportar", "provisionar", "reconciliar"}    # Leen o cambian todo el estado
 
-    """Carga opcionalmente un archivo YAML y luego inicia el menú."""
-    ruta = None
-    # Si se pasa una ruta como argumento, úsala; de lo contrario pregunta al usuario
-    if len(sys.argv) > 1:
-        ruta = sys.argv[1]
+class ErrorOperacion(Exception):
+    """Operación por lotes inválida: falta un campo o la entidad no existe."""
+
+class NoEncontrado(ErrorOperacion):
+    """La operación nombra un curso, alumno, servidor, servicio o conexión que no existe."""
+
+def campo(op, nombre):
+    valor = op.get(nombre)
+    if valor is None or valor == "":
+        raise ErrorOperacion(f"Falta el campo '{nombre}'.")
+    return valor
+
+def alumno_de(op):
+    clave = campo(op, "alumno")
+    alumno = registro.alumno(clave) or registro.alumno_por_mac(str(clave))
+    if not alumno:
+        raise NoEncontrado(f"Alumno '{clave}' no encontrado.")
+    return alumno
+
+def servidor_de(op):
+    nombre = campo(op, "servidor")
+    servidor = registro.servidor(nombre)
+    if not servidor:
+        raise NoEncontrado(f"Servidor '{nombre}' no encontrado.")
+    return servidor
+
+def servicio_de(op, servidor):
+    nombre = campo(op, "servicio")
+    servicio = registro.servicio(servidor.nombre, nombre)
+    if not servicio:
+        raise NoEncontrado(f"El servidor '{servidor.nombre}' no tiene el servicio '{nombre}'.")
+    return servicio
+
+def conexion_de(op):
+    """Conexión indicada por 'handler' o por 'alumno', 'servidor' y 'servicio'."""
+    if op.get("handler"):
+        con = registro.conexion(op["handler"])
     else:
+        alumno, servidor = alumno_de(op), servidor_de(op)
+        con = registro.conexion_existente(alumno, servidor, servicio_de(op, servidor))
+    if not con:
+        raise NoEncontrado("Conexión no encontrada.")
+    return con
+
+def clave_conflicto(op):
+    """Las operaciones sobre un mismo alumno se ejecutan en el orden del archivo."""
+    if op.get("handler"):
+        con = registro.conexion(op["handler"])
+        return normalizar_mac(con.alumno.mac) if con else op["handler"]
+    clave = op.get("alumno")
+    if clave is None or clave == "":
+        return None
+    # Igual que alumno_de: por código o por MAC; las dos formas deben dar la misma clave
+    alumno = registro.alumno(clave) or registro.alumno_por_mac(str(clave))
+    return normalizar_mac(alumno.mac) if alumno else normalizar_mac(str(clave))
+
+def op_crear(op):
+    alumno, servidor = alumno_de(op), servidor_de(op)
+    servicio = servicio_de(op, servidor)
+    existente = registro.conexion_existente(alumno, servidor, servicio)
+    if existente:
+        return {"handler": existente.handler, "existente": True}
+    resultado = crear_conexion(alumno, servidor, servicio)
+    salida = {"handler": resultado.conexion.handler if resultado.conexion else None}
+    if resultado.reporte:
+        salida["flows"] = len(resultado.reporte.exitosos)
+    if resultado.error:
+        salida["error"] = resultado.error
+    return salida
+
+def op_borrar(op):
+    con = conexion_de(op)
+    eliminadas, reporte = eliminar_conexiones([con])
+    salida = {"handler": con.handler, "flows_borrados": len(reporte.exitosos)}
+    if con.handler not in eliminadas:
+        salida["error"] = (f"{len(reporte.fallidos)} flows no se pudieron borrar o reenviar; "
+                           "la conexión se conserva para reintentar.")
+    return salida
+
+def op_recalcular(op):
+    con = conexion_de(op)
+    ruta = calcular_ruta(con.alumno, con.servidor, con.servicio, con.ruta, reservar=False)
+    if not ruta:
+        raise ErrorOperacion("No se pudo calcular la ruta.")
+    return {"handler": con.handler, "ruta": [[dpid, port] for dpid, port in ruta]}
+
+def op_actualizar(op):
+    resultado = actualizar_conexion(conexion_de(op))
+    salida = {"handler": resultado.conexion.handler, "instalados": len(resultado.altas.exitosos),
+              "borrados": len(resultado.bajas.exitosos), "sin_cambios": resultado.sin_cambios}
+    if resultado.error:
+        salida["error"] = resultado.error
+    return salida
+
+def op_provisionar(op):
+    nombre = campo(op, "curso")
+    curso = registro.curso(nombre)
+    if not curso:
+        raise NoEncontrado(f"Curso '{nombre}' no encontrado.")
+    reporte = provisionar_curso(curso)
+    errores = [r for r in reporte.resultados if not r.ok]
+    salida = {"conexiones": len(reporte.resultados) - len(errores), "flows": len(reporte.reporte_flows.exitosos)}
+    if errores:
+        salida["error"] = f"{len(errores)} conexiones con errores."
+        salida["errores"] = [{"alumno": codigo_alumno(r.alumno), "servidor": r.servidor.nombre,
+                              "servicio": r.servicio.nombre, "error": r.error} for r in errores]
+    return salida
+
+def op_importar(op):
+    importar_yaml(campo(op, "ruta"), streaming=bool(op.get("streaming")))
+    return {"cursos": len(registro.cursos), "alumnos": len(registro.alumnos_por_mac),
+            "conexiones": len(registro.conexiones)}
+
+def op_exportar(op):
+    return {"objetos": exportar(campo(op, "ruta"), op.get("formato"), bool(op.get("incremental")))}
+
+def op_reconciliar(op):
+    reporte = reconciliar(op.get("reparar", True))
+    salida = {"revisados": reporte.revisados, "faltantes": len(reporte.faltantes),
+              "huerfanos": len(reporte.huerfanos), "reinstalados": len(reporte.reparados.exitosos),
+              "borrados": len(reporte.borrados.exitosos)}
+    if not reporte.ok:
+        salida["error"] = reporte.error or "No se pudieron corregir todas las diferencias."
+    return salida
+
+OPERACIONES = {
+    "crear": op_crear,
+    "borrar": op_borrar,
+    "recalcular": op_recalcular,
+    "actualizar": op_actualizar,
+    "provisionar": op_provisionar,
+    "importar": op_importar,
+    "exportar": op_exportar,
+    "reconciliar": op_reconciliar,
+}
+
+def ejecutar_operacion(op, linea):
+    """Ejecuta una operación y devuelve su línea de resultado (un diccionario serializable)."""
+    inicio = time.perf_counter()
+    resultado = {"linea": linea, "op": op.get("op")}
+    if "id" in op:
+        resultado["id"] = op["id"]    # Identificador libre del script que envía el lote
+    try:
+        funcion = OPERACIONES.get(op.get("op"))
+        if funcion is None:
+            raise ErrorOperacion(op.get("_invalida") or f"Operación desconocida: {op.get('op')!r}.")
+        resultado.update(funcion(op))
+    except (ErrorOperacion, OSError, ValueError, KeyError, yaml.YAMLError) as exc:
+        resultado["error"] = str(exc)
+    except Exception as exc:    # Una operación rota no detiene el resto del lote
+        resultado["error"] = f"{type(exc).__name__}: {exc}"
+    resultado["ok"] = "error" not in resultado
+    resultado["segundos"] = round(time.perf_counter() - inicio, 6)
+    return resultado
+
+def leer_operaciones(f):
+    """Genera (número de línea, operación) de un archivo JSON Lines; ignora líneas vacías y comentarios."""
+    for linea, texto in enumerate(f, 1):
+        texto = texto.strip()
+        if not texto or texto.startswith("#"):
+            continue
+        try:
+            op = json.loads(texto)
+            if not isinstance(op, dict):
+                raise ValueError("se esperaba un objeto JSON")
+        except ValueError as exc:
+            op = {"_invalida": f"Línea inválida: {exc}"}
+        yield linea, op
+
+def ejecutar_lote(operaciones, escribir, paralelo=LOTE_PARALELO):
+    """Ejecuta las operaciones y entrega cada resultado a escribir(); devuelve (exitosas, fallidas).
+
+    Las operaciones de alumnos distintos corren en paralelo, las de un mismo alumno en orden y
+    las que leen o cambian todo el estado (importar, exportar, ...) esperan a las anteriores.
+    """
+    totales = [0, 0]
+    lock = threading.Lock()
+    ultimas = {}    # clave de conflicto -> Future de la última operación con esa clave
+    creaciones = []    # Futures de los 'crear' en curso: sus handlers aún no existen
+
+    def emitir(resultado):
+        with lock:
+            totales[0 if resultado["ok"] else 1] += 1
+            escribir(resultado)
+
+    def encadenar(previa, op, linea):
+        if previa is not None:
+            previa.result()
+        emitir(ejecutar_operacion(op, linea))
+
+    with ThreadPoolExecutor(max_workers=paralelo, thread_name_prefix="lote") as executor:
+        for linea, op in operaciones:
+            if op.get("op") in OPERACIONES_BARRERA:
+                for futuro in ultimas.values():
+                    futuro.result()
+                ultimas.clear()
+                creaciones.clear()
+                emitir(ejecutar_operacion(op, linea))
+                continue
+            if op.get("handler") and creaciones and not registro.conexion(op["handler"]):
+                # El handler puede salir de un 'crear' anterior del lote: se espera a que exista
+                # para conocer su alumno y ordenarla con el resto de sus operaciones
+                for futuro in creaciones:
+                    futuro.result()
+                creaciones.clear()
+            clave = clave_conflicto(op)
+            futuro = ultimas[clave] = executor.submit(encadenar, ultimas.get(clave), op, linea)
+            if op.get("op") == "crear":
+                creaciones[:] = [f for f in creaciones if not f.done()] + [futuro]
+        for futuro in ultimas.values():
+            futuro.result()
+    return tuple(totales)
+
+# --- Servidor API ---
+API_PUERTO = 8000
+API_HILOS = 32    # Trabajadores que atienden requests a la vez
+API_COLA = 64    # Conexiones aceptadas que esperan trabajador; con la cola llena se responde 503
+API_TIMEOUT = 5    # Segundos que una conexión keep-alive inactiva puede retener a un trabajador
+CANDADOS_ALUMNO = 64    # Candados repartidos por MAC: operaciones de un mismo alumno no se pisan
+
+candados_alumno = [threading.Lock() for _ in range(CANDADOS_ALUMNO)]
+
+def candado_alumno(mac):
+    return candados_alumno[hash(normalizar_mac(mac)) % CANDADOS_ALUMNO]
+
+@contextlib.contextmanager
+def todos_los_candados():
+    """Excluye cualquier otra operación de conexiones (se toman siempre en el mismo orden)."""
+    for candado in candados_alumno:
+        candado.acquire()
+    try:
+        yield
+    finally:
+        for candado in reversed(candados_alumno):
+            candado.release()
+
+def resultado_api(salida, estado=200):
+    # La operación se entendió pero no se completó (política, controlador, flows fallidos)
+    return (422 if "error" in salida else estado), salida
+
+def api_lista(indice, convertir):
+    with registro.lock:
+        objetos = list(indice().values())
+    return 200, [convertir(o) for o in objetos]
+
+def parametro_bool(params, nombre):
+    valor = params.get(nombre)
+    if valor is None or valor == "":
+        return None
+    if str(valor).lower() in ("1", "true", "si", "sí", "s"):
+        return True
+    if str(valor).lower() in ("0", "false", "no", "n"):
+        return False
+    raise ErrorOperacion(f"'{nombre}' debe ser true o false.")
+
+def parametro_entero(params, nombre, defecto, minimo, maximo):
+    try:
+        valor = int(params.get(nombre, defecto))
+    except (TypeError, ValueError):
+        raise ErrorOperacion(f"'{nombre}' debe ser un entero.")
+    if not minimo <= valor <= maximo:
+        raise ErrorOperacion(f"'{nombre}' debe estar entre {minimo} y {maximo}.")
+    return valor
+
+def api_busqueda(buscar, convertir, indice, params, filtros):
+    """Página de una búsqueda (q, modo, curso y filtros); sin parámetros devuelve la lista completa."""
+    if not params:
+        return api_lista(indice, convertir)
+    modo = params.get("modo", "contiene")
+    if modo not in MODOS_BUSQUEDA:
+        raise ErrorOperacion(f"'modo' debe ser uno de: {', '.join(MODOS_BUSQUEDA)}.")
+    curso = None
+    if params.get("curso"):
+        curso = registro.curso(params["curso"])
+        if curso is None:
+            raise NoEncontrado(f"Curso '{params['curso']}' no encontrado.")
+    numero = parametro_entero(params, "pagina", 1, 1, sys.maxsize)
+    tamano = parametro_entero(params, "tamano", TAMANO_PAGINA, 1, MAX_TAMANO_PAGINA)
+    extra = {nombre: parametro_bool(params, nombre) for nombre in filtros}
+    objetos, hay_mas = pagina(buscar(params.get("q", ""), modo, curso=curso, **extra), numero, tamano)
+    return 200, {"pagina": numero, "tamano": tamano, "hay_mas": hay_mas, "resultados": [convertir(o) for o in objetos]}
+
+def api_objeto(buscar, convertir, clave, tipo):
+    objeto = buscar(clave)
+    if objeto is None:
+        raise NoEncontrado(f"{tipo} '{clave}' no encontrado.")
+    return 200, convertir(objeto)
+
+def api_alumnos_de_curso(nombre):
+    curso = registro.curso(nombre)
+    if not curso:
+        raise NoEncontrado(f"Curso '{nombre}' no encontrado.")
+    return 200, [alumno_a_dict(a) for a in curso.lista_alumnos()]
+
+def api_conexiones_de_alumno(clave):
+    alumno = alumno_de({"alumno": clave})
+    return 200, [conexion_a_dict(c) for c in registro.conexiones_de_alumno(alumno)]
+
+def api_crear(cuerpo):
+    alumno = alumno_de(cuerpo)
+    with candado_alumno(alumno.mac):
+        salida = op_crear(cuerpo)
+    return resultado_api(salida, 200 if salida.get("existente") else 201)
+
+def api_sobre_conexion(operacion, handler):
+    con = conexion_de({"handler": handler})
+    with candado_alumno(con.alumno.mac):
+        # Se vuelve a buscar: otro request pudo borrarla mientras se esperaba el candado
+        return resultado_api(operacion({"handler": handler}))
+
+def api_global(operacion, op):
+    with todos_los_candados():
+        return resultado_api(operacion(op))
+
+RUTAS_API = [(metodo, re.compile(patron), funcion) for metodo, patron, funcion in (
+    ("GET", r"/salud", lambda g, c: (200, {"ok": True, "conexiones": len(registro.conexiones)})),
+    ("GET", r"/metrics", lambda g, c: (200, metricas.prometheus())),
+    ("GET", r"/cursos", lambda g, c: api_lista(lambda: registro.cursos, curso_a_dict)),
+    ("GET", r"/cursos/([^/]+)", lambda g, c: api_objeto(registro.curso, curso_a_dict, g[0], "Curso")),
+    ("GET", r"/cursos/([^/]+)/alumnos", lambda g, c: api_alumnos_de_curso(g[0])),
+    ("POST", r"/cursos/([^/]+)/provisionar", lambda g, c: api_global(op_provisionar, {"curso": g[0]})),
+    ("GET", r"/alumnos", lambda g, c: api_busqueda(buscar_alumnos, alumno_a_dict, lambda: registro.alumnos_por_mac, c,
+                                                    ("autorizado", "con_conexiones"))),
+    ("GET", r"/alumnos/([^/]+)", lambda g, c: (200, alumno_a_dict(alumno_de({"alumno": g[0]})))),
+    ("GET", r"/alumnos/([^/]+)/conexiones", lambda g, c: api_conexiones_de_alumno(g[0])),
+    ("GET", r"/servidores", lambda g, c: api_busqueda(buscar_servidores, servidor_a_dict, lambda: registro.servidores, c,
+                                                       ("con_conexiones",))),
+    ("GET", r"/servidores/([^/]+)", lambda g, c: api_objeto(registro.servidor, servidor_a_dict, g[0], "Servidor")),
+    ("GET", r"/conexiones", lambda g, c: api_lista(lambda: registro.conexiones, conexion_a_dict)),
+    ("POST", r"/conexiones", lambda g, c: api_crear(c)),
+    ("GET", r"/conexiones/([^/]+)", lambda g, c: api_objeto(registro.conexion, conexion_a_dict, g[0], "Conexión")),
+    ("DELETE", r"/conexiones/([^/]+)", lambda g, c: api_sobre_conexion(op_borrar, g[0])),
+    ("POST", r"/conexiones/([^/]+)/actualizar", lambda g, c: api_sobre_conexion(op_actualizar, g[0])),
+    ("POST", r"/reconciliar", lambda g, c: api_global(op_reconciliar, c)),
+)]
+
+class ManejadorAPI(BaseHTTPRequestHandler):
+    """Atiende la API REST local sobre el mismo registro que usan el menú y los lotes."""
+
+    protocol_version = "HTTP/1.1"    # Keep-alive para los clientes que hacen muchos requests
+    timeout = API_TIMEOUT
+
+    def log_message(self, *args):
+        pass
+
+    def responder(self, estado, cuerpo):
+        if isinstance(cuerpo, str):
+            datos, tipo = cuerpo.encode(), "text/plain; version=0.0.4"
+        else:
+            datos, tipo = json.dumps(cuerpo, ensure_ascii=False).encode(), "application/json"
+        self.send_response(estado)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def leer_cuerpo(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        if not largo:
+            return {}
+        try:
+            cuerpo = json.loads(self.rfile.read(largo))
+        except ValueError as exc:
+            raise ErrorOperacion(f"JSON inválido: {exc}")
+        if not isinstance(cuerpo, dict):
+            raise ErrorOperacion("Se esperaba un objeto JSON.")
+        return cuerpo
+
+    def despachar(self, metodo):
+        ruta = urlsplit(self.path).path.rstrip("/") or "/"
+        candidatas = [(m, patron, f) for m, patron, f in RUTAS_API if patron.fullmatch(ruta)]
+        elegida = next(((patron, f) for m, patron, f in candidatas if m == metodo), None)
+        if elegida is None:
+            # Se consume el cuerpo para no romper la conexión keep-alive
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            estado = 405 if candidatas else 404
+            self.responder(estado, {"error": "Método no permitido." if candidatas else "Ruta no encontrada."})
+            return
+        patron, funcion = elegida
+        with metricas.medir("api_segundos", metodo=metodo, ruta=patron.pattern):
+            try:
+                cuerpo = self.leer_cuerpo()
+                if metodo == "GET":
+                    # En los GET los parámetros de la URL (búsquedas y páginas) hacen de cuerpo
+                    cuerpo = dict(parse_qsl(urlsplit(self.path).query)) | cuerpo
+                grupos = [unquote(g) for g in patron.fullmatch(ruta).groups()]
+                estado, respuesta = funcion(grupos, cuerpo)
+            except NoEncontrado as exc:
+                estado, respuesta = 404, {"error": str(exc)}
+            except ErrorOperacion as exc:
+                estado, respuesta = 400, {"error": str(exc)}
+            except Exception as exc:
+                estado, respuesta = 500, {"error": f"{type(exc).__name__}: {exc}"}
+        metricas.contar("api_respuestas", estado=str(estado))
+        self.responder(estado, respuesta)
+
+    def do_GET(self):
+        self.despachar("GET")
+
+    def do_POST(self):
+        self.despachar("POST")
+
+    def do_DELETE(self):
+        self.despachar("DELETE")
+
+class ServidorAPI(HTTPServer):
+    """HTTPServer que atiende cada conexión en un pool acotado de trabajadores.
+
+    A lo sumo hilos + cola conexiones quedan en manos del pool; las que llegan con todo
+    ocupado reciben 503 de inmediato en vez de acumularse sin límite.
+    """
+
+    request_queue_size = 128    # Conexiones en espera antes de que el sistema las rechace
+
+    def __init__(self, direccion, hilos=API_HILOS, cola=API_COLA):
+        super().__init__(direccion, ManejadorAPI)
+        self.executor = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="api")
+        self.cupos = threading.BoundedSemaphore(hilos + cola)
+
+    def process_request(self, request, client_address):
+        if not self.cupos.acquire(blocking=False):
+            self.rechazar(request)
+            return
+        self.executor.submit(self.atender, request, client_address)
+
+    def atender(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.cupos.release()
+
+    def rechazar(self, request):
+        """Responde 503 desde el hilo que acepta conexiones, sin ocupar un trabajador."""
+        datos = json.dumps({"error": "Servidor saturado; reintente en unos segundos."}, ensure_ascii=False).encode()
+        try:
+            request.settimeout(0.05)
+            try:
+                request.recv(65536)    # Lo ya recibido: cerrar con datos sin leer cortaría la respuesta
+            except OSError:
+                pass
+            request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+                            b"Retry-After: 1\r\nConnection: close\r\n"
+                            + f"Content-Length: {len(datos)}\r\n\r\n".encode() + datos)
+        except OSError:
+            pass
+        metricas.contar("api_respuestas", estado="503")
+        self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+def servir_api(host="127.0.0.1", puerto=API_PUERTO, hilos=API_HILOS, cola=API_COLA):
+    """Atiende la API hasta Ctrl+C."""
+    servidor = ServidorAPI((host, puerto), hilos, cola)
+    print(f"API escuchando en http://{host}:{servidor.server_address[1]} con {hilos} trabajadores (Ctrl+C para salir)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+
+# --- Línea de comandos ---
+COMANDOS = ("menu", "servir", "lote", "crear", "borrar", "recalcular", "actualizar", "provisionar", "exportar", "reconciliar")
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="app.py",
+        description="Conexiones de laboratorio sobre Floodlight. Sin subcomando (o con sólo un YAML) abre el menú.",
+    )
+    parser.add_argument("--controlador", help=f"IP del controlador Floodlight (por defecto {controller_ip}); "
+                                              "varios separados por comas reparten los switches")
+    parser.add_argument("--mapa-switches", metavar="ARCHIVO",
+                        help="YAML/JSON dpid: controlador; sin él, cada switch se asigna a quien lo reporta")
+    parser.add_argument("--db", default=DB_CONEXIONES, help="archivo SQLite de conexiones")
+    parser.add_argument("--rutas", choices=MODOS_SELECCION, default=SELECCION_RUTA,
+                        help="cómo se elige la ruta de cada conexión nueva")
+    parser.add_argument("--lease", type=int, default=LEASE_DURACION, metavar="SEGUNDOS",
+                        help="hard_timeout de los flows; en el menú y en 'servir' se renuevan solos (0: permanentes)")
+    parser.add_argument("--limite-controlador", type=float, default=LIMITE_POR_CONTROLADOR, metavar="RPS",
+                        help="POST/DELETE por segundo a cada controlador (0: sin límite)")
+    parser.add_argument("--lease-inactividad", type=int, default=LEASE_INACTIVIDAD, metavar="SEGUNDOS",
+                        help="idle_timeout de los flows (0: sin límite)")
+    sub = parser.add_subparsers(dest="comando")
+
+    p = sub.add_parser("menu", help="menú interactivo")
+    p.add_argument("yaml", nargs="?", help="YAML a importar al iniciar")
+
+    p = sub.add_parser("servir", help="API REST local para varios operadores a la vez")
+    p.add_argument("--yaml", help="YAML a importar al iniciar")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--puerto", type=int, default=API_PUERTO)
+    p.add_argument("--hilos", type=int, default=API_HILOS, help="requests atendidos a la vez")
+    p.add_argument("--cola", type=int, default=API_COLA, help="conexiones en espera antes de responder 503")
+
+    p = sub.add_parser("lote", help="operaciones en JSON Lines, una por línea; un resultado JSON por operación")
+    p.add_argument("archivo", nargs="?", default="-", help="archivo JSON Lines ('-' para stdin)")
+    p.add_argument("--yaml", help="YAML a importar antes de las operaciones")
+    p.add_argument("--paralelo", type=int, default=LOTE_PARALELO, help="operaciones simultáneas")
+
+    for nombre, ayuda in (("crear", "crea una conexión"), ("borrar", "borra una conexión y sus flows"),
+                          ("recalcular", "muestra la ruta actual de una conexión"),
+                          ("actualizar", "mueve una conexión a la ruta actual")):
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument("--yaml", help="YAML a importar antes")
+        p.add_argument("--handler")
+        p.add_argument("--alumno", help="código (o MAC) del alumno")
+        p.add_argument("--servidor", help="nombre del servidor")
+        p.add_argument("--servicio", help="nombre del servicio")
+
+    p = sub.add_parser("provisionar", help="crea todas las conexiones de un curso")
+    p.add_argument("--yaml", help="YAML a importar antes")
+    p.add_argument("curso")
+
+    p = sub.add_parser("exportar", help="exporta el estado a YAML o JSON Lines")
+    p.add_argument("--yaml", help="YAML a importar antes")
+    p.add_argument("ruta")
+    p.add_argument("--formato", choices=("yaml", "jsonl"))
+    p.add_argument("--incremental", action="store_true")
+
+    p = sub.add_parser("reconciliar", help="compara los flows del controlador con las conexiones")
+    p.add_argument("--yaml", help="YAML a importar antes")
+    p.add_argument("--solo-revisar", action="store_true", help="no corrige, sólo informa")
+    return parser
+
+def operacion_de_args(args):
+    """Traduce un subcomando de una sola operación al mismo formato que una línea del lote."""
+    op = {"op": args.comando}
+    if args.comando == "reconciliar":
+        op["reparar"] = not args.solo_revisar
+    for nombre in ("handler", "alumno", "servidor", "servicio", "curso", "ruta", "formato", "incremental"):
+        if getattr(args, nombre, None) is not None:
+            op[nombre] = getattr(args, nombre)
+    return op
+
+def ejecutar_comando(args):
+    """Ejecuta un subcomando no interactivo; devuelve el código de salida del proceso."""
+    if args.comando == "servir":
+        if args.yaml:
+            importar_yaml(args.yaml)
+        if LEASE_DURACION:
+            renovador.iniciar()
+        servir_api(args.host, args.puerto, args.hilos, args.cola)
+        return 0
+
+    salida = sys.stdout
+    def escribir(resultado):
+        salida.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+        salida.flush()
+
+    # Los mensajes informativos van a stderr para que stdout sea sólo JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.yaml:
+            try:
+                importar_yaml(args.yaml)
+            except (OSError, ValueError, KeyError, yaml.YAMLError) as exc:
+                escribir({"linea": 0, "op": "importar", "ok": False, "error": f"Error al importar '{args.yaml}': {exc}"})
+                return 1
+        if args.comando == "lote":
+            if args.archivo == "-":
+                _, fallidas = ejecutar_lote(leer_operaciones(sys.stdin), escribir, args.paralelo)
+            else:
+                with open(args.archivo) as f:
+                    _, fallidas = ejecutar_lote(leer_operaciones(f), escribir, args.paralelo)
+        else:
+            _, fallidas = ejecutar_lote([(1, operacion_de_args(args))], escribir, 1)
+    return 1 if fallidas else 0
+
+def main(argv=None):
+
+    """Ejecuta un subcomando, o carga opcionalmente un archivo YAML y luego inicia el menú."""
+    global controller_ip, LEASE_DURACION, LEASE_INACTIVIDAD
+    parser = crear_parser()
+    argv = sys.argv[1:] if argv is None else argv
+    # Compatibilidad: 'app.py datos.yaml' sigue abriendo el menú con ese archivo
+    if argv and not argv[0].startswith("-") and argv[0] not in COMANDOS:
+        argv = ["menu"] + argv
+    args = parser.parse_args(argv)
+    ips = [ip.strip() for ip in (args.controlador or "").split(",") if ip.strip()]
+    if args.mapa_switches and len(ips) < 2:
+        # Con un solo controlador todos los switches son suyos: el mapa no tendría efecto
+        parser.error("--mapa-switches requiere varios controladores en --controlador (ip1,ip2,...)")
+    if ips:
+        controller_ip = ips[0]
+        mapa = cargar_mapa_switches(args.mapa_switches) if args.mapa_switches else None
+        controladores.configurar(ips, mapa)
+    selector_rutas.modo = args.rutas
+    LEASE_DURACION, LEASE_INACTIVIDAD = args.lease, args.lease_inactividad
+    limitador.tasa = args.limite_controlador
+    abrir_almacen(args.db)
+    if args.comando not in (None, "menu"):
+        sys.exit(ejecutar_comando(args))
+
+    ruta = getattr(args, "yaml", None)
+    # Si se pasa una ruta como argumento, úsala; de lo contrario pregunta al usuario
+    if not ruta:
         ruta = input(
             "Archivo YAML inicial (dejar vacío para continuar sin importar): "
         ).strip()
@@ -628,6 +4824,8 @@ def main():
             importar_yaml(ruta)
         except Exception as exc:
             print(f"Error al importar '{ruta}': {exc}")
+    if LEASE_DURACION:
+        renovador.iniciar()
     
     menu()
 
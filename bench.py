@@ -0,0 +1,260 @@
+"""Benchmarks de la herramienta de conexiones (no forman parte del menú).
+
+Uso:
+    python bench.py memoria [--alumnos N] [--conexiones N] [--servidores N] [--saltos N]
+    python bench.py e2e [--topologia fattree|lineal|aleatoria] [--hosts N] [--latencia S] [--controladores N] [--json]
+"""
+import argparse  # Para los subcomandos del benchmark
+import contextlib  # Para silenciar los mensajes de app.py durante las mediciones
+import gc  # Para medir con el recolector en un estado estable
+import io  # Destino de la salida silenciada
+import json  # Resultados legibles por máquina
+import os  # Rutas temporales
+import resource  # Pico de memoria residente (RSS)
+import tempfile  # Roster YAML temporal
+import time  # Cronómetro de las fases
+import tracemalloc  # Para contar los bytes reservados por los objetos
+
+import yaml
+
+import app
+import mock_floodlight
+
+# --- Modelos anteriores (sin __slots__, rutas como listas por conexión) ---
+class AlumnoAnterior:
+    def __init__(self, nombre, mac, codigo=None, ip=None, autorizado=False):
+        self.nombre = nombre
+        self.mac = mac
+        self.codigo = codigo
+        self.ip = ip
+        self.autorizado = autorizado
+
+class ConexionAnterior:
+    def __init__(self, handler, alumno, servidor, servicio, ruta=None):
+        self.handler = handler
+        self.alumno = alumno
+        self.servidor = servidor
+        self.servicio = servicio
+        self.ruta = ruta or []
+
+# --- Medición de memoria ---
+def medir(construir):
+    """Devuelve los bytes que quedan reservados tras ejecutar construir() y su resultado."""
+    gc.collect()
+    tracemalloc.start()
+    objetos = construir()
+    gc.collect()
+    usados, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return usados, objetos
+
+def datos_alumno(i):
+    # Cada string se genera de nuevo, como ocurre al leer el YAML
+    mac = "aa:%02x:%02x:%02x:%02x:%02x" % ((i >> 32) & 255, (i >> 24) & 255, (i >> 16) & 255, (i >> 8) & 255, i & 255)
+    return f"Alumno {i}", mac, f"{20190000 + i}", True
+
+def ruta_nueva(servidor, saltos):
+    # Como get_route: una lista y tuplas nuevas en cada consulta
+    ruta = [(f"00:00:00:00:00:00:00:{1:02x}", 1)]
+    for k in range(1, saltos):
+        ruta.append((f"00:00:00:00:00:00:{servidor:02x}:{k:02x}", 2))
+        ruta.append((f"00:00:00:00:00:00:{servidor:02x}:{k + 1:02x}", 1))
+    ruta.append((f"00:00:00:00:00:00:{servidor:02x}:{saltos:02x}", 3))
+    return ruta
+
+def bench_memoria(args):
+    servidores = [app.Servidor(f"srv{i}", f"10.0.1.{i}", "bb:00:00:00:00:%02x" % i) for i in range(args.servidores)]
+    servicio = app.Servicio("ssh", "TCP", 22)
+
+    def alumnos_con(clase):
+        return lambda: [clase(nombre, mac, codigo=codigo, autorizado=aut)
+                        for nombre, mac, codigo, aut in map(datos_alumno, range(args.alumnos))]
+
+    def conexiones_con(clase, alumnos):
+        def construir():
+            return [clase(f"con{i}", alumnos[i % len(alumnos)], servidores[i % len(servidores)], servicio,
+                          ruta_nueva(i % len(servidores), args.saltos))
+                    for i in range(args.conexiones)]
+        return construir
+
+    filas = []
+    for etiqueta, clase_alumno, clase_conexion in (
+        ("antes", AlumnoAnterior, ConexionAnterior),
+        ("después", app.Alumno, app.Conexion),
+    ):
+        app.rutas_compartidas.clear()
+        bytes_alumnos, alumnos = medir(alumnos_con(clase_alumno))
+        bytes_conexiones, conexiones = medir(conexiones_con(clase_conexion, alumnos))
+        filas.append((etiqueta, bytes_alumnos / len(alumnos), bytes_conexiones / len(conexiones)))
+        del alumnos, conexiones
+
+    print(f"{args.alumnos} alumnos, {args.conexiones} conexiones, {args.servidores} servidores, {args.saltos} saltos")
+    print(f"{'':10}{'bytes/alumno':>16}{'bytes/conexión':>18}")
+    for etiqueta, por_alumno, por_conexion in filas:
+        print(f"{etiqueta:10}{por_alumno:>16.1f}{por_conexion:>18.1f}")
+    (_, a0, c0), (_, a1, c1) = filas
+    print(f"{'ahorro':10}{100 * (1 - a1 / a0):>15.1f}%{100 * (1 - c1 / c0):>17.1f}%")
+
+# --- Benchmark de extremo a extremo ---
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, round(p / 100 * (len(ordenados) - 1)))]
+
+def pico_rss_mb():
+    # En Linux ru_maxrss viene en KiB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def cronometrar(funcion, *args, **kwargs):
+    """Ejecuta la función sin su salida por pantalla y devuelve (segundos, resultado)."""
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = funcion(*args, **kwargs)
+    return time.perf_counter() - inicio, resultado
+
+def reiniciar_caches():
+    app.cache_dispositivos.invalidar()
+    app.topologia.invalidar()
+
+def fila_latencias(nombre, latencias, unidades, segundos, **extra):
+    return {
+        "fase": nombre,
+        "operaciones": unidades,
+        "ops_por_s": unidades / segundos if segundos else 0.0,
+        "p50_ms": percentil(latencias, 50) * 1000,
+        "p99_ms": percentil(latencias, 99) * 1000,
+        "segundos": segundos,
+    } | extra
+
+def bench_e2e(args):
+    estado = mock_floodlight.crear_estado(args)
+    if args.controladores > 1:
+        # Instancias en 127.0.0.1..N; el mapa de switches se descubre como con controladores reales
+        servidores_mock, _ = mock_floodlight.iniciar_controladores(estado, args.controladores)
+        ips = [s.http.server_address[0] for s in servidores_mock]
+    else:
+        servidores_mock = [mock_floodlight.ServidorFloodlight(estado, args.host).iniciar()]
+        ips = [args.host]
+    app.controladores.configurar(ips)
+    app.controller_ip = ips[0]
+    filas = []
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta_yaml = os.path.join(carpeta, "roster.yaml")
+            with open(ruta_yaml, "w") as f:
+                yaml.safe_dump(mock_floodlight.roster(estado, args.servidores, args.cursos), f, sort_keys=False)
+
+            # importar_yaml: en frío (parseo completo) y con el snapshot ya guardado
+            app.SNAPSHOT_DIR = carpeta
+            segundos, _ = cronometrar(app.importar_yaml, ruta_yaml)
+            filas.append(fila_latencias("importar_yaml (frío)", [segundos], 1, segundos))
+            segundos, _ = cronometrar(app.importar_yaml, ruta_yaml)
+            filas.append(fila_latencias("importar_yaml (snapshot)", [segundos], 1, segundos))
+
+            alumnos = list(app.registro.alumnos.values())
+            servidores = list(app.registro.servidores.values())
+            muestras = alumnos[:args.muestras]
+
+            # calcular_ruta desde cachés vacías
+            reiniciar_caches()
+            latencias, rutas = [], []
+            inicio = time.perf_counter()
+            for i, alumno in enumerate(muestras):
+                segundos, ruta = cronometrar(app.calcular_ruta, alumno, servidores[i % len(servidores)])
+                latencias.append(segundos)
+                rutas.append((alumno, servidores[i % len(servidores)], ruta))
+            filas.append(fila_latencias("calcular_ruta", latencias, len(muestras), time.perf_counter() - inicio))
+
+            # build_route sobre las rutas calculadas
+            latencias, flows = [], 0
+            inicio = time.perf_counter()
+            for alumno, srv, ruta in rutas:
+                if not ruta:
+                    continue
+                segundos, reporte = cronometrar(
+                    app.build_route, app.controller_ip, ruta, ruta[0][1], ruta[-1][1],
+                    alumno.mac, alumno.ip, srv.mac, srv.direccion_ip, 6, 0, 22)
+                latencias.append(segundos)
+                flows += len(reporte.exitosos)
+            segundos = time.perf_counter() - inicio
+            filas.append(fila_latencias("build_route", latencias, len(latencias), segundos,
+                                        flows=flows, flows_por_s=flows / segundos if segundos else 0.0))
+
+            # Creación de conexiones una por una (como desde el menú)
+            reiniciar_caches()
+            latencias, flows = [], 0
+            inicio = time.perf_counter()
+            for i, alumno in enumerate(muestras):
+                srv = servidores[i % len(servidores)]
+                segundos, resultado = cronometrar(app.crear_conexion, alumno, srv, srv.servicios[0])
+                latencias.append(segundos)
+                if resultado.reporte:
+                    flows += len(resultado.reporte.exitosos)
+            segundos = time.perf_counter() - inicio
+            filas.append(fila_latencias("crear_conexion", latencias, len(muestras), segundos,
+                                        flows=flows, flows_por_s=flows / segundos if segundos else 0.0))
+
+            # Aprovisionamiento masivo de cada curso
+            reiniciar_caches()
+            latencias, conexiones, flows = [], 0, 0
+            inicio = time.perf_counter()
+            for curso in app.registro.cursos.values():
+                segundos, reporte = cronometrar(app.provisionar_curso, curso)
+                latencias.append(segundos)
+                conexiones += sum(1 for r in reporte.resultados if r.ok)
+                flows += len(reporte.reporte_flows.exitosos)
+            segundos = time.perf_counter() - inicio
+            filas.append(fila_latencias("provisionar_curso", latencias, conexiones, segundos,
+                                        flows=flows, flows_por_s=flows / segundos if segundos else 0.0))
+    finally:
+        for servidor in servidores_mock:
+            servidor.detener()
+
+    resumen = {
+        "topologia": args.topologia,
+        "switches": len(estado.topologia.switches),
+        "hosts": len(estado.dispositivos),
+        "latencia_s": args.latencia,
+        "controladores": len(ips),
+        "fases": filas,
+        "requests_controlador": estado.contadores,
+        "pico_rss_mb": pico_rss_mb(),
+    }
+    if args.json:
+        print(json.dumps(resumen, indent=2))
+        return
+    print(f"{args.topologia}: {resumen['switches']} switches, {resumen['hosts']} hosts, "
+          f"latencia {args.latencia * 1000:.1f} ms, {len(ips)} controladores")
+    print(f"{'fase':26}{'ops':>8}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'flows/s':>10}")
+    for fila in filas:
+        print(f"{fila['fase']:26}{fila['operaciones']:>8}{fila['ops_por_s']:>10.1f}"
+              f"{fila['p50_ms']:>10.2f}{fila['p99_ms']:>10.2f}{fila.get('flows_por_s', 0):>10.1f}")
+    print("requests al controlador: " + ", ".join(f"{k}={v}" for k, v in sorted(estado.contadores.items())))
+    print(f"pico RSS: {resumen['pico_rss_mb']:.1f} MiB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de la herramienta de conexiones")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("memoria", help="bytes por alumno y por conexión antes/después de los modelos compactos")
+    p.add_argument("--alumnos", type=int, default=100000)
+    p.add_argument("--conexiones", type=int, default=200000)
+    p.add_argument("--servidores", type=int, default=20)
+    p.add_argument("--saltos", type=int, default=6)
+    p.set_defaults(func=bench_memoria)
+
+    p = sub.add_parser("e2e", help="importación, rutas, flows y conexiones contra el Floodlight simulado")
+    mock_floodlight.agregar_argumentos(p)
+    p.add_argument("--host", default="127.0.0.1", help="dirección local del controlador simulado")
+    p.add_argument("--servidores", type=int, default=2)
+    p.add_argument("--cursos", type=int, default=2)
+    p.add_argument("--muestras", type=int, default=50, help="alumnos usados en las fases una por una")
+    p.add_argument("--json", action="store_true", help="imprime los resultados en JSON")
+    p.set_defaults(func=bench_e2e)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,479 @@
+"""Controlador Floodlight simulado para medir la herramienta sin un controlador real.
+
+Implementa las rutas REST que usa app.py sobre una topología sintética (fat-tree, lineal o
+aleatoria) con latencia configurable por request. Con --controladores N se levantan N
+instancias en 127.0.0.1..N, cada una dueña de una parte de los switches.
+
+Uso:
+    python mock_floodlight.py --topologia fattree --k 4 --hosts 200 --latencia 0.005 \\
+        --yaml roster.yaml
+"""
+import argparse  # Para los parámetros de la línea de comandos
+import json  # Respuestas de la API
+import random  # Topologías aleatorias y jitter de latencia
+import re  # Para reconocer las rutas REST
+import threading  # El servidor corre en un hilo en segundo plano
+import time  # Para la latencia simulada
+from collections import deque  # BFS para las rutas
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml  # Para escribir un roster que coincida con los hosts simulados
+
+PUERTO_API = 8080    # app.py siempre usa el puerto 8080 del controlador
+TRAFICO_POR_FLOW = 1_000_000    # bps que simula cada flow IPv4 instalado sobre su puerto de salida
+
+# --- Topologías sintéticas ---
+def dpid(numero):
+    """Convierte un número de switch en un DPID con el formato de Floodlight."""
+    return ":".join(f"{b:02x}" for b in numero.to_bytes(8, "big"))
+
+class Topologia:
+    """Switches, enlaces y puertos libres de una red sintética."""
+
+    def __init__(self):
+        self.switches = []
+        self.links = []    # (dpid_a, puerto_a, dpid_b, puerto_b)
+        self.puertos = {}    # dpid -> último puerto usado
+        self.bordes = []    # Switches donde se conectan los hosts
+
+    def agregar_switch(self, numero, borde=False):
+        d = dpid(numero)
+        self.switches.append(d)
+        self.puertos[d] = 0
+        if borde:
+            self.bordes.append(d)
+        return d
+
+    def nuevo_puerto(self, d):
+        self.puertos[d] += 1
+        return self.puertos[d]
+
+    def enlazar(self, a, b):
+        self.links.append((a, self.nuevo_puerto(a), b, self.nuevo_puerto(b)))
+
+def fat_tree(k):
+    """Fat-tree de k pods: (k/2)^2 cores, k*k/2 agregación y k*k/2 borde."""
+    if k < 2 or k % 2:
+        raise ValueError("k debe ser par y mayor o igual a 2")
+    t = Topologia()
+    mitad = k // 2
+    numero = 1
+    cores = []
+    for _ in range(mitad * mitad):
+        cores.append(t.agregar_switch(numero))
+        numero += 1
+    for pod in range(k):
+        aggs = []
+        for _ in range(mitad):
+            aggs.append(t.agregar_switch(numero))
+            numero += 1
+        for _ in range(mitad):
+            borde = t.agregar_switch(numero, borde=True)
+            numero += 1
+            for agg in aggs:
+                t.enlazar(borde, agg)
+        for i, agg in enumerate(aggs):
+            for j in range(mitad):
+                t.enlazar(agg, cores[i * mitad + j])
+    return t
+
+def lineal(n):
+    """Cadena de n switches; todos admiten hosts."""
+    t = Topologia()
+    anterior = None
+    for numero in range(1, n + 1):
+        actual = t.agregar_switch(numero, borde=True)
+        if anterior:
+            t.enlazar(anterior, actual)
+        anterior = actual
+    return t
+
+def aleatoria(n, grado=3, semilla=0):
+    """Grafo conexo aleatorio de n switches con grado medio aproximado."""
+    rnd = random.Random(semilla)
+    t = Topologia()
+    nodos = [t.agregar_switch(numero, borde=True) for numero in range(1, n + 1)]
+    pares = set()
+    for i in range(1, n):    # Árbol de expansión para garantizar conectividad
+        j = rnd.randrange(i)
+        pares.add((j, i))
+        t.enlazar(nodos[j], nodos[i])
+    extra = max(0, (n * grado) // 2 - (n - 1))
+    intentos = 0
+    while extra and intentos < extra * 20:
+        intentos += 1
+        i, j = sorted(rnd.sample(range(n), 2))
+        if (i, j) not in pares:
+            pares.add((i, j))
+            t.enlazar(nodos[i], nodos[j])
+            extra -= 1
+    return t
+
+TOPOLOGIAS = {
+    "fattree": lambda args: fat_tree(args.k),
+    "lineal": lambda args: lineal(args.switches),
+    "aleatoria": lambda args: aleatoria(args.switches, args.grado, args.semilla),
+}
+
+# --- Estado del controlador simulado ---
+CAMPOS_NO_MATCH = {"name", "actions", "active", "hard_timeout", "idle_timeout", "cookie"}    # El resto identifica la regla
+
+def match_de(flow):
+    """Campos que identifican la regla en el switch (switch, prioridad y match)."""
+    return {k: v for k, v in flow.items() if k not in CAMPOS_NO_MATCH}
+
+class EstadoFloodlight:
+    """Dispositivos, topología y flows estáticos del controlador simulado."""
+
+    def __init__(self, topologia, hosts=0, latencia=0.0, jitter=0.0, semilla=0):
+        self.topologia = topologia
+        self.latencia = latencia    # Segundos añadidos a cada request
+        self.jitter = jitter    # Variación uniforme adicional (0..jitter segundos)
+        self.random = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.flows = {}    # nombre -> cuerpo del flow
+        self.vencimientos = {}    # nombre -> instante (monotonic) en que vence su hard_timeout
+        self.contadores = {}    # endpoint -> número de requests atendidos
+        self.carga_extra = {}    # (dpid, puerto) -> bps de tráfico de fondo simulado
+        self.adyacencia = {d: [] for d in topologia.switches}
+        for a, pa, b, pb in topologia.links:
+            self.adyacencia[a].append((pa, b, pb))
+            self.adyacencia[b].append((pb, a, pa))
+        self.dispositivos = []
+        for i in range(hosts):
+            self.agregar_host(i)
+
+    def agregar_host(self, i):
+        """Conecta el host i a un switch de borde (en orden circular)."""
+        borde = self.topologia.bordes[i % len(self.topologia.bordes)]
+        puerto = self.topologia.nuevo_puerto(borde)
+        host = {
+            "mac": ["02:%02x:%02x:%02x:%02x:%02x" % ((i >> 32) & 255, (i >> 24) & 255, (i >> 16) & 255, (i >> 8) & 255, i & 255)],
+            "ipv4": ["10.%d.%d.%d" % ((i >> 16) & 255, (i >> 8) & 255, i & 255)],
+            "attachmentPoint": [{"switchDPID": borde, "port": puerto}],
+        }
+        self.dispositivos.append(host)
+        return host
+
+    def cortar_enlace(self, a, b):
+        """Elimina el enlace entre dos switches (para simular una falla); devuelve True si existía."""
+        with self.lock:
+            antes = len(self.topologia.links)
+            self.topologia.links = [l for l in self.topologia.links if {l[0], l[2]} != {a, b}]
+            self.adyacencia[a] = [v for v in self.adyacencia[a] if v[1] != b]
+            self.adyacencia[b] = [v for v in self.adyacencia[b] if v[1] != a]
+            return len(self.topologia.links) < antes
+
+    def instalar(self, flow):
+        """Guarda el flow; con hard_timeout el switch lo retira solo al vencer.
+
+        Como en Floodlight, reenviar un flow con el mismo nombre y match es un MODIFY_STRICT:
+        cambian sus acciones pero se conservan los timeouts y el vencimiento originales.
+        """
+        with self.lock:
+            self.expirar()
+            previo = self.flows.get(flow["name"])
+            if previo is not None and match_de(previo) == match_de(flow):
+                self.flows[flow["name"]] = previo | {"actions": flow.get("actions", "")}
+                return
+            self.flows[flow["name"]] = flow
+            duracion = int(flow.get("hard_timeout") or 0)
+            if duracion:
+                self.vencimientos[flow["name"]] = time.monotonic() + duracion
+            else:
+                self.vencimientos.pop(flow["name"], None)
+
+    def expirar(self):
+        """Retira los flows cuyo hard_timeout venció (se llama con el lock tomado)."""
+        ahora = time.monotonic()
+        for nombre in [n for n, t in self.vencimientos.items() if t <= ahora]:
+            del self.vencimientos[nombre]
+            self.flows.pop(nombre, None)
+
+    def cargar_puerto(self, d, puerto, bps):
+        """Simula tráfico de fondo que sale por un puerto (y entra por el otro extremo del enlace)."""
+        with self.lock:
+            self.carga_extra[(d, puerto)] = bps
+
+    def ancho_de_banda(self):
+        """Filas de /wm/statistics/bandwidth: tráfico de los flows IPv4 más la carga de fondo."""
+        tx = {}
+        with self.lock:
+            self.expirar()
+            for flow in self.flows.values():
+                if flow.get("eth_type") != "0x0800":
+                    continue
+                for accion in flow.get("actions", "").split(","):
+                    if accion.startswith("output="):
+                        clave = (flow["switch"], int(accion[len("output="):]))
+                        tx[clave] = tx.get(clave, 0) + TRAFICO_POR_FLOW
+            for clave, bps in self.carga_extra.items():
+                tx[clave] = tx.get(clave, 0) + bps
+            # Lo que sale por un extremo de un enlace entra por el otro
+            rx = {}
+            for a, pa, b, pb in self.topologia.links:
+                rx[(b, pb)] = tx.get((a, pa), 0)
+                rx[(a, pa)] = tx.get((b, pb), 0)
+        return [{"dpid": d, "port": str(p), "bits-per-second-rx": str(rx.get((d, p), 0)),
+                 "bits-per-second-tx": str(tx.get((d, p), 0)), "link-speed-bits-per-second": "1000000000"}
+                for d, p in sorted(set(tx) | set(rx))]
+
+    def contar(self, endpoint):
+        with self.lock:
+            self.contadores[endpoint] = self.contadores.get(endpoint, 0) + 1
+
+    def esperar(self):
+        demora = self.latencia + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+        if demora:
+            time.sleep(demora)
+
+    def ruta(self, src, src_port, dst, dst_port):
+        """Camino mínimo en el formato de /wm/topology/route."""
+        if src not in self.adyacencia or dst not in self.adyacencia:
+            return []
+        previo = {src: None}
+        cola = deque([src])
+        while cola and dst not in previo:
+            actual = cola.popleft()
+            for puerto, vecino, puerto_vecino in self.adyacencia[actual]:
+                if vecino not in previo:
+                    previo[vecino] = (actual, puerto, puerto_vecino)
+                    cola.append(vecino)
+        if dst not in previo:
+            return []
+        tramos = []
+        actual = dst
+        while previo[actual]:
+            anterior, salida, entrada = previo[actual]
+            tramos.append((anterior, salida, actual, entrada))
+            actual = anterior
+        hops = [{"switch": src, "port": src_port}]
+        for anterior, salida, siguiente, entrada in reversed(tramos):
+            hops.append({"switch": anterior, "port": salida})
+            hops.append({"switch": siguiente, "port": entrada})
+        hops.append({"switch": dst, "port": dst_port})
+        return hops
+
+    def links_json(self):
+        return [{"src-switch": a, "src-port": pa, "dst-switch": b, "dst-port": pb,
+                 "type": "internal", "direction": "bidirectional", "latency": 0}
+                for a, pa, b, pb in self.topologia.links]
+
+    def flows_por_switch(self, switch=None, propios=None):
+        salida = {}
+        with self.lock:
+            self.expirar()
+            for nombre, flow in self.flows.items():
+                if propios is not None and flow.get("switch") not in propios:
+                    continue
+                if switch in (None, "all") or flow.get("switch") == switch:
+                    salida.setdefault(flow.get("switch"), []).append({nombre: flow})
+        return salida
+
+# --- API REST ---
+RUTA_ROUTE = re.compile(r"^/wm/topology/route/([^/]+)/([^/]+)/([^/]+)/([^/]+)/json$")
+RUTA_LIST = re.compile(r"^/wm/staticflowpusher/list/([^/]+)/json$")
+
+class ManejadorFloodlight(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"    # Keep-alive, como el controlador real
+    estado = None    # Se asigna al crear el servidor
+    propios = None    # Switches de esta instancia (None: todos)
+    etiqueta = ""    # Sufijo de los contadores cuando hay varias instancias
+
+    def contar(self, endpoint):
+        self.estado.contar(endpoint + self.etiqueta)
+
+    def mio(self, d):
+        return self.propios is None or d in self.propios
+
+    def log_message(self, formato, *args):
+        pass
+
+    def responder(self, cuerpo, codigo=200):
+        datos = json.dumps(cuerpo).encode()
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(datos)))
+        self.end_headers()
+        self.wfile.write(datos)
+
+    def leer_json(self):
+        largo = int(self.headers.get("Content-Length") or 0)
+        if not largo:
+            return {}
+        return json.loads(self.rfile.read(largo))
+
+    def do_GET(self):
+        estado = self.estado
+        path = self.path.split("?")[0]
+        estado.esperar()
+        if path in ("/wm/device/", "/wm/device"):
+            self.contar("device")
+            self.responder([h for h in estado.dispositivos if self.mio(h["attachmentPoint"][0]["switchDPID"])])
+        elif path == "/wm/core/controller/switches/json":
+            self.contar("switches")
+            self.responder([{"switchDPID": d} for d in estado.topologia.switches if self.mio(d)])
+        elif path == "/wm/topology/links/json":
+            self.contar("links")
+            # Cada instancia informa los enlaces que tocan alguno de sus switches
+            self.responder([l for l in estado.links_json() if self.mio(l["src-switch"]) or self.mio(l["dst-switch"])])
+        elif RUTA_ROUTE.match(path):
+            self.contar("route")
+            src, sp, dst, dp = RUTA_ROUTE.match(path).groups()
+            self.responder(estado.ruta(src, int(sp), dst, int(dp)))
+        elif path == "/wm/statistics/bandwidth/all/all/json":
+            self.contar("bandwidth")
+            self.responder([f for f in estado.ancho_de_banda() if self.mio(f["dpid"])])
+        elif RUTA_LIST.match(path):
+            self.contar("list")
+            self.responder(estado.flows_por_switch(RUTA_LIST.match(path).group(1), self.propios))
+        else:
+            self.responder({"error": "no encontrado"}, 404)
+
+    def do_POST(self):
+        estado = self.estado
+        estado.esperar()
+        if self.path == "/wm/statistics/config/enable/json":
+            self.leer_json()
+            self.responder({"statistics-collection": "enabled"})
+            return
+        if self.path != "/wm/staticflowpusher/json":
+            self.responder({"error": "no encontrado"}, 404)
+            return
+        self.contar("push")
+        flow = self.leer_json()
+        if "name" not in flow or "switch" not in flow:
+            self.responder({"status": "Fatal error: name y switch son obligatorios"}, 400)
+            return
+        if not self.mio(flow["switch"]):
+            self.responder({"status": f"Fatal error: el switch {flow['switch']} no está conectado a este controlador"}, 400)
+            return
+        estado.instalar(flow)
+        self.responder({"status": "Entry pushed"})
+
+    def do_DELETE(self):
+        estado = self.estado
+        estado.esperar()
+        if self.path != "/wm/staticflowpusher/json":
+            self.responder({"error": "no encontrado"}, 404)
+            return
+        self.contar("delete")
+        nombre = self.leer_json().get("name")
+        with estado.lock:
+            estado.expirar()
+            existia = nombre in estado.flows and self.mio(estado.flows[nombre].get("switch"))
+            if existia:
+                del estado.flows[nombre]
+                estado.vencimientos.pop(nombre, None)
+        self.responder({"status": f"Entry {nombre} deleted" if existia else "Entry not found"})
+
+class ServidorFloodlight:
+    """Servidor HTTP del controlador simulado, corriendo en un hilo en segundo plano."""
+
+    def __init__(self, estado, host="127.0.0.1", puerto=PUERTO_API, switches=None, etiqueta=""):
+        atributos = {"estado": estado, "propios": None if switches is None else set(switches), "etiqueta": etiqueta}
+        manejador = type("Manejador", (ManejadorFloodlight,), atributos)
+        self.estado = estado
+        self.http = ThreadingHTTPServer((host, puerto), manejador)
+        self.http.daemon_threads = True
+        self.hilo = None
+
+    def iniciar(self):
+        self.hilo = threading.Thread(target=self.http.serve_forever, name="mock-floodlight", daemon=True)
+        self.hilo.start()
+        return self
+
+    def detener(self):
+        self.http.shutdown()
+        self.http.server_close()
+
+def iniciar_controladores(estado, n, puerto=PUERTO_API):
+    """Levanta n instancias en 127.0.0.1..n que se reparten los switches; devuelve (servidores, mapa)."""
+    if n <= 1:
+        return [ServidorFloodlight(estado, "127.0.0.1", puerto).iniciar()], {}
+    hosts = [f"127.0.0.{i + 1}" for i in range(n)]
+    mapa = {d: hosts[i % n] for i, d in enumerate(estado.topologia.switches)}
+    servidores = [ServidorFloodlight(estado, host, puerto, [d for d, h in mapa.items() if h == host],
+                                     f"@{host}").iniciar()
+                  for host in hosts]
+    return servidores, mapa
+
+# --- Roster de prueba ---
+def roster(estado, servidores=1, cursos=1):
+    """Documento en formato importar_yaml: los primeros hosts son servidores, el resto alumnos."""
+    hosts = estado.dispositivos
+    servidores_doc = []
+    for i, host in enumerate(hosts[:servidores]):
+        servidores_doc.append({
+            "nombre": f"srv{i + 1}",
+            "direccion_ip": host["ipv4"][0],
+            "mac": host["mac"][0],
+            "servicios": [
+                {"nombre": "ssh", "protocolo": "TCP", "puerto": 22},
+                {"nombre": "web", "protocolo": "TCP", "puerto": 80},
+            ],
+        })
+    alumnos_doc = [{
+        "nombre": f"Alumno {i}",
+        "codigo": f"{20190000 + i}",
+        "mac": host["mac"][0],
+        "ip": host["ipv4"][0],
+        "autorizado": True,
+    } for i, host in enumerate(hosts[servidores:])]
+    cursos_doc = []
+    for c in range(cursos):
+        cursos_doc.append({
+            "nombre": f"CURSO{c + 1}",
+            "estado": "DICTANDO",
+            "alumnos": [a["codigo"] for a in alumnos_doc[c::cursos]],
+            "servidores": [{"nombre": s["nombre"], "servicios_permitidos": ["ssh"]} for s in servidores_doc],
+        })
+    return {"alumnos": alumnos_doc, "servidores": servidores_doc, "cursos": cursos_doc}
+
+def agregar_argumentos(parser):
+    """Parámetros de topología y latencia (compartidos con bench.py)."""
+    parser.add_argument("--topologia", choices=sorted(TOPOLOGIAS), default="fattree")
+    parser.add_argument("--k", type=int, default=4, help="pods del fat-tree")
+    parser.add_argument("--switches", type=int, default=8, help="switches de la topología lineal o aleatoria")
+    parser.add_argument("--grado", type=int, default=3, help="grado medio de la topología aleatoria")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--hosts", type=int, default=200)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos añadidos a cada request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variación uniforme adicional en segundos")
+    parser.add_argument("--controladores", type=int, default=1,
+                        help="instancias en 127.0.0.1..N que se reparten los switches")
+
+def crear_estado(args):
+    return EstadoFloodlight(TOPOLOGIAS[args.topologia](args), args.hosts, args.latencia, args.jitter, args.semilla)
+
+def main():
+    parser = argparse.ArgumentParser(description="Controlador Floodlight simulado")
+    agregar_argumentos(parser)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=PUERTO_API)
+    parser.add_argument("--yaml", help="escribe un roster compatible con importar_yaml")
+    parser.add_argument("--servidores", type=int, default=1)
+    parser.add_argument("--cursos", type=int, default=1)
+    args = parser.parse_args()
+
+    estado = crear_estado(args)
+    if args.yaml:
+        with open(args.yaml, "w") as f:
+            yaml.safe_dump(roster(estado, args.servidores, args.cursos), f, sort_keys=False)
+    if args.controladores > 1:
+        servidores, _ = iniciar_controladores(estado, args.controladores, args.puerto)
+        direccion = ",".join(s.http.server_address[0] for s in servidores)
+    else:
+        servidores = [ServidorFloodlight(estado, args.host, args.puerto).iniciar()]
+        direccion = args.host
+    print(f"Floodlight simulado en {direccion}:{args.puerto} "
+          f"({len(estado.topologia.switches)} switches, {len(estado.topologia.links)} enlaces, "
+          f"{len(estado.dispositivos)} hosts)")
+    try:
+        servidores[0].hilo.join()
+    except KeyboardInterrupt:
+        for servidor in servidores:
+            servidor.detener()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Fixtures compartidas: Floodlight simulado en 127.0.0.1:8080 y estado global de app.py limpio."""
+import argparse
+import os
+import sys
+
+import pytest
+import yaml
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app
+import mock_floodlight
+
+@pytest.fixture
+def estado_app(monkeypatch, tmp_path):
+    """Reemplaza los singletons de app.py por instancias nuevas durante el test."""
+    for nombre, valor in {
+        "registro": app.Registro(),
+        "politicas": app.MotorPoliticas(),
+        "compilador": app.CompiladorFlows(),
+        "topologia": app.Topologia(),
+        "cache_dispositivos": app.CacheDispositivos(),
+        "estadisticas_puertos": app.EstadisticasPuertos(),
+        "selector_rutas": app.SelectorRutas(),
+        "controladores": app.Controladores(),
+        "planificador": app.Planificador(),
+        "agrupador": app.AgrupadorFlows(),
+        "rutas_compartidas": app.rutas_compartidas.__class__(),
+        "sesiones": {},
+        "almacen": None,
+        "ultimo_handler": 0,
+        "controller_ip": "127.0.0.1",
+        "SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+    }.items():
+        monkeypatch.setattr(app, nombre, valor)
+    app.controladores.configurar(["127.0.0.1"])
+    return app
+
+@pytest.fixture
+def floodlight(estado_app):
+    """Controlador simulado (fat-tree k=4, 20 hosts) escuchando donde app.py lo espera."""
+    parser = argparse.ArgumentParser()
+    mock_floodlight.agregar_argumentos(parser)
+    estado = mock_floodlight.crear_estado(parser.parse_args(["--hosts", "20"]))
+    servidor = mock_floodlight.ServidorFloodlight(estado, "127.0.0.1").iniciar()
+    yield estado
+    servidor.detener()
+    # Las conexiones keep-alive seguirían hablando con los hilos de este servidor
+    for sesion in app.sesiones.values():
+        sesion.close()
+
+@pytest.fixture
+def roster_yaml(floodlight, tmp_path):
+    """Escribe un roster (2 servidores, 1 curso) del controlador simulado y devuelve su ruta."""
+    ruta = tmp_path / "roster.yaml"
+    ruta.write_text(yaml.safe_dump(mock_floodlight.roster(floodlight, 2, 1), sort_keys=False))
+    return str(ruta)
+
+@pytest.fixture
+def importado(roster_yaml, capsys):
+    """Importa el roster y devuelve el único curso."""
+    app.importar_yaml(roster_yaml)
+    capsys.readouterr()
+    return next(iter(app.registro.cursos.values()))
@@ -0,0 +1,47 @@
+import app
+from test_conexiones import crear
+
+def cortar_ruta(floodlight, con):
+    """Corta un enlace intermedio entre switches de la ruta y fuerza a recalcular la topología."""
+    tramos = [(a, b) for (a, _), (b, _) in zip(con.ruta[1::2], con.ruta[2::2]) if a != b]
+    assert tramos and floodlight.cortar_enlace(*tramos[len(tramos) // 2])
+    app.topologia.invalidar()
+
+def test_actualizar_solo_toca_los_hops_que_cambian(importado, floodlight):
+    con = crear(importado)
+    anterior = con.ruta
+    contadores = dict(floodlight.contadores)
+    sin_cambio = app.actualizar_conexion(con, list(con.ruta))
+    assert sin_cambio.ok and sin_cambio.sin_cambios == len(con.flows)
+    assert not sin_cambio.altas.resultados and not sin_cambio.bajas.resultados
+    assert floodlight.contadores == contadores    # Ningún POST ni DELETE
+
+    cortar_ruta(floodlight, con)
+    resultado = app.actualizar_conexion(con)
+    assert resultado.ok, resultado.error
+    assert con.ruta != anterior and resultado.altas.exitosos
+    assert set(floodlight.flows) == {f["name"] for f in app.compilador.flows()}
+
+def test_fallo_al_instalar_la_ruta_nueva_conserva_la_anterior(importado, floodlight, monkeypatch):
+    con = crear(importado)
+    anterior, flows_anteriores = con.ruta, con.flows
+    instalados = {n: dict(f) for n, f in floodlight.flows.items()}
+    reglas = {f["name"]: f for f in app.compilador.flows()}
+    cortar_ruta(floodlight, con)
+
+    enviar = app.flow_pusher.enviar
+    fallas = []
+
+    def enviar_con_falla(ip, flow):
+        if not fallas:    # Sólo falla el primer POST de la ruta nueva
+            fallas.append(flow["name"])
+            return app.ResultadoFlow(flow["name"], flow["switch"], False, error="simulado")
+        return enviar(ip, flow)
+
+    monkeypatch.setattr(app.flow_pusher, "enviar", enviar_con_falla)
+    resultado = app.actualizar_conexion(con)
+    assert not resultado.ok and "ruta anterior" in resultado.error
+    assert con.ruta == anterior and con.flows == flows_anteriores
+    assert {f["name"]: f for f in app.compilador.flows()} == reglas
+    assert set(floodlight.flows) == set(instalados)
+    assert all(floodlight.flows[n]["actions"] == f["actions"] for n, f in instalados.items())
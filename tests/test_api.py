@@ -0,0 +1,68 @@
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+import app
+
+@pytest.fixture
+def api(importado):
+    servidores = []
+
+    def iniciar(hilos=4, cola=4):
+        servidor = app.ServidorAPI(("127.0.0.1", 0), hilos, cola)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        servidores.append(servidor)
+        return f"http://127.0.0.1:{servidor.server_address[1]}"
+
+    yield iniciar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+
+def test_rutas_de_consulta_y_de_conexiones(api, importado):
+    url = api()
+    alumno = importado.lista_alumnos()[0]
+    servidor = importado.servidores[0]
+    with requests.Session() as sesion:
+        assert sesion.get(f"{url}/salud").json()["ok"]
+        assert [c["nombre"] for c in sesion.get(f"{url}/cursos").json()] == [importado.nombre]
+        assert len(sesion.get(f"{url}/cursos/{importado.nombre}/alumnos").json()) == len(importado.alumnos)
+        busqueda = sesion.get(f"{url}/alumnos", params={"q": alumno.nombre, "tamano": 1}).json()
+        assert busqueda["resultados"][0]["nombre"] == alumno.nombre
+
+        cuerpo = {"alumno": app.codigo_alumno(alumno), "servidor": servidor.nombre,
+                  "servicio": servidor.servicios[0].nombre}
+        creada = sesion.post(f"{url}/conexiones", json=cuerpo)
+        assert creada.status_code == 201
+        handler = creada.json()["handler"]
+        assert sesion.post(f"{url}/conexiones", json=cuerpo).json() == {"handler": handler, "existente": True}
+        assert sesion.get(f"{url}/conexiones/{handler}").json()["alumno"] == app.codigo_alumno(alumno)
+        assert sesion.post(f"{url}/conexiones/{handler}/actualizar").status_code == 200
+        assert sesion.delete(f"{url}/conexiones/{handler}").status_code == 200
+        assert sesion.get(f"{url}/conexiones/{handler}").status_code == 404
+
+        assert sesion.get(f"{url}/no/existe").status_code == 404
+        assert sesion.delete(f"{url}/cursos").status_code == 405
+        invalido = sesion.post(f"{url}/conexiones", data="{", headers={"Content-Type": "application/json"})
+        assert invalido.status_code == 400 and "JSON inválido" in invalido.json()["error"]
+        assert sesion.post(f"{url}/conexiones", json={"alumno": "nadie"}).status_code == 404
+
+def test_con_trabajadores_y_cola_llenos_responde_503(api):
+    url = api(hilos=1, cola=0)
+    puerto = int(url.rsplit(":", 1)[1])
+    ocupada = socket.create_connection(("127.0.0.1", puerto))    # Retiene al único trabajador
+    try:
+        time.sleep(0.1)
+        respuesta = requests.get(f"{url}/salud", timeout=5)
+        assert respuesta.status_code == 503 and respuesta.headers["Retry-After"] == "1"
+    finally:
+        ocupada.close()
+    for _ in range(50):    # El trabajador se libera al cerrarse la conexión retenida
+        if requests.get(f"{url}/salud", timeout=5).status_code == 200:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("el servidor no volvió a atender")
@@ -0,0 +1,48 @@
+import pytest
+
+import app
+
+def indice_de(*entradas):
+    indice = app.IndiceTexto()
+    for clave, *textos in entradas:
+        indice.agregar(clave, *textos)
+    return indice
+
+def test_prefijo_busca_por_cualquier_palabra_sin_tildes_ni_repetir():
+    indice = indice_de(("a", "José Pérez", "20201234"), ("b", "Pedro Ramos", "20195678"), ("c", "Ana Paz", None))
+    assert list(indice.buscar("pe", "prefijo")) == ["b", "a"]    # "pedro" < "perez"
+    assert list(indice.buscar("PÉREZ", "prefijo")) == ["a"]
+    assert list(indice.buscar("2020", "prefijo")) == ["a"]
+    assert list(indice.buscar("ez", "prefijo")) == []
+    assert list(indice.buscar("", "prefijo")) == ["b", "a", "c"]    # Por el menor término: los códigos
+
+def test_contiene_busca_subcadenas_en_orden_de_indexacion():
+    indice = indice_de(("a", "José Pérez", "20201234"), ("b", "Pedro Ramos", "20195678"), ("c", "Ana Paz"))
+    assert list(indice.buscar("ez")) == ["a"]
+    assert list(indice.buscar("a")) == ["b", "c"]    # Sin repetir aunque "ana paz" tenga varias
+    assert list(indice.buscar("ro ra")) == ["b"]
+    assert list(indice.buscar("56")) == ["b"]
+    # Una coincidencia no cruza de un texto (ni de una clave) al siguiente
+    assert list(indice.buscar("perez2020")) == []
+    assert list(indice.buscar("ramos\n2019")) == []
+    assert list(indice.buscar("1234ped")) == []
+
+def test_los_cambios_despues_de_una_consulta_se_reflejan():
+    indice = indice_de(*[(i, f"alumno {i:03d}") for i in range(100)])
+    assert len(list(indice.buscar("alu", "prefijo"))) == 100
+    # Pocos cambios: se aplican con bisect sobre la lista ya ordenada
+    indice.agregar(5, "Zoe Zamora")
+    indice.quitar(7)
+    indice.agregar(200, "alumna nueva")
+    assert indice.cambios
+    assert list(indice.buscar("za", "prefijo")) == [5]
+    assert list(indice.buscar("007", "prefijo")) == []
+    assert list(indice.buscar("005")) == []
+    assert list(indice.buscar("alumn", "prefijo"))[0] == 200
+    assert len(list(indice.buscar("alumno"))) == 98
+    indice.limpiar()
+    assert list(indice.buscar("", "prefijo")) == [] and list(indice.buscar("a")) == []
+
+def test_modo_desconocido():
+    with pytest.raises(ValueError):
+        app.IndiceTexto().buscar("x", "exacto")
@@ -0,0 +1,37 @@
+import threading
+
+import app
+
+def test_vigilante_invalida_attachment_points_al_cambiar_la_topologia(floodlight):
+    host = floodlight.dispositivos[0]
+    mac = host["mac"][0]
+    anterior = app.get_attachment_points("127.0.0.1", mac)
+    vigilante = app.VigilanteTopologia()
+    vigilante.revisar()
+
+    # El host se mueve a otro switch de borde junto con la caída de un enlace
+    nuevo = floodlight.topologia.bordes[-1]
+    host["attachmentPoint"] = [{"switchDPID": nuevo, "port": floodlight.topologia.nuevo_puerto(nuevo)}]
+    a, _, b, _ = floodlight.topologia.links[0]
+    assert floodlight.cortar_enlace(a, b)
+    vigilante.revisar()
+
+    actual = app.get_attachment_points("127.0.0.1", mac)
+    assert actual != anterior
+    assert actual[0] == nuevo
+
+def test_contadores_de_la_cache_no_pierden_consultas_concurrentes(floodlight):
+    macs = [d["mac"][0] for d in floodlight.dispositivos]
+    app.cache_dispositivos.buscar("127.0.0.1", macs[0])
+
+    def consultar():
+        for i in range(2000):
+            app.cache_dispositivos.buscar("127.0.0.1", macs[i % len(macs)])
+
+    hilos = [threading.Thread(target=consultar) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    stats = app.cache_dispositivos.estadisticas()
+    assert stats["hits"] + stats["misses"] == 8 * 2000 + 1
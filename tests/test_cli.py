@@ -0,0 +1,12 @@
+import pytest
+
+import app
+
+@pytest.mark.parametrize("controlador", [[], ["--controlador", "10.0.0.1"]])
+def test_mapa_switches_sin_varios_controladores_es_un_error(estado_app, tmp_path, capsys, controlador):
+    mapa = tmp_path / "mapa.yaml"
+    mapa.write_text("'00:00:00:00:00:00:00:01': 10.0.0.1\n")
+    with pytest.raises(SystemExit) as salida:
+        app.main(controlador + ["--mapa-switches", str(mapa), "reconciliar"])
+    assert salida.value.code == 2
+    assert "--mapa-switches" in capsys.readouterr().err
@@ -0,0 +1,37 @@
+import app
+
+def crear(curso, i=0, servicio=0):
+    alumno = curso.lista_alumnos()[i]
+    servidor = curso.servidores[0]
+    resultado = app.crear_conexion(alumno, servidor, servidor.servicios[servicio])
+    assert resultado.ok, resultado.error
+    return resultado.conexion
+
+def test_borrado_fallido_conserva_la_conexion_para_reintentar(importado, floodlight, monkeypatch):
+    con = crear(importado)
+    flows = dict(floodlight.flows)
+    reglas = app.compilador.estadisticas()["reglas"]
+
+    monkeypatch.setattr(app, "controller_ip", "127.0.0.2")    # Nadie escucha ahí
+    eliminadas, reporte = app.eliminar_conexiones([con])
+    assert eliminadas == []
+    assert reporte.fallidos and not reporte.exitosos
+    assert app.registro.conexion(con.handler) is con
+    assert app.compilador.estadisticas()["reglas"] == reglas
+    assert floodlight.flows == flows
+
+    monkeypatch.setattr(app, "controller_ip", "127.0.0.1")
+    eliminadas, reporte = app.eliminar_conexiones([con])
+    assert eliminadas == [con.handler] and reporte.ok
+    assert app.registro.conexion(con.handler) is None
+    assert app.compilador.estadisticas()["reglas"] == 0
+    assert not floodlight.flows
+
+def test_borrar_una_conexion_conserva_las_reglas_compartidas(importado, floodlight):
+    a = crear(importado, 0)
+    b = crear(importado, 1)
+    eliminadas, reporte = app.eliminar_conexiones([a])
+    assert eliminadas == [a.handler] and reporte.ok
+    esperados = {f["name"] for f in app.compilador.flows()}
+    assert esperados and set(floodlight.flows) == esperados
+    assert app.registro.conexion(b.handler) is b
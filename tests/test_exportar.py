@@ -0,0 +1,50 @@
+import json
+
+import app
+
+def lineas(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return [json.loads(l) for l in f]
+
+def nuevo_proceso(monkeypatch, roster_yaml, capsys):
+    """Simula otra ejecución de 'app.py exportar': registro vacío, YAML reimportado."""
+    monkeypatch.setattr(app, "registro", app.Registro())
+    monkeypatch.setattr(app, "ID_PROCESO", "otro-proceso")
+    app.importar_yaml(roster_yaml)
+    capsys.readouterr()
+
+def test_incremental_entre_procesos_solo_agrega_lo_cambiado(importado, roster_yaml, tmp_path, monkeypatch, capsys):
+    ruta = str(tmp_path / "estado.jsonl")
+    total = app.exportar(ruta, incremental=True)
+    assert total == len(lineas(ruta)) > 0
+
+    nuevo_proceso(monkeypatch, roster_yaml, capsys)
+    assert app.exportar(ruta, incremental=True) == 0
+    assert len(lineas(ruta)) == total
+
+    nuevo_proceso(monkeypatch, roster_yaml, capsys)
+    curso = next(iter(app.registro.cursos.values()))
+    alumno = curso.lista_alumnos()[0]
+    app.registro.autorizar(alumno, False)
+    assert app.exportar(ruta, incremental=True) == 1
+    ultima = lineas(ruta)[-1]
+    assert ultima["tipo"] == "alumno" and ultima["mac"] == alumno.mac and ultima["autorizado"] is False
+
+def test_incremental_en_el_mismo_proceso_escribe_borrados(importado, tmp_path):
+    ruta = str(tmp_path / "estado.jsonl")
+    app.exportar(ruta, incremental=True)
+    otro = app.Curso("OTRO", "DICTANDO")
+    alumno = importado.lista_alumnos()[0]
+    app.registro.agregar_curso(otro)
+    app.registro.remover_alumno(importado, alumno)
+    escritos = app.exportar(ruta, incremental=True)
+    nuevas = lineas(ruta)[-escritos:]
+    assert {"tipo": "alumno", "clave": alumno.mac, "borrado": True} in nuevas
+    assert any(l["tipo"] == "curso" and l["nombre"] == "OTRO" for l in nuevas)
+
+def test_archivo_modificado_fuera_se_reescribe_completo(importado, tmp_path):
+    ruta = tmp_path / "estado.jsonl"
+    total = app.exportar(str(ruta), incremental=True)
+    ruta.write_text(ruta.read_text().splitlines(keepends=True)[0])
+    assert app.exportar(str(ruta), incremental=True) == total
+    assert len(lineas(ruta)) == total
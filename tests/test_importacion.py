@@ -0,0 +1,61 @@
+import pytest
+import yaml
+
+import app
+
+def roster(alumnos):
+    return {
+        "alumnos": alumnos,
+        "servidores": [{"nombre": "srv1", "direccion_ip": "10.0.0.1", "servicios": []}],
+        "cursos": [{"nombre": "TEL354", "estado": "DICTANDO", "alumnos": [a["codigo"] for a in alumnos],
+                    "servidores": [{"nombre": "srv1"}]}],
+    }
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("macs, mensaje", [
+    (["aa:00:00:00:00:01", "AA:00:00:00:00:01"], "MAC repetida"),
+    (["aa:00:00:00:00:01", ""], "sin MAC"),
+])
+def test_macs_repetidas_o_vacias_se_rechazan(estado_app, tmp_path, streaming, macs, mensaje):
+    ruta = tmp_path / "roster.yaml"
+    alumnos = [{"nombre": f"Alumno {i}", "codigo": f"2019{i}", "mac": mac} for i, mac in enumerate(macs)]
+    ruta.write_text(yaml.safe_dump(roster(alumnos)))
+    with pytest.raises(ValueError, match=mensaje):
+        app.importar_yaml(str(ruta), streaming=streaming, usar_snapshot=False)
+    assert not app.registro.cursos
+
+def test_macs_distintas_conservan_a_todos_los_alumnos(estado_app, tmp_path, capsys):
+    ruta = tmp_path / "roster.yaml"
+    alumnos = [{"nombre": f"Alumno {i}", "codigo": f"2019{i}", "mac": f"aa:00:00:00:00:0{i}"} for i in range(3)]
+    ruta.write_text(yaml.safe_dump(roster(alumnos)))
+    app.importar_yaml(str(ruta), usar_snapshot=False)
+    assert len(app.registro.curso("TEL354").alumnos) == 3
+
+def test_agregar_alumno_con_mac_vacia_o_ajena_no_reemplaza_a_nadie(estado_app, tmp_path, capsys):
+    ruta = tmp_path / "roster.yaml"
+    alumnos = [{"nombre": "Alumno 0", "codigo": "20190", "mac": "aa:00:00:00:00:01"}]
+    ruta.write_text(yaml.safe_dump(roster(alumnos)))
+    app.importar_yaml(str(ruta), usar_snapshot=False)
+    curso = app.registro.curso("TEL354")
+    with pytest.raises(ValueError, match="ya es del alumno 'Alumno 0'"):
+        app.registro.agregar_alumno(curso, app.Alumno("Intruso", "AA:00:00:00:00:01", "20199"))
+    with pytest.raises(ValueError, match="no tiene MAC"):
+        app.registro.agregar_alumno(curso, app.Alumno("Sin MAC", " ", "20198"))
+    assert [a.nombre for a in curso.lista_alumnos()] == ["Alumno 0"]
+
+    # Mismo código y MAC: es el mismo alumno y se reutiliza
+    otro = app.Curso("TEL355", "DICTANDO")
+    app.registro.agregar_curso(otro)
+    inscrito = app.registro.agregar_alumno(otro, app.Alumno("Alumno 0", "aa:00:00:00:00:01", "20190"))
+    assert inscrito is curso.lista_alumnos()[0]
+
+def test_menu_informa_un_roster_invalido_sin_cerrarse(estado_app, tmp_path, monkeypatch, capsys):
+    ruta = tmp_path / "roster.yaml"
+    alumnos = [{"nombre": f"Alumno {i}", "codigo": f"2019{i}", "mac": "aa:00:00:00:00:01"} for i in range(2)]
+    ruta.write_text(yaml.safe_dump(roster(alumnos)))
+    entradas = iter(["1", str(ruta), "1", str(tmp_path / "no_existe.yaml"), "9"])
+    monkeypatch.setattr("builtins.input", lambda _="": next(entradas))
+    app.menu()
+    salida = capsys.readouterr().out
+    assert "Error al importar: MAC repetida" in salida
+    assert salida.count("Error al importar") == 2
@@ -0,0 +1,56 @@
+import time
+
+import app
+from test_conexiones import crear
+
+def vivos(floodlight):
+    """Nombres de los flows que el switch simulado todavía no retiró."""
+    with floodlight.lock:
+        floodlight.expirar()
+        return set(floodlight.flows)
+
+def test_reenviar_un_flow_no_reinicia_su_hard_timeout(floodlight):
+    dpid = floodlight.topologia.bordes[0]
+    flow = {"name": "fwd_0123456789ab", "switch": dpid, "priority": "100", "in_port": "1",
+            "actions": "output=2", "hard_timeout": "1"}
+    floodlight.instalar(flow)
+    vence = floodlight.vencimientos[flow["name"]]
+    time.sleep(0.1)
+    floodlight.instalar(flow | {"actions": "output=3"})
+    assert floodlight.vencimientos[flow["name"]] == vence
+    assert floodlight.flows[flow["name"]]["actions"] == "output=3"
+
+    # Con otro match es una regla nueva y su timeout empieza de nuevo
+    floodlight.instalar(flow | {"in_port": "4"})
+    assert floodlight.vencimientos[flow["name"]] > vence
+
+def test_el_lease_vence_si_nadie_lo_renueva(importado, floodlight, monkeypatch):
+    monkeypatch.setattr(app, "LEASE_DURACION", 1)
+    con = crear(importado)
+    assert con.vence is not None and set(con.flows) <= vivos(floodlight)
+    time.sleep(1.1)
+    assert not vivos(floodlight) & set(con.flows)
+
+def test_renovar_extiende_el_lease_en_el_switch(importado, floodlight, monkeypatch):
+    monkeypatch.setattr(app, "LEASE_DURACION", 1)
+    con = crear(importado)
+    vence = con.vence
+    time.sleep(0.6)
+    reporte = app.renovador.revisar()
+    assert reporte.renovadas == [con] and reporte.flows.ok
+    assert con.vence > vence
+    time.sleep(0.6)    # Ya pasó el lease original
+    assert set(con.flows) <= vivos(floodlight)
+    time.sleep(0.6)
+    assert not vivos(floodlight) & set(con.flows)
+
+def test_detener_deja_permanentes_los_flows_vigentes(importado, floodlight, monkeypatch):
+    monkeypatch.setattr(app, "LEASE_DURACION", 1)
+    con = crear(importado)
+    monkeypatch.setattr(app, "LEASE_DURACION", 0)
+    reporte = app.renovador.hacer_permanentes()
+    assert reporte.ok and len(reporte.resultados) == len(con.flows)
+    assert con.vence is None
+    assert not floodlight.vencimientos
+    time.sleep(1.1)
+    assert set(con.flows) <= vivos(floodlight)
@@ -0,0 +1,29 @@
+import app
+
+def test_operaciones_por_handler_esperan_al_crear_del_mismo_lote(importado):
+    alumnos = importado.lista_alumnos()
+    servidor = importado.servidores[0]
+    servicio = servidor.servicios[0].nombre
+    operaciones = [{"op": "crear", "alumno": app.codigo_alumno(a), "servidor": servidor.nombre,
+                    "servicio": servicio} for a in alumnos[:2]]
+    # con2 sale del segundo 'crear'; estas líneas lo nombran antes de que exista
+    operaciones += [{"op": "recalcular", "handler": "con2"}, {"op": "actualizar", "handler": "con2"},
+                    {"op": "borrar", "handler": "con2"}]
+    resultados = []
+    exitosas, fallidas = app.ejecutar_lote(enumerate(operaciones, 1), resultados.append)
+    assert (exitosas, fallidas) == (5, 0), resultados
+    assert [r["linea"] for r in resultados if r["op"] != "crear"] == [3, 4, 5]
+    assert app.registro.conexion("con2") is None and app.registro.conexion("con1")
+
+def test_alumno_por_codigo_o_por_mac_comparte_la_clave_de_conflicto(importado):
+    alumno = importado.lista_alumnos()[0]
+    servidor = importado.servidores[0]
+    por_codigo = {"alumno": app.codigo_alumno(alumno), "servidor": servidor.nombre,
+                  "servicio": servidor.servicios[0].nombre}
+    por_mac = dict(por_codigo, alumno=f" {alumno.mac.upper()} ")    # alumno_de también lo acepta
+    assert app.clave_conflicto(por_codigo) == app.clave_conflicto(por_mac) == alumno.mac
+
+    operaciones = [dict(por_mac, op="crear"), dict(por_codigo, op="actualizar"), dict(por_mac, op="borrar")]
+    resultados = []
+    assert app.ejecutar_lote(enumerate(operaciones, 1), resultados.append) == (3, 0), resultados
+    assert not app.registro.conexiones
@@ -0,0 +1,45 @@
+import re
+
+import app
+
+LINEA = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*"'
+                   r'(,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*")*\})? -?[0-9.e+-]+$')
+
+def validar(texto):
+    for linea in texto.splitlines():
+        if not linea.startswith("#"):
+            assert LINEA.match(linea), linea
+
+def test_fuentes_de_rutas_y_puertos_se_exportan_como_numeros(estado_app):
+    metricas = app.Metricas()
+    metricas.agregar_fuente("estadisticas_puertos", app.estadisticas_puertos.estadisticas)
+    metricas.agregar_fuente("selector_rutas", app.selector_rutas.estadisticas, {"elecciones": "candidata"})
+    app.selector_rutas.elecciones.update({0: 5, 2: 1})
+    texto = metricas.prometheus()
+    validar(texto)
+    assert "tel354_estadisticas_puertos_disponibles 0" in texto.splitlines()
+    assert f'tel354_selector_rutas_modo_info{{modo="{app.selector_rutas.modo}"}} 1' in texto
+    assert 'tel354_selector_rutas_elecciones{candidata="0"} 5' in texto
+    assert 'tel354_selector_rutas_elecciones{candidata="2"} 1' in texto
+
+def test_valores_no_numericos_se_omiten(estado_app):
+    metricas = app.Metricas()
+    metricas.agregar_fuente("prueba", lambda: {"nada": None, "lista": [1], "nombre": 'a"b', "n": 3})
+    texto = metricas.prometheus()
+    validar(texto)
+    assert "nada" not in texto and "lista" not in texto
+    assert 'tel354_prueba_nombre_info{nombre="a\\"b"} 1' in texto
+
+def test_endpoint_global_produce_lineas_validas():
+    validar(app.metricas.prometheus())
+
+def test_switches_por_controlador_son_series_etiquetadas(estado_app):
+    app.controladores.configurar(["10.0.0.1", "10.0.0.2"], {"1": "10.0.0.1", "2": "10.0.0.1", "3": "10.0.0.2"})
+    metricas = app.Metricas()
+    metricas.agregar_fuente("controladores", app.controladores.estadisticas, {"switches": "controlador"})
+    texto = metricas.prometheus()
+    validar(texto)
+    lineas = texto.splitlines()
+    assert "tel354_controladores_controladores 2" in lineas
+    assert 'tel354_controladores_switches{controlador="10.0.0.1"} 2' in lineas
+    assert 'tel354_controladores_switches{controlador="10.0.0.2"} 1' in lineas
@@ -0,0 +1,27 @@
+import app
+
+RUTA = [("00:00:00:00:00:00:00:01", 1), ("00:00:00:00:00:00:00:01", 2)]
+OTRA = [("00:00:00:00:00:00:00:02", 1), ("00:00:00:00:00:00:00:02", 3)]
+
+def conexion(handler, ruta):
+    alumno = app.Alumno("Ana", f"aa:00:00:00:00:{handler[-1]}0")
+    servidor = app.Servidor("srv1", "10.0.0.1")
+    return app.Conexion(handler, alumno, servidor, app.Servicio("ssh", "TCP", 22), ruta)
+
+def test_rutas_compartidas_se_liberan_con_la_ultima_conexion(estado_app):
+    a, b = conexion("con1", RUTA), conexion("con2", RUTA)
+    assert a.ruta is b.ruta
+    app.registro.agregar_conexion(a)
+    app.registro.agregar_conexion(b)
+    app.registro.remover_conexion("con1")
+    assert tuple(a.ruta) in app.rutas_compartidas
+    app.registro.remover_conexion("con2")
+    assert not app.rutas_compartidas
+
+def test_recalcular_la_ruta_libera_la_anterior(estado_app):
+    con = conexion("con1", RUTA)
+    app.registro.agregar_conexion(con)
+    anterior = con.ruta
+    app.registro.actualizar_ruta(con, OTRA)
+    assert anterior not in app.rutas_compartidas
+    assert list(app.rutas_compartidas) == [con.ruta]
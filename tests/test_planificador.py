@@ -0,0 +1,89 @@
+import threading
+import time
+
+import app
+from test_conexiones import crear
+
+def test_envios_duplicados_bloqueados_por_contrapresion_comparten_el_future():
+    planificador = app.Planificador(trabajadores=1, max_pendientes=2)
+    liberar = threading.Event()
+    bloqueo = planificador.enviar("crear", "a", liberar.wait)
+    planificador.enviar("crear", "b", time.sleep, 0.05)
+    planificador.enviar("crear", "c", time.sleep, 0.05)    # Cola llena: b y c esperan
+    futuros = []
+
+    def encolar():
+        futuros.append(planificador.enviar("crear", "d", lambda: "d"))
+
+    hilos = [threading.Thread(target=encolar) for _ in range(2)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.05)
+    liberar.set()
+    for hilo in hilos:
+        hilo.join(5)
+    assert bloqueo.result(5)
+    assert [f.result(5) for f in futuros] == ["d", "d"]
+
+def test_operacion_compilada_antes_no_pisa_a_una_posterior(importado, floodlight):
+    crear(importado)
+    flow = app.compilador.flows()[0]
+    agrupador = app.AgrupadorFlows(espera=0.1)
+    # El reenvío (secuencia 10) llega antes que el borrado compilado antes (secuencia 9)
+    envio = agrupador.agregar("127.0.0.1", "enviar", flow, 10)
+    borrado = agrupador.agregar("127.0.0.1", "borrar", flow, 9)
+    assert borrado is envio
+    assert envio.result(5).ok
+    assert flow["name"] in floodlight.flows
+
+    # Ya despachado el reenvío, un borrado más viejo tampoco viaja
+    assert agrupador.agregar("127.0.0.1", "borrar", flow, 8).result(5).ok
+    time.sleep(0.2)
+    assert flow["name"] in floodlight.flows
+
+def test_borrados_en_paralelo_de_reglas_compartidas_no_las_dejan_instaladas(importado, floodlight):
+    a = crear(importado, 0)
+    b = crear(importado, 1)
+    assert app.compilador.estadisticas()["compartidas"]
+    for eliminadas, reporte in [f.result(10) for f in (app.planificador.borrar(a), app.planificador.borrar(b))]:
+        assert eliminadas and reporte.ok
+    assert app.compilador.estadisticas()["reglas"] == 0
+    assert not floodlight.flows
+
+def test_menu_provisiona_y_borra_el_curso_con_el_planificador(importado, floodlight, monkeypatch, capsys):
+    entradas = iter(["7", importado.nombre, "8", importado.nombre, "s", "13"])
+    monkeypatch.setattr("builtins.input", lambda _="": next(entradas))
+    app.submenu_conexiones()
+    salida = capsys.readouterr().out
+    tuplas = len(list(app.expandir_curso(importado)))
+    assert f"{tuplas}/{tuplas} conexiones creadas" in salida
+    assert f"{tuplas}/{tuplas} conexiones eliminadas" in salida
+    assert app.planificador.estadisticas()["ejecutados"] == 2 * tuplas
+    assert not app.registro.conexiones and not floodlight.flows
+
+def test_provisionar_conserva_los_resultados_si_un_trabajo_falla(importado, floodlight, monkeypatch):
+    original = app.crear_conexion
+    fallido = importado.lista_alumnos()[0]
+
+    def crear_conexion(alumno, servidor, servicio):
+        if alumno is fallido:
+            raise RuntimeError("switch caído")
+        return original(alumno, servidor, servicio)
+
+    monkeypatch.setattr(app, "crear_conexion", crear_conexion)
+    reporte = app.planificador.provisionar(importado)
+    tuplas = list(app.expandir_curso(importado))
+    assert len(reporte.resultados) == len(tuplas)
+    errores = [r for r in reporte.resultados if not r.ok]
+    assert errores and all(r.alumno is fallido and r.error == "switch caído" for r in errores)
+    assert len(app.registro.conexiones) == len(tuplas) - len(errores)
+
+def test_menu_recalcular_una_conexion_borrada_mientras_esperaba(importado, floodlight, monkeypatch, capsys):
+    con = crear(importado)
+    cancelado = app.Future()
+    cancelado.cancel()
+    monkeypatch.setattr(app.planificador, "recalcular", lambda _: cancelado)
+    entradas = iter(["4", con.handler, "13"])
+    monkeypatch.setattr("builtins.input", lambda _="": next(entradas))
+    app.submenu_conexiones()
+    assert "La conexión se eliminó antes de recalcular su ruta." in capsys.readouterr().out
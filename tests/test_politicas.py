@@ -0,0 +1,39 @@
+import app
+
+def escenario(estado="DICTANDO", autorizado=True, permitidos=None):
+    servidor = app.Servidor("srv1", "10.0.0.1", "bb:00:00:00:00:01")
+    ssh, web = app.Servicio("ssh", "TCP", 22), app.Servicio("web", "TCP", 80)
+    servidor.agregar_servicio(ssh)
+    servidor.agregar_servicio(web)
+    curso = app.Curso("TEL354", estado)
+    curso.agregar_servidor(servidor, permitidos)
+    alumno = app.Alumno("Ana", "AA:00:00:00:00:01", "20190001", autorizado=autorizado)
+    app.registro.agregar_curso(curso)
+    app.registro.agregar_alumno(curso, alumno)
+    return curso, alumno, servidor, ssh, web
+
+def test_curso_activo_y_alumno_autorizado_permiten_solo_los_servicios_del_curso(estado_app):
+    curso, alumno, servidor, ssh, web = escenario(permitidos=["ssh"])
+    assert app.politicas.permite(alumno, servidor, ssh)
+    assert not app.politicas.permite(alumno, servidor, web)
+    assert app.politicas.motivo(alumno, servidor, web) == "El servicio no está permitido para el alumno en ese servidor."
+
+def test_estado_del_curso_y_autorizacion_se_recompilan(estado_app):
+    curso, alumno, servidor, ssh, _ = escenario(estado="CERRADO")
+    assert not app.politicas.permite(alumno, servidor, ssh)
+    assert "no está activo" in app.politicas.motivo(alumno, servidor, ssh)
+
+    curso.estado = "dictando"
+    app.politicas.compilar_curso(curso)
+    assert app.politicas.permite(alumno, servidor, ssh)
+
+    alumno.autorizado = False
+    app.politicas.compilar_alumno(curso, alumno)
+    assert not app.politicas.permite(alumno, servidor, ssh)
+    assert app.politicas.motivo(alumno, servidor, ssh) == "El alumno no está autorizado."
+
+def test_retirar_al_alumno_quita_sus_decisiones(estado_app):
+    curso, alumno, servidor, ssh, _ = escenario()
+    app.registro.remover_alumno(curso, alumno)
+    assert not app.politicas.permite(alumno, servidor, ssh)
+    assert not app.politicas.permitidos
@@ -0,0 +1,22 @@
+import app
+
+def test_conexiones_de_curso_compara_servidores_por_nombre(importado):
+    alumno = importado.lista_alumnos()[0]
+    servidor = importado.servidores[0]
+    copia = app.Servidor(servidor.nombre, servidor.direccion_ip, servidor.mac)
+    app.registro.agregar_conexion(app.Conexion("con1", alumno, copia, servidor.servicios[0]))
+    assert [c.handler for c in app.conexiones_de_curso(importado)] == ["con1"]
+
+def test_reprovisionar_tras_reimportar_no_duplica_conexiones(importado, roster_yaml, floodlight, capsys):
+    primera = app.provisionar_curso(importado)
+    creadas = sum(1 for r in primera.resultados if r.ok)
+    assert creadas == len(app.registro.conexiones) > 0
+    flows = len(floodlight.flows)
+
+    app.importar_yaml(roster_yaml)
+    capsys.readouterr()
+    curso = app.registro.curso(importado.nombre)
+    assert len(app.conexiones_de_curso(curso)) == creadas
+    app.provisionar_curso(curso)
+    assert len(app.registro.conexiones) == creadas
+    assert len(floodlight.flows) == flows
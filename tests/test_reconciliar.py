@@ -0,0 +1,23 @@
+import app
+from test_conexiones import crear
+
+def test_reconciliar_repone_faltantes_y_borra_solo_huerfanos_propios(importado, floodlight):
+    crear(importado)
+    esperados = {f["name"] for f in app.compilador.flows()}
+    faltante = sorted(esperados)[0]
+    del floodlight.flows[faltante]
+    dpid = floodlight.topologia.bordes[0]
+    huerfano = "fwd_0123456789ab"
+    ajenos = ["fwd_legacy_1", "fwd_con9_0001", "arp_fwd_otra_instancia", "dst_0123456789abc"]
+    for nombre in [huerfano] + ajenos:
+        floodlight.instalar({"name": nombre, "switch": dpid, "priority": "100", "actions": "output=1"})
+
+    reporte = app.reconciliar(reparar=False)
+    assert reporte.ok
+    assert [f["name"] for f in reporte.faltantes] == [faltante]
+    assert [f["name"] for f in reporte.huerfanos] == [huerfano]
+    assert huerfano in floodlight.flows and faltante not in floodlight.flows
+
+    reporte = app.reconciliar()
+    assert reporte.ok and reporte.reparados.exitosos and reporte.borrados.exitosos
+    assert set(floodlight.flows) == esperados | set(ajenos)
@@ -0,0 +1,28 @@
+import app
+
+def test_reimportar_no_pierde_las_conexiones_existentes(importado, roster_yaml, capsys):
+    alumno = importado.lista_alumnos()[0]
+    servidor = importado.servidores[0]
+    servicio = servidor.servicios[0]
+    creada = app.crear_conexion(alumno, servidor, servicio).conexion
+    assert creada is not None
+
+    app.importar_yaml(roster_yaml)
+    capsys.readouterr()
+    curso = app.registro.curso(importado.nombre)
+    nuevo_alumno = curso.lista_alumnos()[0]
+    nuevo_servidor = curso.servidores[0]
+    assert nuevo_servidor is not servidor
+
+    existente = app.registro.conexion_existente(nuevo_alumno, nuevo_servidor, nuevo_servidor.servicios[0])
+    assert existente is creada
+    assert creada.alumno is nuevo_alumno and creada.servidor is nuevo_servidor
+
+def test_conexion_existente_compara_por_nombre(importado):
+    alumno = importado.lista_alumnos()[0]
+    servidor = importado.servidores[0]
+    con = app.Conexion("con1", alumno, servidor, servidor.servicios[0])
+    app.registro.agregar_conexion(con)
+    copia = app.Servidor(servidor.nombre, servidor.direccion_ip, servidor.mac)
+    copia.agregar_servicio(app.Servicio(servidor.servicios[0].nombre, "TCP", 22))
+    assert app.registro.conexion_existente(alumno, copia, copia.servicios[0]) is con
@@ -0,0 +1,23 @@
+import app
+from test_topologia import ENLACES, SWITCHES
+
+def candidatas():
+    app.topologia.actualizar("127.0.0.1", SWITCHES, ENLACES)
+    rutas = app.selector_rutas.candidatas("s1", 10, "s4", 20)
+    assert len(rutas) == 2 and len(rutas[0]) == len(rutas[1])
+    return rutas
+
+def test_con_cargas_iguales_se_queda_en_la_ruta_actual(estado_app):
+    rutas = candidatas()
+    actual = app.compartir_ruta(rutas[1])    # Como con.ruta: tupla de tuplas
+    assert app.selector_rutas.elegir("127.0.0.1", rutas, actual=actual) == rutas[1]
+    assert not app.estadisticas_puertos.reservas    # Ya la cuenta el registro
+    assert app.selector_rutas.elegir("127.0.0.1", rutas) == rutas[0]
+    assert app.estadisticas_puertos.reservas
+
+def test_consulta_sin_reservar_no_suma_carga_ni_elecciones(estado_app):
+    rutas = candidatas()
+    for _ in range(3):
+        assert app.selector_rutas.elegir("127.0.0.1", rutas, reservar=False) == rutas[0]
+    assert not app.estadisticas_puertos.reservas
+    assert not app.selector_rutas.elecciones
@@ -0,0 +1,40 @@
+import os
+import pickle
+
+import app
+
+class Marcador:
+    """Al deserializarse crea un archivo: prueba de que se ejecutó código del pickle."""
+
+    def __init__(self, camino):
+        self.camino = camino
+
+    def __reduce__(self):
+        return (open, (self.camino, "w"))
+
+def plantar_snapshot(ruta_yaml, marcador):
+    with open(app.archivo_snapshot(ruta_yaml), "wb") as f:
+        pickle.dump((app.clave_snapshot(ruta_yaml), Marcador(marcador)), f)
+
+def test_snapshot_se_guarda_privado_y_se_reutiliza(roster_yaml, capsys):
+    app.importar_yaml(roster_yaml)
+    assert os.stat(app.SNAPSHOT_DIR).st_mode & 0o077 == 0
+    assert os.stat(app.archivo_snapshot(roster_yaml)).st_mode & 0o077 == 0
+    cursos = app.cargar_snapshot(roster_yaml)
+    assert [c.nombre for c in cursos] == list(app.registro.cursos)
+
+def test_snapshot_en_carpeta_compartida_no_se_carga(roster_yaml, tmp_path):
+    os.makedirs(app.SNAPSHOT_DIR)
+    os.chmod(app.SNAPSHOT_DIR, 0o777)
+    marcador = tmp_path / "ejecutado"
+    plantar_snapshot(roster_yaml, str(marcador))
+    assert app.cargar_snapshot(roster_yaml) is None
+    assert not marcador.exists()
+
+def test_snapshot_escribible_por_otros_no_se_carga(roster_yaml, tmp_path):
+    os.makedirs(app.SNAPSHOT_DIR, mode=0o700)
+    marcador = tmp_path / "ejecutado"
+    plantar_snapshot(roster_yaml, str(marcador))
+    os.chmod(app.archivo_snapshot(roster_yaml), 0o666)
+    assert app.cargar_snapshot(roster_yaml) is None
+    assert not marcador.exists()
@@ -0,0 +1,41 @@
+import app
+
+def enlace(src, sport, dst, dport, latencia=0):
+    return {"src-switch": src, "src-port": sport, "dst-switch": dst, "dst-port": dport,
+            "direction": "bidirectional", "latency": latencia}
+
+# Diamante s1 -> (s2 | s3) -> s4; el camino por s3 tiene más latencia
+SWITCHES = [{"switchDPID": d} for d in ("s1", "s2", "s3", "s4", "s5")]
+ENLACES = [enlace("s1", 2, "s2", 1), enlace("s1", 3, "s3", 1, 50),
+           enlace("s2", 2, "s4", 1), enlace("s3", 2, "s4", 2)]
+
+def diamante(ponderado=False):
+    topologia = app.Topologia(ponderado=ponderado)
+    topologia.cargar(SWITCHES, ENLACES)
+    return topologia
+
+def test_ruta_entre_attachment_points_en_formato_de_floodlight():
+    assert diamante().ruta("s1", 10, "s4", 20) in (
+        [("s1", 10), ("s1", 2), ("s2", 1), ("s2", 2), ("s4", 1), ("s4", 20)],
+        [("s1", 10), ("s1", 3), ("s3", 1), ("s3", 2), ("s4", 2), ("s4", 20)])
+    assert diamante().ruta("s4", 20, "s4", 21) == [("s4", 20), ("s4", 21)]
+
+def test_ruta_ponderada_evita_el_enlace_lento_y_sin_camino_devuelve_vacio():
+    topologia = diamante(ponderado=True)
+    assert topologia.ruta("s4", 20, "s1", 10) == [("s4", 20), ("s4", 1), ("s2", 2), ("s2", 1), ("s1", 2), ("s1", 10)]
+    assert topologia.ruta("s1", 10, "s5", 1) == []    # s5 no tiene enlaces
+    assert topologia.ruta("s1", 10, "s9", 1) == []    # s9 no existe
+
+def test_k_caminos_de_menor_a_mayor_costo_sin_repetidos():
+    topologia = diamante(ponderado=True)
+    caminos = app.Topologia.k_caminos(topologia.adyacencia, "s1", "s4", 4)
+    assert [[t[0] for t in c] for c in caminos] == [["s1", "s2"], ["s1", "s3"]]
+    assert [sum(t[4] for t in c) for c in caminos] == [2, 52]
+    rutas = topologia.rutas("s1", 10, "s4", 20, 4)
+    assert len(rutas) == 2 and rutas[0] == topologia.ruta("s1", 10, "s4", 20)
+
+def test_k_caminos_distingue_enlaces_paralelos():
+    topologia = app.Topologia()
+    topologia.cargar(SWITCHES[:2], [enlace("s1", 1, "s2", 1), enlace("s1", 2, "s2", 2)])
+    caminos = app.Topologia.k_caminos(topologia.adyacencia, "s1", "s2", 3)
+    assert sorted(c[0][1] for c in caminos) == [1, 2]